@@ -1,276 +1,467 @@
-from matplotlib import pyplot as plt
-import pandas as pd
-from tabulate import tabulate
-import seaborn as sns
-from scipy.stats import chi2_contingency
+from analysis_stages import Stage, stage_main
 
 
 #----------------------------
 #----------------------------
 
+### RUNNING THIS SCRIPT ###
 
-#Reading in 'species_info.csv' as a dataframe using pandas
-species = pd.read_csv('species_info.csv')
+#This script is split into named stages so we can run just the part we need, e.g.:
+#   python Biodiversity_Work_Script.py                  (everything, top to bottom)
+#   python Biodiversity_Work_Script.py protection       (just the protection status tables)
+#   python Biodiversity_Work_Script.py sheep --stream   (sheep observations by park, streaming observations.csv in chunks)
+#   python Biodiversity_Work_Script.py sheep --incremental   (only read the observations appended since the last run)
+#   python Biodiversity_Work_Script.py --list           (every stage and what it needs)
+#The libraries each stage uses (pandas, scipy, matplotlib...) are imported INSIDE that stage, so a stage never pays for imports it doesn't use
+#Each stage's results are cached in '.cache/stages/' and reused until its input files, options or code change (see stage_cache.py). Pass '--no-cache' to recompute everything
+
+
+#----------------------------
+#----------------------------
 
-#The following code re-orients the dataframe. The first line allows every column to be viewed. The second line prevents each column from wrapping, so that
-#every column is on the same line/axis
-pd.set_option('display.max_columns', None)
-pd.set_option('display.expand_frame_repr', False)
 
-print(species.head())
+#The following code re-orients the dataframe. The first line allows every column to be viewed. The second line prevents each column from wrapping, so that
+#every column is on the same line/axis - ***NOTE: Every stage that prints a dataframe calls this itself, since the stage that used to set it may be
+#loaded from the stage cache instead of running
+def display_options():
+    import pandas as pd
+    pd.set_option('display.max_columns', None)
+    pd.set_option('display.expand_frame_repr', False)
 
 
 #----------------------------
 #----------------------------
 
+def species_stage(data):
+    from biodiversity_data import load_species, compact_frame, memory_report, COMPACT_SPECIES_SCHEMA
 
-### ANSWERING QUESTIONS ABOUT THE DATAFRAME ###
+    #Reading in 'species_info.csv' as a dataframe - ***NOTE: 'load_species()' only parses the CSV the first time (or after the file changes). After that
+    #it loads a typed columnar copy from '.cache/', with 'category' and 'conservation_status' already stored as categoricals
+    species = load_species('species_info.csv')
 
-#How many different species are in the "Species" dataframe?
-nunique_spec = species.scientific_name.nunique()
-print('\n')
-print('There are ' + str(nunique_spec) + ' species in the dataframe.\n')
+    #Shrinking "species" in memory by storing 'scientific_name' as a categorical too, and checking how many bytes each column uses before and after
+    compact_species = compact_frame(species, COMPACT_SPECIES_SCHEMA)
+    print('Memory usage of "species" in bytes, before and after compacting:\n' + str(memory_report(species, compact_species)) + '\n')
+    species = compact_species
 
-#What are the different values in the "Species" dataframe column, 'category'?
-spec_cats = species.category.unique()
-print('The following categories of animal species are present within the dataframe: ' + str(spec_cats) + '.\n')
+    display_options()
+    print(species.head())
 
-#What are the different values in the "Species" dataframe column, 'conservation_status'?
-spec_statuses = species.conservation_status.unique()
-print('The following conservation statuses are present within the dataframe: ' + str(spec_statuses) + '.\n')
 
-
-#----------------------------
-#----------------------------
+    #----------------------------
+    #----------------------------
 
 
-### Analysis of Dataframe ###
+    ### ANSWERING QUESTIONS ABOUT THE DATAFRAME ###
 
-#Creating a frequency table of conservation status by species scientific_name
-#The first line of code takes the null values present in the column and creates a row title as specified, 'No Intervention'
-species.fillna('No Intervention', inplace=True)
-spec_conser_freqtab = species.groupby('conservation_status').scientific_name.nunique().reset_index()
+    #How many different species are in the "Species" dataframe?
+    nunique_spec = species.scientific_name.nunique()
+    print('\n')
+    print('There are ' + str(nunique_spec) + ' species in the dataframe.\n')
 
-print(spec_conser_freqtab)
-print('\n')
+    #What are the different values in the "Species" dataframe column, 'category'?
+    spec_cats = species.category.unique()
+    print('The following categories of animal species are present within the dataframe: ' + str(spec_cats) + '.\n')
 
-#Creating a new dataframe -- ***NOTE: We took the same code as before and simply added the '.sort_values()' function, which sorts the "scientific_name" column by species counts
-protection_counts = species.groupby('conservation_status')\
-    .scientific_name.nunique().reset_index()\
-    .sort_values(by='scientific_name')
+    #What are the different values in the "Species" dataframe column, 'conservation_status'?
+    spec_statuses = species.conservation_status.unique()
+    print('The following conservation statuses are present within the dataframe: ' + str(spec_statuses) + '.\n')
 
-print(protection_counts)
-print('\n')
+    return {'species': species}
 
 
 #----------------------------
 #----------------------------
 
 
-### Creating a Barchart ###
+def protection_stage(data):
+    from biodiversity_data import encode_conservation_status, protected_mask
+    from stage_profile import section
 
-#Using Seaborn library to create a barplot
-# sns.barplot(data=protection_counts, x="conservation_status", y="scientific_name").set(title="Conservation Status by Species Count")
-# plt.show()
+    display_options()
 
-#Using matplotlib to generate the same barchart as above
-# plt.figure(figsize=(10, 4))
-# ax = plt.subplot()
-# plt.bar(range(len(protection_counts)),
-#         protection_counts["scientific_name"].values)
-# ax.set_xticks(range(len(protection_counts)))
-# ax.set_xticklabels(protection_counts["conservation_status"].values)
-# plt.ylabel('Number of Species')
-# plt.title('Conservation Status by Species')
-# plt.show()
+    #Working on our own (shallow) copy, so the other stages still see "species" exactly as it was loaded - ***NOTE: this stage only adds or replaces
+    #whole columns, which with pandas' copy-on-write never touches the shared data, so there's no need to copy every column
+    species = data['species'].copy(deep=False)
 
+    ### Analysis of Dataframe ###
 
-#----------------------------
-#----------------------------
+    #Creating a frequency table of conservation status by species scientific_name
+    #The first line of code takes the null values present in the column and labels them as specified, 'No Intervention' - ***NOTE: only the
+    #'conservation_status' column is touched. It becomes an ordered categorical where 'No Intervention' is the first level, followed by the other statuses
+    #in order of concern ('In Recovery' < 'Species of Concern' < 'Threatened' < 'Endangered')
+    species['conservation_status'] = encode_conservation_status(species.conservation_status)
+    spec_conser_freqtab = species.groupby('conservation_status', observed=True).scientific_name.nunique().reset_index()
+
+    print(spec_conser_freqtab)
+    print('\n')
 
+    #Creating a new dataframe -- ***NOTE: We took the same code as before and simply added the '.sort_values()' function, which sorts the "scientific_name" column by species counts
+    protection_counts = species.groupby('conservation_status', observed=True)\
+        .scientific_name.nunique().reset_index()\
+        .sort_values(by='scientific_name')
 
-### Are certain types of species more likely to be endangered? ###
+    print(protection_counts)
+    print('\n')
 
-#Creating a new column in our dataframe. If there is no intervention, then it's false. If there IS intervention, then it's true
-species['is_protected'] = species['conservation_status'] != 'No Intervention'
-print(species)
 
-#By using the loc() function, we can select a single row from the species dataframe. Below, we're selecting row 8 (index 7) to check
-# whether our != 'No Intervention' equals True works - it does!
-print(species.loc[7])
-print('\n')
+    #----------------------------
+    #----------------------------
 
-#Grouping the species dataframe by 'category' and 'Is Protected' columns, then counting unique 'scientific_name'
-category_counts = species.groupby(['category', 'is_protected']).scientific_name.nunique().reset_index()
 
-#Checking the first 10 rows of our "category_counts" frequency table
-print(category_counts.head(10))
-print('\n')
+    ### Are certain types of species more likely to be endangered? ###
 
-#Rearranging the newly created frequency table by using "pivot()" function to rearrange "category_counts"
-category_pivot = category_counts.pivot(columns='is_protected', index='category', values='scientific_name').reset_index()
+    #Creating a new column in our dataframe. If there is no intervention, then it's false. If there IS intervention, then it's true - ***NOTE: since
+    #'No Intervention' is category code 0, this compares integer codes instead of strings
+    species['is_protected'] = protected_mask(species.conservation_status)
+    print(species)
 
-print(category_pivot)
-print('\n')
+    #By using the loc() function, we can select a single row from the species dataframe. Below, we're selecting row 8 (index 7) to check
+    # whether our != 'No Intervention' equals True works - it does!
+    print(species.loc[7])
+    print('\n')
 
-#We have created a solid frequency table! Let's get more descriptive by changing the false and true columns to be more descriptive
-category_pivot.columns = ['category', 'not_protected', 'protected']
+    #Grouping the species dataframe by 'category' and 'Is Protected' columns, then counting unique 'scientific_name' - ***NOTE: the 'section()' blocks
+    #only time anything when the script is run with '--profile'
+    with section('groupby') as timed:
+        category_counts = species.groupby(['category', 'is_protected'], observed=True).scientific_name.nunique().reset_index()
+        timed.rows = len(category_counts)
 
-print(category_pivot)
-print('\n')
+    #Checking the first 10 rows of our "category_counts" frequency table
+    print(category_counts.head(10))
+    print('\n')
 
-#Creating a new column in our "category_pivot" DF for percentages of 'not_protected' vs. 'protected' species categories
-#Keep in mind that we're just manipulating the values in our "category_pivot" DF, so we don't need to call our "species" DF!
-category_pivot['percent_protected'] = category_pivot['protected']/ \
-                                      (category_pivot['protected'] + category_pivot['not_protected'])
+    #Rearranging the newly created frequency table by using "pivot()" function to rearrange "category_counts"
+    with section('pivot') as timed:
+        category_pivot = category_counts.pivot(columns='is_protected', index='category', values='scientific_name').reset_index()
+        timed.rows = len(category_pivot)
 
-print(category_pivot, '\n')
-print('------------------------------\n')
+    print(category_pivot)
+    print('\n')
 
-# Now that we've generated a solid frequency table of protected status by species category, let's do some hypothesis testing.
-# Which hypothesis test should we run if we wanted to compare which categories are more likely to be protected/not protected?
-# Since we are comparing categorical variables like 'category' and 'protection status', a chi squared test should work fine!
+    #We have created a solid frequency table! Let's get more descriptive by changing the false and true columns to be more descriptive
+    category_pivot.columns = ['category', 'not_protected', 'protected']
+
+    print(category_pivot)
+    print('\n')
+
+    #Creating a new column in our "category_pivot" DF for percentages of 'not_protected' vs. 'protected' species categories
+    #Keep in mind that we're just manipulating the values in our "category_pivot" DF, so we don't need to call our "species" DF!
+    category_pivot['percent_protected'] = category_pivot['protected']/ \
+                                          (category_pivot['protected'] + category_pivot['not_protected'])
+
+    print(category_pivot, '\n')
+    print('------------------------------\n')
+
+    return {'protection_counts': protection_counts, 'category_counts': category_counts, 'category_pivot': category_pivot}
 
 
 #----------------------------
 #----------------------------
 
 
-### Running a Chi-Squared Hypothesis Test ###
+def chi_square_stage(data):
+    from chi_square_tests import pair_result, pairwise_chi2_matrix, significance_sentence
+
+    category_pivot = data['category_pivot']
+
+    # Now that we've generated a solid frequency table of protected status by species category, let's do some hypothesis testing.
+    # Which hypothesis test should we run if we wanted to compare which categories are more likely to be protected/not protected?
+    # Since we are comparing categorical variables like 'category' and 'protection status', a chi squared test should work fine!
+
+    ### Running a Chi-Squared Hypothesis Test ###
+
+    #Let's run a chi-squared test to examine whether mammals are more likely to be endangered than birds, based off our last frequency table
+
+    # First, we need a contingency table populated with our values in question. Instead of typing the counts in by hand, we pull them straight out of
+    # "category_pivot" - ***NOTE: our table is populated with protected 1st, not_protected 2nd, AND mammal before bird. Every pair of categories is
+    # tested in one batch and cached, so the mammal vs. reptile test below doesn't compute anything new!
+    protection_columns = ['protected', 'not_protected']
+    mammal_bird_test = pair_result(category_pivot, 'category', protection_columns, 'Mammal', 'Bird')
+
+    #Printing the results of our chi-squared test:
+    #The sentence is worded from the p-value itself (against 0.05), so it always agrees with the numbers printed under it
+    print(significance_sentence(mammal_bird_test, 'mammals', 'birds') + '\n' + str(mammal_bird_test) + '\n')
+
+    #Looking up the chi-squared test for mammals vs. reptiles and printing results:
+    mammal_reptile_test = pair_result(category_pivot, 'category', protection_columns, 'Mammal', 'Reptile')
+    print(significance_sentence(mammal_reptile_test, 'mammals', 'reptiles') + '\n' + str(mammal_reptile_test))
+    print('\n------------------------------\n')
 
-#Let's run a chi-squared test to examine whether mammals are more likely to be endangered than birds, based off our last frequency table
+    #Rather than picking pairs by hand, let's test EVERY pair of categories against each other at once. Since we're running lots of tests, some would look
+    #significant by pure chance, so the p-values are adjusted with the Holm correction before comparing them against 0.05
+    category_tests = pairwise_chi2_matrix(category_pivot, 'category', protection_columns, method='holm', alpha=0.05)
+    print('Holm-adjusted p-values for every pair of categories:\n' + str(category_tests.adjusted_pvalue.round(4)) + '\n')
+    print('Pairs of categories that differ significantly in protection status:\n' + str(category_tests.significant) + '\n')
+    print('\n------------------------------\n')
 
-# First, we need to create a contingency table and populate it with our values in question - ***NOTE: our table is populated with protected 1st, not_protected 2nd, AND mammal before bird
-contingency = [[30, 146],\
-               [75, 413]]
+    return {'mammal_bird_test': mammal_bird_test, 'mammal_reptile_test': mammal_reptile_test, 'category_tests': category_tests}
 
-#Running actual chi-squared test using our contingency table and printing results:
-print('The results of our chi-squared test did not reveal any statistical significance between mammals and birds, as shown below: \n' + str(chi2_contingency(contingency)) + '\n')
 
-#Running another chi-squared test using our updated contingency table (mammals vs. reptiles) and printing results:
-contingency2 = [[30, 146],\
-               [5, 73]]
-print('The results of our chi-squared test DID in fact reveal statistically significant difference between mammals and reptiles, as shown below:\
-\n' + str(chi2_contingency(contingency2)))
-print('\n------------------------------\n')
+#----------------------------
+#----------------------------
+
+
+def sheep_stage(data):
+    from biodiversity_data import load_observations, stream_observation_totals, compact_frame, memory_report, share_categories
+    from biodiversity_data import COMPACT_OBSERVATIONS_SCHEMA
+    from incremental import update_observation_totals
+    from species_index import SpeciesNameIndex
+    from stage_profile import section
+
+    display_options()
+
+    #Working on our own (shallow) copy, so the other stages still see "species" exactly as it was loaded - ***NOTE: this stage only adds or replaces
+    #whole columns, which with pandas' copy-on-write never touches the shared data, so there's no need to copy every column
+    species = data['species'].copy(deep=False)
+
+    ### Investigating New "Observations" Dataset ###
+
+    #The purpose of this exercise is to determine how many observed species of sheep are in the "observations" dataset. The only problem is that there is no 'common_name' column,
+    #only scientific name. We're going to create a new column in our "species" DF that spits out whether a species is a sheep or not
+
+    #Run with '--stream' to stream 'observations.csv' in chunks instead of loading all of it. Only the sheep rows of each chunk are kept and summed, so memory
+    #stays flat no matter how big the file is - use it for the full historical feed!
+    #Run with '--incremental' when the feed only ever grows at the end: we remember how far 'observations.csv' has been read and the sheep totals so far
+    #(in '.cache/incremental/'), so each run only reads the rows appended since the last one and adds them on (see incremental.py)
+    incremental = data['options'].incremental
+    stream_observations = data['options'].stream or incremental
+
+    #Loading and investigating new dataset (through the same columnar cache as "species", with 'park_name' as a categorical)
+    if not stream_observations:
+        observations = load_observations('observations.csv')
+        print(observations.head(10))
+        print('\n')
+
+        #Shrinking "observations" the same way: 'scientific_name' and 'park_name' become categoricals and the counts use the smallest integer type that
+        #fits. Both DFs then share the same 'scientific_name' categories, so merging them later keeps the compact codes
+        compact_observations = compact_frame(observations, COMPACT_OBSERVATIONS_SCHEMA)
+        print('Memory usage of "observations" in bytes, before and after compacting:\n' + str(memory_report(observations, compact_observations)) + '\n')
+        observations = compact_observations
+        share_categories(species, observations, 'scientific_name')
+
+    #Building a word index over 'common_names' once, so looking up an animal only touches the rows that actually mention it instead of scanning every
+    #name string - ***NOTE: we'll be looking up lots of animals this way, not just sheep!
+    name_index = SpeciesNameIndex(species)
+
+    #Creating a new column in our "species" DF
+    species['is_sheep'] = name_index.mask('Sheep')
+    print(species.head(10))
+    print('\n')
+
+    #Selecting rows in our "species" DF where 'is_sheep' is True:
+    print(species[species.is_sheep])
+    print('\n')
+
+    #From our output table, it looks like some plant species have "sheep" in the common name. Let's further filter by selecting rows where 'is_sheep' is True
+    # and 'category' == mammal
+    sheep_species = name_index.find_species('Sheep', category='Mammal')
+    print(sheep_species)
+    print('\n')
+
+    #Merging our "observations" and "sheep_species" dataframes to link up our sheep values from species to oberservations scientific_name!
+    #When streaming, we never hold the whole "observations" DF, so the chunks are matched against the sheep scientific names as they're read and we
+    #only keep the running per-park/per-species sums
+    if incremental:
+        sheep_observations, reports = update_observation_totals('observations.csv', sheep_species.scientific_name)
+        for report in reports:
+            print('{}: {} new rows{}'.format(report.source, report.rows, ' (read from the top)' if report.reset else ''))
+    elif stream_observations:
+        sheep_observations = stream_observation_totals('observations.csv', sheep_species.scientific_name)
+    else:
+        with section('merge') as timed:
+            sheep_observations = observations.merge(sheep_species)
+            timed.rows = len(sheep_observations)
+    print(sheep_observations)
+    print('\n------------------------------\n')
+
+
+    #----------------------------
+    #----------------------------
+
+
+    ### Conducting Further Analysis on the Merged Dataframe ###
+
+    #Counting up how many of each sheep species was found at each park by using the 'groupby()' function again:
+    with section('groupby') as timed:
+        obs_by_park = sheep_observations.groupby('park_name', observed=True).observations.sum().reset_index()
+        timed.rows = len(obs_by_park)
+    print('The total number of sheep observations by park in the past 7 days is as follows:\n' + str(obs_by_park) + '\n')
+
+    ### Try creating a new table that also breaks down the observations by sheep species as a side-task to test your skills! (Made up by me)
+    obs_by_park_species = sheep_observations.groupby(['park_name', 'scientific_name'], observed=True).observations.sum().reset_index()
+    print('The total number of sheep observations by park and sheep species is as follows:\n' + str(obs_by_park_species) + '\n')
+
+    return {'sheep_species': sheep_species, 'sheep_observations': sheep_observations, 'obs_by_park': obs_by_park,
+            'obs_by_park_species': obs_by_park_species}
 
 
 #----------------------------
 #----------------------------
 
 
-### Investigating New "Observations" Dataset ###
+def sample_size_stage(data):
+    import numpy as np
+    from sample_size import sample_size_per_variant, weeks_to_collect, weekly_rates, sample_size_sweep
 
-#The purpose of this exercise is to determine how many observed species of sheep are in the "observations" dataset. The only problem is that there is no 'common_name' column,
-#only scientific name. We're going to create a new column in our "species" DF that spits out whether a species is a sheep or not
+    display_options()
 
-#Loading and investigating new dataset
-observations = pd.read_csv('observations.csv')
-print(observations.head(10))
-print('\n')
+    ### Creating a Sample Size ###
 
-#Creating a new column in our "species" DF
-species['is_sheep'] = species['common_names'].apply(lambda x: 'Sheep' in x)
-print(species.head(10))
-print('\n')
+    #Our scientists know that 15% of sheep at Bryce National Park have foot and mouth disease. Park rangers at Yellowstone National Park have been running a program to reduce the rate
+    # of foot and mouth disease at that park. The scientists want to test whether or not this program is working. They want to be able to detect reductions of at least 5 percentage points.
+    # For instance, if 10% of sheep in Yellowstone have foot and mouth disease, they'd like to be able to know this, with confidence.
 
-#Selecting rows in our "species" DF where 'is_sheep' is True:
-print(species[species.is_sheep])
-print('\n')
+    #Instead of Codecademy's sample size calculator, we compute the number of sheep that they would need to observe from each park ourselves with
+    #'sample_size_per_variant()'. Use the default level of significance (90%) and a power of 80%.
+    #Remember that "Minimum Detectable Effect" is a percent of the baseline.
 
-#From our output table, it looks like some plant species have "sheep" in the common name. Let's further filter by selecting rows where 'is_sheep' is True
-# and 'category' == mammal
-sheep_species = species[(species.is_sheep) & (species.category == 'Mammal')]
-print(sheep_species)
-print('\n')
+    #The weekly number of sheep sightings at each park comes straight from "obs_by_park" instead of being typed in by hand
+    sheep_per_week = weekly_rates(data['obs_by_park'])
 
-#Merging our "observations" and "sheep_species" dataframes to link up our sheep values from species to oberservations scientific_name!
-sheep_observations = observations.merge(sheep_species)
-print(sheep_observations)
-print('\n------------------------------\n')
+    #----------------------------
+    # Bryce National Park #
+    #----------------------------
 
+    #Calculating the minimum detectable effect for Bryce National Park
+    minimum_detectable_effect_bryce = 100 * 0.05 / 0.15
+    print('Our mimimum detectable effect for Bryce National is: ' + str(minimum_detectable_effect_bryce) + ' percent.')
 
-#----------------------------
-#----------------------------
+    baseline_conversion_rate_bryce = 15 #percent
 
+    #Calculating our sample size requirement
+    sample_size_per_variant_bryce = int(sample_size_per_variant(baseline_conversion_rate_bryce / 100., minimum_detectable_effect_bryce / 100., alpha=0.10))
+    print('Our sample size requirement for Bryce National is: ' + str(sample_size_per_variant_bryce) + ' sheep.')
 
-### Conducting Further Analysis on the Merged Dataframe ###
+    ### How many weeks would you need to observe sheep at Bryce National Park in order to observe enough sheep?
+    bryce = float(weeks_to_collect(sample_size_per_variant_bryce, sheep_per_week['Bryce National Park']))
 
-#Counting up how many of each sheep species was found at each park by using the 'groupby()' function again:
-obs_by_park = sheep_observations.groupby('park_name').observations.sum().reset_index()
-print('The total number of sheep observations by park in the past 7 days is as follows:\n' + str(obs_by_park) + '\n')
+    #----------------------------
+    # Yellowstone National Park #
+    #----------------------------
 
-### Try creating a new table that also breaks down the observations by sheep species as a side-task to test your skills! (Made up by me)
+    #Calculating the minimum detectable effect for Yellowstone National Park
+    minimum_detectable_effect_yellow = 100 * 0.05 / 0.10
+    print('Our minimum detectable effect for Yellowstone National is: ' + str(minimum_detectable_effect_yellow) + ' percent.')
 
+    baseline_conversion_rate_yellow = 10 #percent
 
-#----------------------------
-#----------------------------
+    #Calculating our sample size requirement
+    sample_size_per_variant_yellow = int(sample_size_per_variant(baseline_conversion_rate_yellow / 100., minimum_detectable_effect_yellow / 100., alpha=0.10))
+    print('Our sample size requirement for Yellowstone National is: ' + str(sample_size_per_variant_yellow) + ' sheep.\n')
+
+    ### How many weeks would you need to observe at Yellowstone National Park to observe enough sheep?
+    yellowstone = float(weeks_to_collect(sample_size_per_variant_yellow, sheep_per_week['Yellowstone National Park']))
 
-### Creating Barcharts ###
+    #Outputting the length of time in weeks for each Park:
+    print('It would therefore take approximately ' + str(bryce) + ' weeks at Bryce National and ' + str(yellowstone) + ' weeks at Yellowstone National to generate sufficient sample sizes.\n')
 
-#Creating a bar chart using seaborn
-# sns.barplot(data=obs_by_park, x="park_name", y="observations").set(title="Observations by Sheep per Week")
-# plt.show()
+    #----------------------------
+    # Every Park, Many Scenarios #
+    #----------------------------
+
+    #Since everything is vectorized, we can sweep lots of scenarios for every park at once - here every baseline from 5% to 30%, relative effects from 20% to 60%
+    #and three significance levels, for all parks in "obs_by_park"
+    sample_size_scenarios = sample_size_sweep(baselines=np.arange(0.05, 0.31, 0.01),
+                                              minimum_detectable_effects=np.arange(0.20, 0.61, 0.05),
+                                              rates=sheep_per_week,
+                                              alphas=[0.01, 0.05, 0.10])
+    print(sample_size_scenarios.head(10))
+
+    return {'bryce_weeks': bryce, 'yellowstone_weeks': yellowstone, 'sample_size_scenarios': sample_size_scenarios}
 
-#Creating the same bar chart using matplotlib
-# plt.figure(figsize=(16,4))
-# ax = plt.subplot()
-# plt.bar(range(len(obs_by_park)), obs_by_park.observations.values)
-# ax.set_xticks(range(len(obs_by_park)))
-# ax.set_xticklabels(obs_by_park.park_name)
-# plt.xlabel("National Parks")
-# plt.ylabel('Number of Observations')
-# plt.title('Observations of Sheep per Week')
-# plt.show()
-print('\n------------------------------\n')
 
 #----------------------------
 #----------------------------
 
-### Creating a Sample Size ###
 
-#Our scientists know that 15% of sheep at Bryce National Park have foot and mouth disease. Park rangers at Yellowstone National Park have been running a program to reduce the rate
-# of foot and mouth disease at that park. The scientists want to test whether or not this program is working. They want to be able to detect reductions of at least 5 percentage points.
-# For instance, if 10% of sheep in Yellowstone have foot and mouth disease, they'd like to be able to know this, with confidence.
+def charts_stage(data):
+    from chart_rendering import bar_chart, render_charts
 
-#Use Codecademy's sample size calculator to calculate the number of sheep that they would need to observe from each park. Use the default level of significance (90%).
-#Remember that "Minimum Detectable Effect" is a percent of the baseline.
+    protection_counts = data['protection_counts']
+    obs_by_park = data['obs_by_park']
 
-#----------------------------
-# Bryce National Park #
-#----------------------------
+    ### Creating a Barchart ###
+
+    #Using Seaborn library to create a barplot
+    # sns.barplot(data=protection_counts, x="conservation_status", y="scientific_name").set(title="Conservation Status by Species Count")
+    # plt.show()
+
+    #Using matplotlib to generate the same barchart as above
+    # plt.figure(figsize=(10, 4))
+    # ax = plt.subplot()
+    # plt.bar(range(len(protection_counts)),
+    #         protection_counts["scientific_name"].values)
+    # ax.set_xticks(range(len(protection_counts)))
+    # ax.set_xticklabels(protection_counts["conservation_status"].values)
+    # plt.ylabel('Number of Species')
+    # plt.title('Conservation Status by Species')
+    # plt.show()
+
+    #Instead of drawing it on screen, we describe the same barchart as a chart spec. All of our chart specs are drawn together (off-screen, in parallel)
+    #and saved as png files at the end of this stage
+    chart_specs = [bar_chart('conservation_status_by_species.png', protection_counts['conservation_status'], protection_counts['scientific_name'].values,
+                             title='Conservation Status by Species', ylabel='Number of Species', figsize=(10, 4))]
+
+    #----------------------------
+    #----------------------------
+
+    ### Creating Barcharts ###
 
-#Calculating the minimum detectable effect for Bryce National Park
-minimum_detectable_effect_bryce = 100 * 0.05 / 0.15
-print('Our mimimum detectable effect for Bryce National is: ' + str(minimum_detectable_effect_bryce) + ' percent.')
+    #Creating a bar chart using seaborn
+    # sns.barplot(data=obs_by_park, x="park_name", y="observations").set(title="Observations by Sheep per Week")
+    # plt.show()
 
-baseline_conversion_rate_bryce = 15 #percent
+    #Creating the same bar chart using matplotlib
+    # plt.figure(figsize=(16,4))
+    # ax = plt.subplot()
+    # plt.bar(range(len(obs_by_park)), obs_by_park.observations.values)
+    # ax.set_xticks(range(len(obs_by_park)))
+    # ax.set_xticklabels(obs_by_park.park_name)
+    # plt.xlabel("National Parks")
+    # plt.ylabel('Number of Observations')
+    # plt.title('Observations of Sheep per Week')
+    # plt.show()
 
-#Therefore, our sample size requirement is 870!
-sample_size_per_variant_bryce = 870
+    #Adding the same barchart to our chart specs so it gets saved with the others
+    chart_specs.append(bar_chart('sheep_observations_by_park.png', obs_by_park['park_name'], obs_by_park['observations'].values,
+                                 title='Observations of Sheep per Week', xlabel='National Parks', ylabel='Number of Observations', figsize=(16, 4)))
 
-### How many weeks would you need to observe sheep at Bryce National Park in order to observe enough sheep?
+    #----------------------------
+    #----------------------------
+
+    ### Saving Our Charts ###
+
+    #Drawing every chart spec we collected above in one batch and writing them to disk
+    saved_charts = render_charts(chart_specs)
+    print('\nSaved the following charts: ' + str(saved_charts))
+
+    return {'saved_charts': saved_charts}
 
-#Below we calculate for Bryce National Park since that was the data we had on hand in the instructions:
-bryce = 870 / 250.
 
 #----------------------------
-# Yellowstone National Park #
 #----------------------------
 
-#Calculating the minimum detectable effect for Yellowstone National Park
-minimum_detectable_effect_yellow = 100 * 0.05 / 0.10
-print('Our minimum detectable effect for Yellowstone National is: ' + str(minimum_detectable_effect_yellow) + ' percent.\n')
+### STAGES AND COMMAND LINE ###
+
+STAGES = [
+    Stage('species', species_stage, (), 'load species_info.csv and answer the basic questions about it', files=('species_info.csv',)),
+    Stage('protection', protection_stage, ('species',), 'conservation status frequency tables and protection by category'),
+    Stage('chi_square', chi_square_stage, ('protection',), 'chi-squared tests of protection status between categories'),
+    Stage('sheep', sheep_stage, ('species',), 'sheep observations by park', files=('observations.csv',), params=('stream', 'incremental')),
+    Stage('sample_size', sample_size_stage, ('sheep',), 'sample sizes and weeks of observation per park'),
+    Stage('charts', charts_stage, ('protection', 'sheep'), 'save the bar charts as png files', cache=False),
+]
+
 
-baseline_conversion_rate_yellow = 10 #percent
+def add_arguments(parser):
+    parser.add_argument('--stream', action='store_true', help="stream observations.csv in chunks instead of loading it all at once")
+    parser.add_argument('--incremental', action='store_true', help='only read the observations appended since the last run and update the saved totals')
 
-#Therefore, our sample size requirement is 610!
-sample_size_per_variant = 610
 
-### How many weeks would you need to observe at Yellowstone National Park to observe enough sheep?
+def main(argv=None):
+    return stage_main('Biodiversity in National Parks analysis.', STAGES, argv, add_arguments)
 
-#Below we calculate for Yellowstone National Park since that was the data we had on hand in the instructions:
-yellowstone = 610 / 507.
 
-#Outputting the length of time in weeks for each Park:
-print('It would therefore take approximately ' + str(bryce) + ' weeks at Bryce National and ' + str(yellowstone) + ' weeks at Yellowstone National to generate sufficient sample sizes.')
\ No newline at end of file
+if __name__ == '__main__':
+    main()
\ No newline at end of file
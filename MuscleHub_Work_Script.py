@@ -1,301 +1,289 @@
-from codecademySQL import sql_query
-import pandas as pd
-from matplotlib import pyplot as plt
-from scipy.stats import chi2_contingency
+from analysis_stages import Stage, stage_main
 
 
 #----------------------------
 #----------------------------
 
+### RUNNING THIS SCRIPT ###
 
-#The following code re-orients the dataframe: The first line of code allows every column to be viewed, while the second line prevents each column from wrapping, so that
-#every column is on the same line/axis
-pd.set_option('display.max_columns', None)
-pd.set_option('display.expand_frame_repr', False)
+#This script is split into named stages so we can run just the part we need, e.g.:
+#   python MuscleHub_Work_Script.py                                 (everything, top to bottom)
+#   python MuscleHub_Work_Script.py funnel                          (just the funnel frequency tables)
+#   python MuscleHub_Work_Script.py chi_square --start-date 2017-08-01
+#   python MuscleHub_Work_Script.py funnel --incremental            (only read the table rows appended since the last run)
+#   python MuscleHub_Work_Script.py monitor                         (sequential A/B test on the events appended since the last run)
+#   python MuscleHub_Work_Script.py --list                          (every stage and what it needs)
+#The libraries each stage uses (pandas, scipy, matplotlib...) are imported INSIDE that stage, so a stage never pays for imports it doesn't use
+#Each stage's results are cached in '.cache/stages/' and reused until its input files, options or code change (see stage_cache.py). Pass '--no-cache' to recompute everything
 
 
 #----------------------------
 #----------------------------
 
-### INSPECTING AND CLEANING DATA TO PRODUCE WORKABLE DATAFRAME ###
-
-visits = sql_query('''
-SELECT *
-FROM visits
-LIMIT 5
-''')
-print(visits)
-print('\n')
-
-fitness_tests = sql_query('''
-SELECT *
-FROM fitness_tests
-LIMIT 5
-''')
-print(fitness_tests)
-print('\n')
-
-applications = sql_query('''
-SELECT *
-FROM applications
-LIMIT 5
-''')
-print(applications)
-print('\n')
-
-purchases = sql_query('''
-SELECT *
-FROM purchases
-LIMIT 5
-''')
-print(purchases)
-print('\n----------------------------------------\n')
-
-#Creating a dataframe with all relevant info from four datasets using SQL Queries:
-df = sql_query('''
-SELECT visits.first_name,
-       visits.last_name,
-       visits.email,
-       visits.gender,
-       visits.visit_date,
-       fitness_tests.fitness_test_date,
-       applications.application_date,
-       purchases.purchase_date
-FROM visits
-LEFT JOIN fitness_tests
-    ON fitness_tests.first_name = visits.first_name
-    AND fitness_tests.last_name = visits.last_name
-    AND fitness_tests.email = visits.email
-LEFT JOIN applications
-    ON applications.first_name = visits.first_name
-    AND applications.last_name = visits.last_name
-    AND applications.email = visits.email
-LEFT JOIN purchases
-    ON purchases.first_name = visits.first_name
-    AND purchases.last_name = visits.last_name
-    AND purchases.email = visits.email
-WHERE visits.visit_date >= '7-1-17'
-''')
-print(df)
-print('\n----------------------------------------\n')
+
+#The following code re-orients the dataframe: The first line of code allows every column to be viewed, while the second line prevents each column from wrapping, so that
+#every column is on the same line/axis
+def display_options():
+    import pandas as pd
+    pd.set_option('display.max_columns', None)
+    pd.set_option('display.expand_frame_repr', False)
 
 
 #----------------------------
 #----------------------------
 
-### ADDING COLUMNS TO DATAFRAME (DF) ###
-
-df['ab_test_group'] = df.fitness_test_date.apply(lambda x: 'A' if pd.notnull(x) else 'B')
-print(df)
-print('\n----------------------------------------\n')
-
-#Counting up the number of Group A vs. Group B people using Groupby and counting up each person using their first_name -- ***NOTE: We'll be using 'first_name' to count up each group!
-ab_counts = df.groupby('ab_test_group').first_name.count().reset_index()
-print(ab_counts)
-print('\n')
-
-#Creating a pie chart to visualize our frequency table - ***NOTE: We add the legend in the first line by using labels
-# plt.pie(ab_counts.first_name.values, labels=['A', 'B'], autopct='%0.2f%%')
-# plt.axis('equal')
-# plt.show()
-# # Saving the pie chart to our project notebook as a png file
-# plt.savefig('ab_test_pie_chart.png')
-
-#------------------------------
-
-#Creating another column for number of actual applicants (Same as we did above for fitness_test_dates)
-df['is_application'] = df.application_date.apply(lambda x: 'Application' if pd.notnull(x) else 'No Application')
-print(df)
-print('\n')
-
-#Creating another frequency table, but this time for applicants vs ab_counts
-app_counts = df.groupby(['ab_test_group', 'is_application']).first_name.count().reset_index()
-print(app_counts)
-print('\n')
-
-#Rearranging the newly created frequency table by using "pivot()" function to rearrange "app_counts"
-app_pivot = app_counts.pivot(columns='is_application',
-                             index='ab_test_group',
-                             values='first_name')\
-                             .reset_index()
-print(app_pivot)
-print('\n')
-
-#Creating a new column for our pivoted frequency table that totals number of apps vs. no_apps
-app_pivot['Total'] = app_pivot.Application + app_pivot['No Application']
-print(app_pivot)
-print('\n')
-
-#Creating a new column for our pivoted frequency table that calculates the percentages of apps vs. no_apps
-app_pivot['Percent with Application'] = app_pivot.Application / app_pivot.Total
-print(app_pivot)
-print('\n')
+def tables_stage(data):
+    from musclehub_db import sql_query
+
+    display_options()
+    db_path = data['options'].db
+
+    ### INSPECTING AND CLEANING DATA TO PRODUCE WORKABLE DATAFRAME ###
+
+    visits = sql_query('''
+    SELECT *
+    FROM visits
+    LIMIT 5
+    ''', db_path=db_path)
+    print(visits)
+    print('\n')
+
+    fitness_tests = sql_query('''
+    SELECT *
+    FROM fitness_tests
+    LIMIT 5
+    ''', db_path=db_path)
+    print(fitness_tests)
+    print('\n')
+
+    applications = sql_query('''
+    SELECT *
+    FROM applications
+    LIMIT 5
+    ''', db_path=db_path)
+    print(applications)
+    print('\n')
+
+    purchases = sql_query('''
+    SELECT *
+    FROM purchases
+    LIMIT 5
+    ''', db_path=db_path)
+    print(purchases)
+    print('\n----------------------------------------\n')
+
+    return {}
+
 
 #----------------------------
 #----------------------------
 
-### RUNNING A HYPOTHESIS TEST TO MEASURE SIGNIFICANCE BETWEEN BOTH GROUPS ###
+def funnel_stage(data):
+    from musclehub_db import load_funnel
+    from musclehub_funnel import add_funnel_flags, funnel_contingency
+    from incremental import update_funnel_counts
+
+    display_options()
+
+    #Run with '--incremental' when the four table CSVs only ever grow at the end: instead of joining them again, we keep every visitor's funnel flags and
+    #the 8 funnel counts from the last run (in '.cache/incremental/'), read only the rows appended since, and move just the visitors they mention to
+    #their new cell (see incremental.py). There's no joined "df" to print then, only the tables
+    if data['options'].incremental:
+        funnel_tables, reports = update_funnel_counts('.', start_date=data['options'].start_date)
+        for report in reports:
+            print('{}: {} new rows{}'.format(report.source, report.rows, ' (read from the top)' if report.reset else ''))
+        print('\n----------------------------------------\n')
+        df = None
+    else:
+        #Creating a dataframe with all relevant info from four datasets using SQL Queries - ***NOTE: The four-way LEFT JOIN on (first_name, last_name, email)
+        #now lives in 'musclehub_db.py' as 'FUNNEL_QUERY'. It runs against our local SQLite file where the join key is indexed and the dates are real dates,
+        #so the old "visit_date >= '7-1-17'" string comparison is now an actual date comparison (pass '--start-date' to change it)
+        df = load_funnel(start_date=data['options'].start_date, db_path=data['options'].db)
+        print(df)
+        print('\n----------------------------------------\n')
+
+
+        #----------------------------
+        #----------------------------
+
+        ### ADDING COLUMNS TO DATAFRAME (DF) ###
+
+        #Adding every funnel flag ('ab_test_group', 'is_application' and 'is_member') in one vectorized pass - ***NOTE: This used to be three separate
+        #'.apply(lambda x: ...)' calls, one Python function call per visitor per column. See benchmarks/bench_funnel_flags.py for the speedup!
+        add_funnel_flags(df)
+        print(df)
+        print('\n----------------------------------------\n')
+
+        #Building EVERY frequency table we need for the funnel in one single scan of "df" - ***NOTE: This replaces three separate groupby -> count -> pivot -> Total -> Percent
+        #pipelines that each re-scanned the whole dataframe. 'funnel_contingency()' counts all 8 (group x application x member) cells at once with 'np.bincount()',
+        #and every pivot below is just a slice or a sum of those 8 numbers!
+        funnel_tables = funnel_contingency(df)
+
+    #Counting up the number of Group A vs. Group B people -- ***NOTE: Just like before, we're using 'first_name' to count up each group!
+    ab_counts = funnel_tables.ab_counts
+    print(ab_counts)
+    print('\n')
 
-#Since we're comparing statistical significance between two cat variables with multiple sub-variables, we should use a chi-squared test
+    #Creating a pie chart to visualize our frequency table - ***NOTE: We add the legend in the first line by using labels
+    # plt.pie(ab_counts.first_name.values, labels=['A', 'B'], autopct='%0.2f%%')
+    # plt.axis('equal')
+    # plt.show()
+    # # Saving the pie chart to our project notebook as a png file
+    # plt.savefig('ab_test_pie_chart.png')
 
-#Creating the contingency table -- ***NOTE: We're running the test with Group A first
-contingency = [[250,2254], [325,2175]]
+    #------------------------------
 
-#Running a chi-squared test
-chi2_contingency(contingency)
+    #Our frequency table for applicants vs ab_counts, already pivoted with the 'Total' and 'Percent with Application' columns (apps vs. no_apps)
+    app_pivot = funnel_tables.app_pivot
+    print(app_pivot)
+    print('\n')
 
-print('The results of our chi-squared test DID in fact reveal statistically significant difference between GroupA and GroupB, as shown below:\
-\n' + str(chi2_contingency(contingency)))
-print('\n------------------------------\n')
+    #----------------------------
+    #----------------------------
+
+    ### CREATING A FREQUENCY CHART FOR APPLICATIONS VS. ACTUAL PURCHASES ###
+
+    #Our frequency table of people who ONLY picked up an application. THIS IS IMPORTANT! Because we are ONLY interested in actual applications because
+    #nobody will have made a purchase if they didn't first apply! It's the (group x member) slice of our counts for applicants only, with 'Total' and
+    #'Percent Purchase' columns for Members vs. Not Members
+    member_pivot = funnel_tables.member_pivot
+    print(member_pivot)
+    print('\n')
+
+    #----------------------------
+    #----------------------------
+
+    ### CREATING A FREQUENCY TABLE FOR VISITORS VS. PURCHASES ###
+
+    #Same frequency table as before, but instead of only applicants, we're comparing the total number of visitors from Groups A and B by their membership status!
+    final_member_pivot = funnel_tables.final_member_pivot
+    print(final_member_pivot)
+    print('\n')
+
+    return {'df': df, 'funnel_tables': funnel_tables, 'ab_counts': ab_counts, 'app_pivot': app_pivot, 'member_pivot': member_pivot,
+            'final_member_pivot': final_member_pivot}
 
 
 #----------------------------
 #----------------------------
 
-### CREATING A FREQUENCY CHART FOR APPLICATIONS VS. ACTUAL PURCHASES ###
+def chi_square_stage(data):
+    from chi_square_tests import pair_result, significance_sentence
+
+    ### RUNNING A HYPOTHESIS TEST TO MEASURE SIGNIFICANCE BETWEEN BOTH GROUPS ###
 
-#We're going to add another column to our main DF that shows the number of applications that resulted in a purchase
-print(df)
-print('\n')
+    #Since we're comparing statistical significance between two cat variables with multiple sub-variables, we should use a chi-squared test
 
-df['is_member'] = df.purchase_date.apply(lambda x: 'Member' if pd.notnull(x) else 'Not Member')
-print(df)
-print('\n')
+    #Building the contingency table straight from "app_pivot" and running the chi-squared test -- ***NOTE: We're running the test with Group A first.
+    #The test result is cached, so we only compute it once even though we print it
+    #Whether the difference is significant is read off the p-value against '--alpha', so the sentence always agrees with the numbers under it
+    alpha = data['options'].alpha
+    app_test = pair_result(data['app_pivot'], 'ab_test_group', ['Application', 'No Application'], 'A', 'B')
 
-#Creating a new DF for people who ONLY picked up an application. THIS IS IMPORTANT! Because we are ONLY interested in actual applications because
-#nobody will have made a purchase if they didn't first apply! For the purposes of creating a frequency table next, we don't need to use our main DF, "df", just "just_apps"
-just_apps = df[df.is_application == 'Application']
-print(just_apps)
+    print(significance_sentence(app_test, 'Group A', 'Group B', alpha) + '\n' + str(app_test))
+    print('\n------------------------------\n')
 
-#Creating a frequency table of people who submitted an application to see what A or B group they belong to - ***NOTE: We DO NOT need to include "Application Counts" in
-#our frequency table. Why? Because we already filtered a new dataframe called, "just_apps" that is ONLY made up of data from people who submitted Applications! So really wer're
-#just trying to determine from that DF, what number/percent went on to actually become a member by making a purchase from "purchase_date"
-member_counts = just_apps.groupby(['ab_test_group', 'is_member']).first_name.count().reset_index()
-print(member_counts)
-print('\n')
+    #Building the contingency table straight from "member_pivot" (applicants only) and running the chi-squared test -- ***NOTE: We're running the test with Group A first
+    member_test = pair_result(data['member_pivot'], 'ab_test_group', ['Member', 'Not Member'], 'A', 'B')
 
-#Rearranging the newly created frequency table by using "pivot()" function to rearrange "member_counts"
-member_pivot = member_counts.pivot(columns='is_member',
-                                   index='ab_test_group',
-                                   values='first_name')\
-                                   .reset_index()
-print(member_pivot)
-print('\n')
+    print(significance_sentence(member_test, 'Group A', 'Group B', alpha) + '\n' + str(member_test))
+    print('\n------------------------------\n')
 
-#Creating a new column for our pivoted frequency table that totals number of Members vs. Non-members
-member_pivot["Total"] = member_pivot['Member'] + member_pivot['Not Member']
-print(member_pivot)
-print('\n')
+    #Building the contingency table straight from "final_member_pivot" (all visitors) and running the chi-squared test -- ***NOTE: We're running the test with Group A first
+    final_member_test = pair_result(data['final_member_pivot'], 'ab_test_group', ['Member', 'Not Member'], 'A', 'B')
 
-#Creating a new column for our pivoted frequency table that calculates the percentages of Members vs. Not Members
-member_pivot['Percent Purchase'] = member_pivot['Member'] / member_pivot['Total']
-print(member_pivot)
-print('\n')
+    print(significance_sentence(final_member_test, 'Group A', 'Group B', alpha) + '\n' + str(final_member_test))
+    print('\n------------------------------\n')
+
+    return {'app_test': app_test, 'member_test': member_test, 'final_member_test': final_member_test}
 
 
 #----------------------------
 #----------------------------
 
-### RUNNING A HYPOTHESIS TEST TO MEASURE SIGNIFICANCE BETWEEN BOTH GROUPS ###
+def monitor_stage(data):
+    from sequential_ab import monitor_funnel_csvs
 
-#Since we're comparing statistical significance between two cat variables with multiple sub-variables, we should use a chi-squared test just as before!
+    display_options()
 
-#Creating the contingency table -- ***NOTE: We're running the test with Group A first
-contingency2 = [[200,50], [250,75]]
+    ### WATCHING THE EXPERIMENT AS IT RUNS ###
 
-#Running a chi-squared test
-chi2_contingency(contingency2)
+    #The chi-squared tests above are only valid if we look ONCE. Since the experiment keeps running, this stage treats every visit, fitness test, application
+    #and purchase as an event, feeds the ones appended to the CSVs since the last run into a saved monitor one day at a time, and runs a sequential test
+    #(mSPRT) on each funnel step after every day - ***NOTE: Its p-values stay valid no matter how often we check, so we can stop the experiment as soon as
+    #one drops below '--alpha' (see sequential_ab.py). The first run replays the whole history, later runs only read the new rows
+    monitor, reports = monitor_funnel_csvs('.', start_date=data['options'].start_date, alpha=data['options'].alpha)
+    for report in reports:
+        print('{}: {} new rows{}'.format(report.source, report.rows, ' (read from the top)' if report.reset else ''))
+    sequential_status = monitor.status()
+    print('\nSequential test of Group A vs. Group B at each funnel step, after {} events:\n'.format(monitor.events) + str(sequential_status) + '\n')
 
-print('The results of our chi-squared test DID NOT in fact reveal statistically significant difference between GroupA and GroupB, as shown below:\
-\n' + str(chi2_contingency(contingency2)))
-print('\n------------------------------\n')
+    return {'sequential_status': sequential_status}
 
 
 #----------------------------
 #----------------------------
 
-### CREATING A FREQUENCY TABLE FOLLOWED-BY A CHI-SQUARED TEST TO TEST FOR SIGNIFICANCE BETWEEN VISITORS AND PURCHASES ###
+def charts_stage(data):
+    from chart_rendering import bar_chart, render_charts
+
+    ### VISUALIZING OUR DATA BY USING BARCHARTS USING MATPLOTLIB (You can also use Seaborn!) ###
+
+    #Describing each barchart as a chart spec first, then drawing all three at once -- ***NOTE: The charts are rendered off-screen (no 'plt.show()' window to
+    #close) in parallel worker processes and saved straight to disk, so the png files actually contain the charts!
+    group_labels = ['Fitness Test', 'No Fitness Test']
+    percent_ticks = [0, 0.05, 0.10, 0.15, 0.20]
 
-#Let's start by creating a frequency table as we did twice before, but instead of filtering out info, we're going to compare total number of visitors
-#from Groups A and B by their membership status! -- ***HINT: It's the same block of code as before, but we're just using the "df" dataframe instead of "just_apps"!
-final_member_counts = df.groupby(['ab_test_group', 'is_member']).first_name.count().reset_index()
-# print(final_member_counts)
-# print('\n')
+    chart_specs = [
+        #Creating a barchart for the percentage of visitors who applied
+        bar_chart('percent_visitors_apply.png', group_labels, data['app_pivot']['Percent with Application'].values,
+                  title='Percentage of Visitors who Applied for Membership', yticks=percent_ticks, yticklabels='percent'),
 
-#Rearranging the newly created frequency table by using "pivot()" function to rearrange "final_member_counts" DF
-final_member_pivot = final_member_counts.pivot(columns='is_member',
-                                               index='ab_test_group',
-                                               values='first_name')\
-                                               .reset_index()
-# print(final_member_pivot)
-# print('\n')
+        #Creating a barchart for the percentage of applicants who purchased membership
+        bar_chart('percent_applicants_purchase.png', group_labels, data['member_pivot']['Percent Purchase'].values,
+                  title='Percentage of Applicants who Purchased Membership',
+                  yticks=[0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0], yticklabels='percent'),
 
-#Creating a new column for our pivoted frequency table that totals number of Members vs. Non-members
-final_member_pivot['Total'] = final_member_pivot['Member'] + final_member_pivot['Not Member']
-# print(final_member_pivot)
-# print('\n')
+        #Creating a barchart for the percentage of visitors who purchased membership
+        bar_chart('percent_visitors_purchase.png', group_labels, data['final_member_pivot']['Percent Purchase'].values,
+                  title='Percentage of Total Visitors who Purchased Membership', yticks=percent_ticks, yticklabels='percent'),
+    ]
 
+    saved_charts = render_charts(chart_specs)
+    print('Saved the following charts: ' + str(saved_charts))
 
-#Creating a new column for our pivoted frequency table that calculates the percentages of Members vs. Not Members
-final_member_pivot['Percent Purchase'] = final_member_pivot.Member / final_member_pivot['Total']
-print(final_member_pivot)
-print('\n')
+    return {'saved_charts': saved_charts}
 
 
 #----------------------------
 #----------------------------
 
-### RUNNING A HYPOTHESIS TEST TO MEASURE SIGNIFICANCE BETWEEN BOTH GROUPS ###
+### STAGES AND COMMAND LINE ###
 
-#Since we're comparing statistical significance between two cat variables with multiple sub-variables, we should use a chi-squared test just as before!
+#The stages that read the database are keyed on the CSVs it's built from rather than on the .db file, which 'connect()' may rebuild while the
+#stage runs, after its key was worked out
+TABLE_CSVS = ('visits.csv', 'fitness_tests.csv', 'applications.csv', 'purchases.csv')
 
-#Creating the contingency table -- ***NOTE: We're running the test with Group A first
-contingency3 = [[200,2304], [250,2250]]
+STAGES = [
+    Stage('tables', tables_stage, (), 'preview the first rows of the four MuscleHub tables', files=TABLE_CSVS, params=('db',)),
+    Stage('funnel', funnel_stage, (), 'join the tables and build the A/B funnel frequency tables',
+          files=TABLE_CSVS, params=('db', 'start_date', 'incremental')),
+    Stage('chi_square', chi_square_stage, ('funnel',), 'chi-squared tests between Group A and Group B at each funnel step', params=('alpha',)),
+    Stage('monitor', monitor_stage, (), 'sequential A/B test over the events appended since the last run, with early stopping', cache=False),
+    Stage('charts', charts_stage, ('funnel',), 'save the funnel bar charts as png files', cache=False),
+]
 
-#Running a chi-squared test
-chi2_contingency(contingency3)
 
-print('The results of our chi-squared test DID in fact reveal statistically significant difference between GroupA and GroupB, as shown below:\
-\n' + str(chi2_contingency(contingency3)))
-print('\n------------------------------\n')
+def add_arguments(parser):
+    parser.add_argument('--start-date', default='2017-07-01', help='only include visits on or after this date (default: 2017-07-01)')
+    parser.add_argument('--db', default='musclehub.db', help='SQLite database to read (built from the table CSVs if missing or out of date)')
+    parser.add_argument('--incremental', action='store_true', help='only read the table rows appended since the last run and update the saved funnel counts')
+    parser.add_argument('--alpha', type=float, default=0.05, help="significance level of the chi-squared tests and the 'monitor' stage's sequential test (default: 0.05)")
 
 
-#----------------------------
-#----------------------------
+def main(argv=None):
+    return stage_main('MuscleHub A/B test analysis.', STAGES, argv, add_arguments)
+
 
-### VISUALIZING OUR DATA BY USING BARCHARTS USING MATPLOTLIB (You can also use Seaborn!) ###
-
-#Creating a barchart for the percentage of visitors who applied
-ax = plt.subplot()
-plt.bar(range(len(app_pivot)), app_pivot['Percent with Application'].values)
-ax.set_xticks(range(len(app_pivot)))
-ax.set_xticklabels(['Fitness Test', 'No Fitness Test'])
-ax.set_yticks([0, 0.05, 0.10, 0.15, 0.20])
-ax.set_yticklabels(['0%', '5%', '10%', '15%', '20%'])
-plt.title('Percentage of Visitors who Applied for Membership')
-plt.show()
-plt.savefig('percent_visitors_apply.png')
-
-
-#Creating a barchart for the percentage of applicants who purchased membership
-ax = plt.subplot()
-plt.bar(range(len(member_pivot)), member_pivot['Percent Purchase'].values)
-ax.set_xticks(range(len(member_pivot)))
-ax.set_xticklabels(['Fitness Test', 'No Fitness Test'])
-ax.set_yticks([0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0])
-ax.set_yticklabels(['0%', '10%', '20%', '30%', '40%', '50%', '60%', '70%', '80%', '90%', '100%'])
-plt.title('Percentage of Applicants who Purchased Membership')
-plt.show()
-plt.savefig('percent_applicants_purchase.png')
-
-
-#Creating a barchart for the percentage of visitors who purchased membership
-ax = plt.subplot()
-plt.bar(range(len(final_member_pivot)), final_member_pivot['Percent Purchase'].values)
-ax.set_xticks(range(len(final_member_pivot)))
-ax.set_xticklabels(['Fitness Test', 'No Fitness Test'])
-ax.set_yticks([0, 0.05, 0.10, 0.15, 0.20])
-ax.set_yticklabels(['0%', '5%', '10%', '15%', '20%'])
-plt.title('Percentage of Total Visitors who Purchased Membership')
-plt.show()
-plt.savefig('percent_visitors_purchase.png')
\ No newline at end of file
+if __name__ == '__main__':
+    main()
\ No newline at end of file
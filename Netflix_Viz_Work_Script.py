@@ -1,223 +1,427 @@
-import pandas as pd
-import numpy as np
-import seaborn as sns
-from matplotlib import pyplot as plt
+import os
+
+from analysis_stages import Stage, stage_main
 
 
 #-----------------------------------
 #-----------------------------------
 
-### LOADING THE DATASETS AND INSPECTING THEM ###
+### RUNNING THIS SCRIPT ###
+
+#This script is split into named stages so we can run just the part we need, e.g.:
+#   python Netflix_Viz_Work_Script.py                  (everything, top to bottom)
+#   python Netflix_Viz_Work_Script.py distribution     (just the price distribution summary)
+#   python Netflix_Viz_Work_Script.py --list           (every stage and what it needs)
+#   python Netflix_Viz_Work_Script.py --store prices   (open the prices from a memory-mapped price store instead of the CSVs)
+#   python Netflix_Viz_Work_Script.py analytics --incremental   (only read the NFLX and DJI rows appended since the last run for the rolling table)
+#The libraries each stage uses (pandas, matplotlib...) are imported INSIDE that stage, so a stage never pays for imports it doesn't use
+#Each stage's results are cached in '.cache/stages/' and reused until its input files, options or code change (see stage_cache.py). Pass '--no-cache' to recompute everything
+
+
+#-----------------------------------
+#-----------------------------------
 
 #The following code re-orients the dataframe. The first line allows every column to be viewed. The second line prevents each column from wrapping, so that
-#every column is on the same line/axis
-pd.set_option('display.max_columns', None)
-pd.set_option('display.expand_frame_repr', False)
+#every column is on the same line/axis - ***NOTE: Every stage that prints a dataframe calls this itself, since the stage that used to set it may be
+#loaded from the stage cache instead of running
+def display_options():
+    import pandas as pd
+    pd.set_option('display.max_columns', None)
+    pd.set_option('display.expand_frame_repr', False)
+
+
+#-----------------------------------
+#-----------------------------------
+
+#Each CSV is converted into the store the first time it's seen (and again whenever it changes). After that, opening a ticker is just mapping its
+#'.npy' files, no matter how many tickers the store holds. A CSV that isn't here is fine too, as long as the store already has its ticker
+STORE_SYMBOLS = {'NFLX.csv': 'NFLX', 'NFLX_daily_by_quarter.csv': 'NFLX_daily', 'DJI.csv': 'DJI'}
+
+
+def load_from_store(store_dir):
+    from price_store import PriceStore
+
+    store = PriceStore(store_dir)
+    for path, symbol in STORE_SYMBOLS.items():
+        if os.path.exists(path):
+            store.ingest_csv(path, symbol)
+    netflix_stocks, netflix_stock_quar, dowjones_industrial = [store.frame(symbol) for symbol in STORE_SYMBOLS.values()]
+
+    #The store only keeps the numbers, so the 'Quarter' labels ('Q1'...'Q4') are worked out again from the dates
+    netflix_stock_quar['Quarter'] = 'Q' + netflix_stock_quar.Date.dt.quarter.astype(str)
+    return netflix_stocks, netflix_stock_quar, dowjones_industrial
+
+
+def load_stage(data):
+    import pandas as pd
+
+    ### LOADING THE DATASETS AND INSPECTING THEM ###
 
-#Importing datasets as dataframes
-netflix_stocks = pd.read_csv('NFLX.csv')
-# print(netflix_stocks)
-# print('\n')
+    display_options()
 
-netflix_stock_quar = pd.read_csv('NFLX_daily_by_quarter.csv')
-print(netflix_stock_quar)
-print('\n')
+    #With '--store DIR' the prices are opened from the memory-mapped price store instead of parsing the CSVs (see price_store.py)
+    store_dir = getattr(data['options'], 'store', None)
+    if store_dir:
+        netflix_stocks, netflix_stock_quar, dowjones_industrial = load_from_store(store_dir)
+        print(netflix_stock_quar)
+        print('\n')
+        return {'netflix_stocks': netflix_stocks, 'netflix_stock_quar': netflix_stock_quar, 'dowjones_industrial': dowjones_industrial}
 
-dowjones_industrial = pd.read_csv('DJI.csv')
-# print(netflix_stock_quar)
-# print('\n')
+    #Importing datasets as dataframes
+    netflix_stocks = pd.read_csv('NFLX.csv')
+    # print(netflix_stocks)
+    # print('\n')
 
-### What questions can we ask?
+    netflix_stock_quar = pd.read_csv('NFLX_daily_by_quarter.csv')
+    print(netflix_stock_quar)
+    print('\n')
 
-#1) What year is represented by the data? 2017
-#2) Is the data represented in days, weeks, or months? "netflix_stocks" is by MONTH, and "netflix_stock_quar" & "dowjones_industrial" is DAY
+    dowjones_industrial = pd.read_csv('DJI.csv')
+    # print(netflix_stock_quar)
+    # print('\n')
+
+    ### What questions can we ask?
+
+    #1) What year is represented by the data? 2017
+    #2) Is the data represented in days, weeks, or months? "netflix_stocks" is by MONTH, and "netflix_stock_quar" & "dowjones_industrial" is DAY
+
+
+    #-----------------------------------
+    #-----------------------------------
+
+    ### MANIPULATING THE DATA ###
+
+    #Changing column name of "Adj Close" to just "Price" so that it's easier to work with the data. We will do it for both our "netflix_stocks" and "dowjones_industrial" DF's
+    netflix_stocks.rename(columns={'Adj Close':'Price'}, inplace=True)
+    # print(netflix_stocks)
+    # print('\n')
+
+    netflix_stock_quar.rename(columns={'Adj Close':'Price'}, inplace=True)
+    # print(netflix_stock_quar)
+    # print('\n')
+
+    dowjones_industrial.rename(columns={'Adj Close':'Price'}, inplace=True)
+    # print(dowjones_industrial)
+    # print('\n')
+
+    return {'netflix_stocks': netflix_stocks, 'netflix_stock_quar': netflix_stock_quar, 'dowjones_industrial': dowjones_industrial}
 
 
 #-----------------------------------
 #-----------------------------------
 
-### MANIPULATING THE DATA ###
+def distribution_stage(data):
+    from chart_rendering import ChartSpec
+    from price_distributions import latest_groups, ticker_quarter_distributions, violin_panel
 
-#Changing column name of "Adj Close" to just "Price" so that it's easier to work with the data. We will do it for both our "netflix_stocks" and "dowjones_industrial" DF's
-netflix_stocks.rename(columns={'Adj Close':'Price'}, inplace=True)
-# print(netflix_stocks)
-# print('\n')
+    display_options()
 
-netflix_stock_quar.rename(columns={'Adj Close':'Price'}, inplace=True)
-# print(netflix_stock_quar)
-# print('\n')
+    ### VISUALIZING THE DISTRIBUTION OF DATA ###
 
-dowjones_industrial.rename(columns={'Adj Close':'Price'}, inplace=True)
-# print(dowjones_industrial)
-# print('\n')
+    #Creating a violin plot using seaborn to calculate and measure several distributions like the densities of data points, as well as a 5-point data summary - ***NOTE: It's a combination of box-whisker plots and
+    #Kernel Density Estimator (KDE) plots! It's super useful as it takes the distribution given by a histogram (smooth line instead of rectangular boxes (think sand pile instead of box on data point) while giving
+    #5 point data summary of a box-and-whisker plot)
+
+    #We're going to plot the "price" column. We're going to set our violin plot to the variable, "ax" because that allows us to instantiate the figure to allow us access to the axes using matplotlib!
+    # ax = sns.violinplot(netflix_stocks.Price, color='red')
+    # ax.set(xlabel ="", ylabel = "Price", title ='Distribution of 2017 Netflix Stock Price')
+    # plt.show()
+
+    #Instead of seaborn working out a KDE every time it draws, we compute the 5-point data summary AND the KDE of every ticker and quarter in one
+    #batch (see price_distributions.py). They're small arrays, so they're cached with this stage and the violins are drawn straight from them
+    price_distributions, price_densities = ticker_quarter_distributions({'NFLX': data['netflix_stock_quar'], 'DJI': data['dowjones_industrial']})
+
+    #The 5-point data summary of the daily price for each quarter, as a table
+    price_summary = price_distributions.loc['NFLX']
+    print('Summary of the 2017 Netflix daily stock price by quarter:\n' + str(price_summary) + '\n')
+
+    #One violin per quarter, Netflix on the left and the Dow Jones on the right (their prices are on very different scales). Only the latest
+    #'--quarters' quarters are drawn, so a history of many years still gives a readable chart that draws quickly (the table above has them all)
+    quarters = data['options'].quarters
+    distribution_chart = ChartSpec('netflix_price_distribution.png', [
+        violin_panel(price_densities, price_distributions, latest_groups(price_densities.groups, 'NFLX', quarters),
+                     title='Distribution of 2017 Netflix Stock Price', xlabel='Quarter', ylabel='Price', color='red'),
+        violin_panel(price_densities, price_distributions, latest_groups(price_densities.groups, 'DJI', quarters),
+                     title='Distribution of 2017 Dow Jones Price', xlabel='Quarter', ylabel='Price', color='blue')],
+        figsize=(12, 5))
+
+    return {'price_summary': price_summary, 'price_distributions': price_distributions, 'price_densities': price_densities,
+            'distribution_chart': distribution_chart}
 
 
 #-----------------------------------
 #-----------------------------------
 
-### VISUALIZING THE DISTRIBUTION OF DATA ###
+def align_stage(data):
+    from price_alignment import align_prices
+
+    display_options()
+
+    ### LINING UP THE MONTHLY NETFLIX PRICES WITH THE DAILY DOW JONES PRICES ###
+
+    #"netflix_stocks" has one row per MONTH but "dowjones_industrial" has one row per DAY, so their 'Date' columns don't match up. We parse the dates once
+    #and put both on the same calendar in a single wide frame with a column for every (field, ticker):
 
-#Creating a violin plot using seaborn to calculate and measure several distributions like the densities of data points, as well as a 5-point data summary - ***NOTE: It's a combination of box-whisker plots and
-#Kernel Density Estimator (KDE) plots! It's super useful as it takes the distribution given by a histogram (smooth line instead of rectangular boxes (think sand pile instead of box on data point) while giving
-#5 point data summary of a box-and-whisker plot)
+    #1) Monthly: the daily Dow Jones rows are rolled up into monthly OHLC bars (first Open, highest High, lowest Low, last Close, total Volume)
+    monthly_prices = align_prices({'NFLX': data['netflix_stocks'], 'DJI': data['dowjones_industrial']}, freq='MS',
+                                  fields=('Open', 'High', 'Low', 'Close', 'Price', 'Volume'))
+    print('Monthly Netflix and Dow Jones prices on the same calendar:\n' + str(monthly_prices['Price']) + '\n')
 
-#We're going to plot the "price" column. We're going to set our violin plot to the variable, "ax" because that allows us to instantiate the figure to allow us access to the axes using matplotlib!
-# ax = sns.violinplot(netflix_stocks.Price, color='red')
-# ax.set(xlabel ="", ylabel = "Price", title ='Distribution of 2017 Netflix Stock Price')
-# plt.show()
+    #Now comparing both tickers is one calculation over the whole frame instead of one per chart, e.g. the monthly percent change of each
+    print('Monthly percent change in price:\n' + str(monthly_prices['Price'].pct_change(fill_method=None)) + '\n')
+
+    #2) Daily: every Dow Jones trading day gets the latest monthly Netflix price known "as of" that day
+    daily_prices = align_prices({'NFLX': data['netflix_stocks'], 'DJI': data['dowjones_industrial']}, calendar='DJI')
+    print('Daily Dow Jones prices with the monthly Netflix price as of each day (first 5 days):\n' + str(daily_prices.head()) + '\n')
+
+    return {'monthly_prices': monthly_prices, 'daily_prices': daily_prices}
 
 
 #-----------------------------------
 #-----------------------------------
 
-### VISUALIZING THE DATA USING SCATTERPLOT ###
+def analytics_stage(data):
+    from price_analytics import price_panel, log_returns, rolling_volatility, rolling_correlation, rolling_beta, drawdowns, price_statistics
+    from incremental import update_rolling_comparison
+
+    display_options()
+
+    ### MEASURING RETURNS, RISK AND HOW NETFLIX MOVES WITH THE DOW JONES ###
+
+    #Lining up the daily NFLX and DJI prices in one "price panel": one row per date (parsed as real dates) and one column per ticker. Every calculation
+    #below runs on the whole panel at once, so adding more tickers is just adding more columns!
+    prices = price_panel({'NFLX': data['netflix_stock_quar'], 'DJI': data['dowjones_industrial']})
 
-#In this next exercise, we will chart the performance of dividends by their estimated projected value and their actual value per QUARTER using a very simple scatterplot
-x_positions = [1, 2, 3, 4]
-chart_labels = ["1Q2017","2Q2017","3Q2017","4Q2017"]
-earnings_actual =[.4, .15,.29,.41]
-earnings_estimate = [.37,.15,.32,.41]
+    #Daily log returns, plus the one-month (21 trading days) rolling volatility, annualized
+    returns = log_returns(prices)
+    volatility = rolling_volatility(returns, window=21)
 
-plt.scatter(x_positions, earnings_estimate, color='blue', alpha=0.5)
-plt.scatter(x_positions, earnings_actual, color='red', alpha=0.5)
-plt.xticks(x_positions, chart_labels)
-plt.legend(['Estimate', 'Actual'])
-plt.title("Earnings Per Share in Cents")
-plt.show()
+    #How closely Netflix follows the Dow Jones over a rolling quarter (63 trading days): correlation, and beta (how much NFLX moves for every 1% the DJI moves)
+    #Run with '--incremental' when the price CSVs only ever grow at the end: the rolling table is kept in '.cache/incremental/' and only the days appended
+    #since the last run are read and worked out, from the last quarter of days before them and the running peak (see incremental.py)
+    if data['options'].incremental:
+        nflx_vs_dji, reports = update_rolling_comparison({'NFLX': 'NFLX_daily_by_quarter.csv', 'DJI': 'DJI.csv'}, 'NFLX', 'DJI')
+        nflx_vs_dji = nflx_vs_dji.rename(columns={'volatility': 'nflx_volatility', 'drawdown': 'nflx_drawdown'})
+        for report in reports:
+            print('{}: {} new rows{}'.format(report.source, report.rows, ' (read from the top)' if report.reset else ''))
+    else:
+        nflx_vs_dji = prices[[]].rename_axis(columns=None).assign(correlation=rolling_correlation(returns[['NFLX']], returns['DJI']).NFLX,
+                                                                      beta=rolling_beta(returns[['NFLX']], returns['DJI']).NFLX,
+                                                                      nflx_volatility=volatility.NFLX, nflx_drawdown=drawdowns(prices).NFLX)
+    print('Rolling quarterly correlation and beta of NFLX against the DJI, with NFLX volatility and drawdown (last 5 days):\n' + str(nflx_vs_dji.tail()) + '\n')
 
-#From the scatterplot above, we can determine that any purple shaded data point suggests that both the estimated and actual earning overlaps because they are equal! Note the purple color (blue + red = purple)
+    #Whole-year summary for each ticker, measured against the Dow Jones
+    price_stats = price_statistics(prices, 'DJI')
+    print('2017 return, risk and beta against the Dow Jones by ticker:\n' + str(price_stats) + '\n')
+
+    return {'prices': prices, 'returns': returns, 'nflx_vs_dji': nflx_vs_dji, 'price_stats': price_stats}
 
 
 #-----------------------------------
 #-----------------------------------
 
-### VISUALIZING THE DATA USING SIDE-BY-SIDE BAR CHARTS ###
+def compare_stage(data):
+    from ticker_comparison import compare_tickers, csv_sources
+
+    display_options()
+
+    ### COMPARING NETFLIX (AND ANY OTHER TICKERS) WITH THE DOW JONES ###
+
+    #The same whole-period statistics as the 'analytics' stage, but for a whole universe of ticker files at once: each ticker is read and measured
+    #against the Dow Jones in a pool of worker processes (see ticker_comparison.py). Add more tickers with '--universe AAPL.csv MSFT.csv ...'
+    sources = dict({'NFLX': 'NFLX_daily_by_quarter.csv'}, **csv_sources(data['options'].universe))
+    comparison = compare_tickers(sources, 'DJI.csv', processes=data['options'].processes)
+    comparison.to_csv('ticker_comparison.csv')
+    print('Return, risk and beta against the Dow Jones for every ticker (saved to ticker_comparison.csv):\n' + str(comparison) + '\n')
 
-#In this next exercise, we will create a side-by-side barchart to compare Netflix's earnings to its revenue. Refer to the following code to complete:
+    return {'comparison': comparison}
 
+
+#-----------------------------------
 #-----------------------------------
 
-#First we need to set up our x-axes (the following lists are provided by Codecademy:
-revenue_by_quarter = [2.79, 2.98,3.29,3.7]
-earnings_by_quarter = [.0656,.12959,.18552,.29012]
-quarter_labels = ["2Q2017","3Q2017","4Q2017", "1Q2018"]
+def fundamentals_stage(data):
+    from fundamentals import read_fundamentals, fundamental_metrics
+
+    display_options()
+
+    ### QUARTERLY REVENUE, EARNINGS AND EARNINGS PER SHARE ###
+
+    #The quarterly numbers live in one table (a row per ticker and quarter) instead of lists typed into each chart. By default it's the 2017 Netflix
+    #numbers from Codecademy; pass '--fundamentals FILE.csv' for more tickers or quarters (see fundamentals.py for the columns)
+    fundamentals = fundamental_metrics(read_fundamentals(data['options'].fundamentals))
+
+    #Every row gets its EPS surprise (% beat or miss of the estimate), net margin (earnings / revenue) and quarter-over-quarter growth in one go
+    print('Quarterly fundamentals with EPS surprise, net margin and QoQ growth:\n' + str(fundamentals) + '\n')
+
+    return {'fundamentals': fundamentals}
+
 
-#The following code doesn't ever need to be changed for side-by-side bar graphs. It should ALWAYS work!
+#-----------------------------------
+#-----------------------------------
+
+def earnings_stage(data):
+    from chart_rendering import ChartSpec, Panel, Series
+    from fundamentals import quarter_labels
 
-# [t*element + w*n for element in range(d)]
+    ### VISUALIZING THE DATA USING SCATTERPLOT ###
 
-#Now, we can create our code schematic to plug in the above code formula into:
+    #In this next exercise, we will chart the performance of dividends by their estimated projected value and their actual value per QUARTER using a very simple scatterplot
+    fundamentals = data['fundamentals']
+    quarters = fundamentals[(fundamentals.ticker == 'NFLX')].dropna(subset=['eps_actual', 'eps_estimate'])
+    x_positions = list(range(1, len(quarters) + 1))
+    chart_labels = quarter_labels(quarters.quarter)
+    earnings_actual = list(quarters.eps_actual)
+    earnings_estimate = list(quarters.eps_estimate)
 
-#Dataset 1 out of 2
-n = 1
-#Total number of datasets
-t = 2
-#Number of sets of bars (4 because there are 4 quarters we are measuring)
-d = 4
-#Width of the bars (default is 0.8)
-w = 0.8
-#Our first x-axis values for Dataset 1
-bars1_x = [t*element + w*n for element in range(d)]
+    #Describing the scatterplot as a chart spec - ***NOTE: All of our charts are drawn together off-screen and saved as png files in the 'charts' stage,
+    #so nothing blocks on a 'plt.show()' window
+    earnings_chart = ChartSpec('netflix_earnings_per_share.png', [
+        Panel('scatter',
+              [Series(x_positions, earnings_estimate, label='Estimate', color='blue', alpha=0.5),
+               Series(x_positions, earnings_actual, label='Actual', color='red', alpha=0.5)],
+              title="Earnings Per Share in Cents", xticks=x_positions, xticklabels=chart_labels, legend=True)])
 
-#Creating our bar chart with Dataset 1!
-plt.bar(bars1_x, revenue_by_quarter)
+    #From the scatterplot above, we can determine that any purple shaded data point suggests that both the estimated and actual earning overlaps because they are equal! Note the purple color (blue + red = purple)
 
-#---------------------------
+    return {'earnings_chart': earnings_chart}
 
-#Now, we follow the same steps above in our Dataset 1 bar chart schematic, with slight variations:
-n = 2
-t = 2
-d = 4
-w = 0.8
-bars2_x = [t*element + w*n for element in range(d)]
 
-#Creating our bar chart with Dataset 1!
-plt.bar(bars2_x, earnings_by_quarter)
+#-----------------------------------
+#-----------------------------------
 
-#--------------------------------------------
+def revenue_stage(data):
+    from chart_rendering import ChartSpec
+    from fundamentals import grouped_bar_panel, quarter_labels
 
-#Outputting our bar chart with labels!
+    ### VISUALIZING THE DATA USING SIDE-BY-SIDE BAR CHARTS ###
 
-#Creating our axes object to begin properly labeling our bar chart! ***NOTE: In order to set the tick marks in the MIDDLE of the side-by-side bars,
-# we have to specify the lengths of the two bars and divide by 2. We use a list comprehension to achieve this, and store it in a variable, "middle_x"
-middle_x = [((a + b) / 2) for a,b in zip(bars1_x, bars2_x)]
+    #In this next exercise, we will create a side-by-side barchart to compare Netflix's earnings to its revenue
 
-#Now, we actually SET the x-ticks by calling the 'middle_x' list after establishing our 'ax = plt.subplot()'!
-ax = plt.subplot()
-ax.set_xticks(middle_x)
-ax.set_xticklabels(quarter_labels)
+    #-----------------------------------
 
-### Alternatively, we don't even need to set an "ax" variable and call it as in the previous 3 lines of code. The following code will still work:
-### plt.xticks(middle_x, quarter_labels)
+    #First we need the quarters that have both a revenue and an earnings figure
+    fundamentals = data['fundamentals']
+    quarters = fundamentals[(fundamentals.ticker == 'NFLX')].dropna(subset=['revenue', 'earnings'])
 
-#Now, let's provide some descriptive labels!
+    #The side-by-side bar x-positions used to come from the formula '[t*element + w*n for element in range(d)]', written out once per dataset
+    #(n = which dataset, t = total number of datasets, d = number of sets of bars, w = width of the bars). 'grouped_bar_panel()' works out that
+    #formula for every dataset and quarter at once, and puts each x-tick in the MIDDLE of its side-by-side bars
+    revenue_chart = ChartSpec('netflix_revenue_earnings.png', [
+        grouped_bar_panel([quarters.revenue, quarters.earnings], ['Revenue', 'Earnings'], quarter_labels(quarters.quarter),
+                          title="Netflix Revenue and Earnings in $ Billions")])
 
-labels = ['Revenue', 'Earnings']
-plt.legend(labels)
-plt.title("Netflix Revenue and Earnings in $ Billions")
-plt.show()
+    return {'revenue_chart': revenue_chart}
 
 
 #-----------------------------------
 #-----------------------------------
 
-### VISUALIZING THE DATA USING SIDE-BY-SIDE LINE CHARTS ###
+def prices_stage(data):
+    from chart_rendering import ChartSpec, Panel, Series
+    from price_alignment import parse_dates
 
-#Using the 'plt.subplot()' function, we will create a subplot of our provided variables above
-plt.subplot(1, 2, 1)
-plt.plot(netflix_stocks.Date, netflix_stocks.Price, marker='o', color='red')
-plt.xlabel('Date')
-plt.ylabel('Price')
-plt.title('Netflix Stock Price by Month')
-plt.xticks(rotation='vertical')
+    #Parsing the 'Date' strings into real dates gives the charts a proper date axis, instead of one rotated text label for every single row
+    netflix_stocks = parse_dates(data['netflix_stocks'])
+    dowjones_industrial = parse_dates(data['dowjones_industrial'])
 
-plt.subplot(1, 2, 2)
-plt.plot(dowjones_industrial.Date, dowjones_industrial.Price, marker='o', color='blue')
-plt.xlabel('Date')
-plt.ylabel('Price')
-plt.title('Dow Jones Stock Price by Month')
-plt.xticks(rotation='vertical')
+    ### VISUALIZING THE DATA USING SIDE-BY-SIDE LINE CHARTS ###
 
-#The following function, 'plt.subplots_adjust()' manipulates the height, width, and spacing of our subplots! This is unncecessary to this exercise,
-# but it is good practice in customizing subplots!
-plt.subplots_adjust(left=0.1,
-                    bottom=0.1,
-                    right=0.9,
-                    top=0.9,
-                    wspace=0.5,
-                    hspace=0.4)
+    #Each panel of our chart spec is one subplot, laid out side-by-side just like 'plt.subplot(1, 2, 1)' and 'plt.subplot(1, 2, 2)'
+    #***NOTE: 'max_points' keeps at most 1000 points of each line (see downsampling.py). Our 2017 data is far smaller than that so nothing changes, but a
+    #long daily or intraday history would otherwise be drawn point by point. The markers are only kept on the monthly Netflix line
+    prices_chart = ChartSpec('netflix_dowjones_prices.png', [
+        Panel('line', [Series(netflix_stocks.index.values, netflix_stocks.Price.values, color='red', marker='o', max_points=1000)],
+              title='Netflix Stock Price by Month', xlabel='Date', ylabel='Price'),
+        Panel('line', [Series(dowjones_industrial.index.values, dowjones_industrial.Price.values, color='blue', max_points=1000)],
+              title='Dow Jones Stock Price by Day', xlabel='Date', ylabel='Price')],
+        #'wspace' spaces out our subplots, just like 'plt.subplots_adjust(wspace=0.5)' used to
+        figsize=(12, 5), wspace=0.5)
 
-#Finally, we call the 'plt.show()' function to output our line graphs!
-plt.show()
+    #-----------------------------------------------------------
 
-#-----------------------------------------------------------
+    ### The following code will achieve the same as above, but it's just creating axes 1 and 2 to modify! ###
 
-### The following code will achieve the same as above, but it's just creating axes 1 and 2 to modify! ###
+    ### Left plot Netflix
+    ### ax1 = plt.subplot(total rows, total columns, subplot to modify)
 
-### Left plot Netflix
-### ax1 = plt.subplot(total rows, total columns, subplot to modify)
 
+    # ax1 = plt.subplot(1, 2, 1)
+    # ax1.set_xlabel('Date')
+    # ax1.set_ylabel('Stock Price')
+    # ax1.set_title("Netflix")
+    #
+    # plt.xticks(rotation='vertical')
+    #
+    # plt.plot(netflix_stocks['Date'], netflix_stocks['Price'], color="purple")
 
-# ax1 = plt.subplot(1, 2, 1)
-# ax1.set_xlabel('Date')
-# ax1.set_ylabel('Stock Price')
-# ax1.set_title("Netflix")
-#
-# plt.xticks(rotation='vertical')
-#
-# plt.plot(netflix_stocks['Date'], netflix_stocks['Price'], color="purple")
+    #---------------------------
 
-#---------------------------
+    ### Right plot Dow Jones
+    ### ax2 = plt.subplot(total rows, total columns, subplot to modify)
 
-### Right plot Dow Jones
-### ax2 = plt.subplot(total rows, total columns, subplot to modify)
 
+    # ax2 = plt.subplot(1, 2, 2)
+    # ax2.set_xlabel('Date')
+    # ax2.set_ylabel('Stock Price')
+    # ax2.set_title("Dow Jones")
+    # plt.xticks(rotation='vertical')
+    # plt.plot(dowjones_stocks['Date'], dowjones_stocks['Price'], color="green")
+    # plt.subplots_adjust(wspace=.5)
+    # plt.show()
+
+    return {'prices_chart': prices_chart}
+
+
+#-----------------------------------
+#-----------------------------------
+
+def charts_stage(data):
+    from chart_rendering import render_charts
+
+    #Finally, we draw all of our charts at once and save them as png files!
+    saved_charts = render_charts([data['distribution_chart'], data['earnings_chart'], data['revenue_chart'], data['prices_chart']])
+    print('Saved the following charts: ' + str(saved_charts))
+
+    return {'saved_charts': saved_charts}
+
+
+#-----------------------------------
+#-----------------------------------
 
-# ax2 = plt.subplot(1, 2, 2)
-# ax2.set_xlabel('Date')
-# ax2.set_ylabel('Stock Price')
-# ax2.set_title("Dow Jones")
-# plt.xticks(rotation='vertical')
-# plt.plot(dowjones_stocks['Date'], dowjones_stocks['Price'], color="green")
-# plt.subplots_adjust(wspace=.5)
-# plt.show()
\ No newline at end of file
+### STAGES AND COMMAND LINE ###
+
+STAGES = [
+    Stage('load', load_stage, (), 'load the NFLX and DJI price CSVs (or the price store)',
+          files=('NFLX.csv', 'NFLX_daily_by_quarter.csv', 'DJI.csv', '{store}/symbols.json'), params=('store',)),
+    Stage('distribution', distribution_stage, ('load',), 'price summaries, KDEs and violin chart spec of NFLX and DJI by quarter',
+          params=('quarters',)),
+    Stage('align', align_stage, ('load',), 'monthly NFLX and daily DJI lined up on one calendar (OHLC bars and as-of join)'),
+    Stage('analytics', analytics_stage, ('load',), 'returns, rolling volatility, correlation and beta of NFLX against the DJI, drawdowns',
+          params=('incremental',)),
+    Stage('compare', compare_stage, (), 'NFLX and any --universe tickers against the DJI in parallel, saved to ticker_comparison.csv',
+          cache=False),
+    Stage('fundamentals', fundamentals_stage, (), 'quarterly revenue, earnings and EPS with surprise %, margins and QoQ growth',
+          files=('{fundamentals}',), params=('fundamentals',)),
+    Stage('earnings', earnings_stage, ('fundamentals',), 'earnings per share: estimate vs. actual chart spec'),
+    Stage('revenue', revenue_stage, ('fundamentals',), 'revenue vs. earnings side-by-side bar chart spec'),
+    Stage('prices', prices_stage, ('load',), 'NFLX vs. Dow Jones price line chart spec'),
+    Stage('charts', charts_stage, ('distribution', 'earnings', 'revenue', 'prices'), 'save the charts as png files', cache=False),
+]
+
+
+def add_arguments(parser):
+    parser.add_argument('--store', help='open the prices from this memory-mapped price store, adding the CSVs to it first (see price_store.py)')
+    parser.add_argument('--universe', nargs='*', default=[], metavar='CSV', help="more tickers' price CSVs for the 'compare' stage")
+    parser.add_argument('--fundamentals', help='quarterly revenue/earnings/EPS table CSV (default: the 2017 Netflix numbers, see fundamentals.py)')
+    parser.add_argument('--processes', type=int, help="worker processes for the 'compare' stage (default: one per core)")
+    parser.add_argument('--quarters', type=int, default=8, help="how many of the latest quarters the 'distribution' violin chart draws (default: %(default)d, 0 = all)")
+    parser.add_argument('--incremental', action='store_true', help="only read the price rows appended since the last run for the 'analytics' rolling table")
+
+
+def main(argv=None):
+    return stage_main('Netflix stock profile analysis.', STAGES, argv, add_arguments)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
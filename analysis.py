@@ -0,0 +1,33 @@
+import importlib
+import sys
+
+
+#----------------------------
+#----------------------------
+
+### ONE COMMAND FOR EVERY ANALYSIS ###
+
+#Runs a stage of any of the work scripts, e.g.:
+#   python analysis.py biodiversity protection
+#   python analysis.py musclehub funnel --start-date 2017-08-01
+#   python analysis.py netflix distribution
+#Only the chosen script is imported, and that script only imports the libraries its selected stages need
+SCRIPTS = {
+    'biodiversity': 'Biodiversity_Work_Script',
+    'musclehub': 'MuscleHub_Work_Script',
+    'netflix': 'Netflix_Viz_Work_Script',
+}
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in SCRIPTS:
+        print('usage: python analysis.py {' + ','.join(SCRIPTS) + '} [stage ...] [--list] [options]', file=sys.stderr)
+        return 2
+    script = importlib.import_module(SCRIPTS[argv[0]])
+    script.main(argv[1:])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
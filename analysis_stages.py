@@ -0,0 +1,168 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+from collections import namedtuple
+
+from stage_cache import DEFAULT_MAX_BYTES, STAGE_CACHE_DIR, StageCache
+from stage_profile import Profiler, count_rows, section
+
+
+#----------------------------
+#----------------------------
+
+### NAMED ANALYSIS STAGES ###
+
+#Each work script is split into named stages, so a cron job can ask for just one table instead of running (and importing the libraries for) everything.
+#A stage is a function that takes the 'data' dict, holding the command-line options under 'options' plus everything the stages before it returned,
+#and returns a dict of the new things it made. 'requires' lists the stages whose results it reads; those run first automatically.
+#Stages import pandas/scipy/matplotlib inside the function body, so only the libraries the selected stages actually need are ever loaded.
+#'files' (input files the stage reads, which can name options like '{fundamentals}') and 'params' (names of the options it uses) make up the stage's
+#cache key along with its source code (see stage_cache.py). Stages that write files, like the charts, set cache=False so they always run
+Stage = namedtuple('Stage', ['name', 'function', 'requires', 'description', 'files', 'params', 'cache'])
+Stage.__new__.__defaults__ = ((), '', (), (), True)
+
+
+#Puts the selected stages and everything they depend on in an order where every stage comes after its requirements
+def resolve_stages(stages, selected):
+    by_name = {stage.name: stage for stage in stages}
+    order = []
+    visiting = set()
+
+    def visit(name):
+        if name in order:
+            return
+        if name not in by_name:
+            raise KeyError('Unknown stage: {!r}'.format(name))
+        if name in visiting:
+            raise ValueError('Stage {!r} depends on itself'.format(name))
+        visiting.add(name)
+        for requirement in by_name[name].requires:
+            visit(requirement)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in selected:
+        visit(name)
+    return [by_name[name] for name in order]
+
+
+#Writes to two streams at once, so a stage's output can be shown (or hidden) and saved in the cache at the same time
+class _Tee(io.TextIOBase):
+
+    def __init__(self, *streams):
+        self.streams = streams
+
+    def write(self, text):
+        for stream in self.streams:
+            stream.write(text)
+        return len(text)
+
+
+def _run_stage(stage, data, quiet):
+    output = io.StringIO()
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(_Tee(devnull if quiet else sys.stdout, output)):
+            result = stage.function(data) or {}
+    return result, output.getvalue()
+
+
+#Runs the selected stages (plus their requirements) and returns the combined 'data' dict. Stages that only run because something else needs them
+#don't print anything unless verbose=True, so asking for one stage only prints that stage's tables.
+#
+#With a StageCache, a stage whose key is already cached isn't run at all: we load its result and re-print the output it saved.
+#While a Profiler is active (see stage_profile.py) every stage is timed as a section, with the rows of each frame it returned
+def run_stages(stages, selected, options=None, verbose=False, cache=None):
+    data = {'options': options}
+    selected = list(selected)
+    order = resolve_stages(stages, selected)
+
+    keys = {}
+    if cache is not None:
+        for stage in order:
+            keys[stage.name] = cache.stage_key(stage, options, keys)
+
+    by_name = {stage.name: stage for stage in order}
+    done = set()
+
+    #Cached stages are loaded instead of run, so their requirements are only materialized when a stage that DOES have to run needs them
+    def materialize(stage):
+        if stage.name in done:
+            return
+        quiet = not (stage.name in selected or verbose)
+        use_cache = cache is not None and stage.cache
+        if not (use_cache and keys[stage.name] in cache):
+            for requirement in stage.requires:
+                materialize(by_name[requirement])
+        with section(stage.name) as timed:
+            cached = cache.get(keys[stage.name]) if use_cache else None
+            if cached is not None:
+                result, output = cached
+                timed.cached = True
+                if not quiet:
+                    sys.stdout.write(output)
+            else:
+                #An entry that can't be read back (e.g. a half-written file) is recomputed like any other miss
+                for requirement in stage.requires:
+                    materialize(by_name[requirement])
+                result, output = _run_stage(stage, data, quiet)
+                if use_cache:
+                    cache.put(keys[stage.name], result, output)
+            timed.rows = count_rows(result)
+        data.update(result)
+        done.add(stage.name)
+
+    for stage in order:
+        if stage.name in selected:
+            materialize(stage)
+    return data
+
+
+#----------------------------
+#----------------------------
+
+### COMMAND LINE ###
+
+#Shared command line for the work scripts:  python <script> [stage ...] [--list] [--verbose] [--no-cache] [--profile [JSON]] [script-specific options]
+def build_parser(description, stages, add_arguments=None):
+    names = [stage.name for stage in stages]
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('stages', nargs='*', metavar='stage', help='stages to run (default: all). Choices: ' + ', '.join(names))
+    parser.add_argument('--list', action='store_true', help='list the stages and exit')
+    parser.add_argument('-v', '--verbose', action='store_true', help='also print the output of stages that only run as requirements')
+    parser.add_argument('--no-cache', action='store_true', help='recompute every stage instead of reusing cached results')
+    parser.add_argument('--cache-dir', default=STAGE_CACHE_DIR, help='where stage results are cached (default: .cache/stages)')
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_BYTES / 2 ** 20,
+                        help='maximum size of the stage cache in MB (default: %(default)d)')
+    parser.add_argument('--profile', nargs='?', const='stage_profile.json', metavar='JSON',
+                        help='time every stage (wall, CPU, peak memory, rows), print a summary and write a JSON report (default: stage_profile.json)')
+    if add_arguments is not None:
+        add_arguments(parser)
+    return parser
+
+
+#With no stages given, every stage runs in order, just like running the old script top to bottom
+def stage_main(description, stages, argv=None, add_arguments=None):
+    names = [stage.name for stage in stages]
+    parser = build_parser(description, stages, add_arguments)
+    options = parser.parse_args(argv)
+
+    if options.list:
+        for stage in stages:
+            requires = ' (needs: ' + ', '.join(stage.requires) + ')' if stage.requires else ''
+            print('{:<14} {}{}'.format(stage.name, stage.description, requires))
+        return None
+
+    unknown = [name for name in options.stages if name not in names]
+    if unknown:
+        parser.error('unknown stage(s): ' + ', '.join(unknown) + '. Choices: ' + ', '.join(names))
+    cache = None if options.no_cache else StageCache(options.cache_dir, int(options.cache_size * 2 ** 20))
+    if not options.profile:
+        return run_stages(stages, options.stages or names, options, options.verbose, cache)
+
+    with Profiler() as profiler:
+        data = run_stages(stages, options.stages or names, options, options.verbose, cache)
+    print('\n' + profiler.summary_table())
+    print('Profile written to ' + profiler.write_json(options.profile))
+    return data
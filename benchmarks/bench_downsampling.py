@@ -0,0 +1,64 @@
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import price_chunks
+from benchmarks.bench_pipelines import size_label
+from chart_rendering import ChartSpec, Panel, Series, render_chart
+from downsampling import downsample_indices
+
+
+#----------------------------
+#----------------------------
+
+### BENCHMARK: DRAWING A LONG PRICE HISTORY WITH AND WITHOUT DOWNSAMPLING ###
+
+#Run from the repo root with:  python -m benchmarks.bench_downsampling --sizes 10000 100000 1000000
+#
+#For each size a per-minute random walk (see synthetic.py) is drawn as a line chart with a date axis and a marker on every point, like the Netflix
+#price chart, once per downsampling method and once with every point ('--no-raw' skips the full draw, which gets slow at millions of points).
+#We report the time to pick the points and the time to draw and save the png
+
+
+def price_history(rows, seed=0):
+    frame = pd.concat(price_chunks(rows, 100.0, seed, freq='min'), ignore_index=True)
+    return pd.to_datetime(frame['Date']).to_numpy(), frame['Close'].to_numpy()
+
+
+def time_render(dates, prices, output_dir, name, max_points=None, method='lttb'):
+    start = time.perf_counter()
+    keep = downsample_indices(dates, prices, max_points, method) if max_points else slice(None)
+    selected = time.perf_counter() - start
+    spec = ChartSpec(os.path.join(output_dir, name + '.png'),
+                     [Panel('line', [Series(dates[keep], prices[keep], color='blue', marker='o')], title=name, xlabel='Date', ylabel='Price')])
+    start = time.perf_counter()
+    render_chart(spec)
+    return selected, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time drawing long price histories with and without downsampling.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--max-points', type=int, default=1000)
+    parser.add_argument('--no-raw', action='store_true', help="don't draw every point")
+    parser.add_argument('--output', help='keep the charts here (default: a temporary directory)')
+    args = parser.parse_args(argv)
+
+    output_dir = args.output or tempfile.mkdtemp(prefix='downsampling_bench_')
+    os.makedirs(output_dir, exist_ok=True)
+    print('{:>6}  {:<8} {:>8} {:>12} {:>10}'.format('rows', 'method', 'points', 'select (s)', 'draw (s)'))
+    for rows in sorted(args.sizes):
+        dates, prices = price_history(rows)
+        runs = [('lttb', args.max_points), ('minmax', args.max_points)] + ([] if args.no_raw else [('raw', None)])
+        for method, max_points in runs:
+            selected, drawn = time_render(dates, prices, output_dir, '{}_{}'.format(method, rows), max_points, method)
+            points = len(downsample_indices(dates, prices, max_points, method)) if max_points else rows
+            print('{:>6}  {:<8} {:>8} {:>12.3f} {:>10.3f}'.format(size_label(rows), method, points, selected, drawn))
+    print('\nCharts saved in ' + output_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from analysis import SCRIPTS
+from analysis_stages import build_parser, run_stages
+from benchmarks.synthetic import WRITERS
+from stage_profile import Profiler
+
+
+#----------------------------
+#----------------------------
+
+### BENCHMARK: EVERY STAGE OF EVERY PIPELINE ON GROWING SYNTHETIC DATA ###
+
+#Run from the repo root with:  python -m benchmarks.bench_pipelines --sizes 10000 100000 1000000
+#
+#For each pipeline and size, the synthetic CSVs (see synthetic.py) are written to a scratch directory and the work script's stages are run there,
+#exactly as 'python analysis.py <pipeline>' would run them but with the stage cache off and a Profiler on. Everything runs offline: MuscleHub
+#builds its local SQLite database from the generated CSVs. We report wall time, throughput (input rows per second) and peak memory per stage,
+#write them all to a JSON file and draw the throughput and memory curves.
+#
+#***NOTE: Peak memory is what tracemalloc sees (Python, numpy and pandas allocations), so SQLite's own memory isn't included. Pass '--no-memory'
+#for timings without the tracemalloc overhead. Pass '--skip charts' to leave out the chart drawing
+
+
+def size_label(rows):
+    for threshold, suffix in [(10 ** 9, 'B'), (10 ** 6, 'M'), (10 ** 3, 'k')]:
+        if rows >= threshold:
+            return '{:g}{}'.format(rows / threshold, suffix)
+    return str(rows)
+
+
+#Runs the selected stages of one work script inside 'directory' and returns its timed sections
+def run_pipeline(pipeline, directory, argv=(), skip=(), trace_memory=True):
+    script = importlib.import_module(SCRIPTS[pipeline])
+    options = build_parser(pipeline, script.STAGES, getattr(script, 'add_arguments', None)).parse_args(list(argv))
+    selected = [stage.name for stage in script.STAGES if stage.name not in skip]
+
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            with Profiler(trace_memory) as profiler:
+                run_stages(script.STAGES, selected, options)
+    finally:
+        os.chdir(cwd)
+    return profiler.finished_sections()
+
+
+def benchmark(pipelines, sizes, data_dir, argv_by_pipeline, skip=(), trace_memory=True, seed=0):
+    records = []
+    for pipeline in pipelines:
+        for rows in sizes:
+            directory = os.path.join(data_dir, '{}_{}'.format(pipeline, rows))
+            start = time.perf_counter()
+            files = WRITERS[pipeline](directory, rows, seed)
+            generate_seconds = time.perf_counter() - start
+
+            for timing in run_pipeline(pipeline, directory, argv_by_pipeline.get(pipeline, ()), skip, trace_memory):
+                records.append({
+                    'pipeline': pipeline,
+                    'rows': rows,
+                    'files': files,
+                    'generate_seconds': generate_seconds,
+                    'section': timing.name,
+                    'depth': timing.depth,
+                    'wall_seconds': timing.wall_seconds,
+                    'cpu_seconds': timing.cpu_seconds,
+                    'peak_memory_bytes': timing.peak_memory_bytes,
+                    'rows_per_second': rows / timing.wall_seconds if timing.wall_seconds > 0 else None,
+                })
+    return records
+
+
+def print_table(records):
+    print('{:<13} {:>6}  {:<32} {:>9} {:>14} {:>9}'.format('pipeline', 'rows', 'section', 'wall (s)', 'rows/s', 'peak MB'))
+    for record in records:
+        throughput = record['rows_per_second']
+        print('{:<13} {:>6}  {:<32} {:>9.3f} {:>14} {:>9.1f}'.format(
+            record['pipeline'], size_label(record['rows']), '  ' * record['depth'] + record['section'].split('/')[-1], record['wall_seconds'],
+            '{:,.0f}'.format(throughput) if throughput is not None else '', record['peak_memory_bytes'] / 2 ** 20))
+
+
+#One png per pipeline: throughput and peak memory of each stage against the input size (sizes evenly spaced, i.e. a log scale for 10x steps)
+def curve_charts(records, output_dir):
+    from chart_rendering import ChartSpec, Panel, Series, render_charts
+
+    specs = []
+    for pipeline in sorted({record['pipeline'] for record in records}):
+        stage_records = [record for record in records if record['pipeline'] == pipeline and record['depth'] == 0]
+        sizes = sorted({record['rows'] for record in stage_records})
+        positions = list(range(len(sizes)))
+        throughput, memory = [], []
+        for stage in dict.fromkeys(record['section'] for record in stage_records):
+            by_size = {record['rows']: record for record in stage_records if record['section'] == stage}
+            x = [positions[sizes.index(rows)] for rows in sizes if rows in by_size]
+            throughput.append(Series(x, [by_size[rows]['rows_per_second'] for rows in sizes if rows in by_size], label=stage, marker='o'))
+            memory.append(Series(x, [by_size[rows]['peak_memory_bytes'] / 2 ** 20 for rows in sizes if rows in by_size], label=stage, marker='o'))
+        labels = [size_label(rows) for rows in sizes]
+        specs.append(ChartSpec(os.path.join(output_dir, pipeline + '_curves.png'), [
+            Panel('line', throughput, title=pipeline + ': throughput', xlabel='input rows', ylabel='rows per second', xticks=positions,
+                  xticklabels=labels, legend=True),
+            Panel('line', memory, title=pipeline + ': peak memory', xlabel='input rows', ylabel='MB', xticks=positions, xticklabels=labels,
+                  legend=True)], figsize=(12, 5)))
+    return render_charts(specs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time every stage of the three pipelines on synthetic data of growing size.')
+    parser.add_argument('--pipelines', nargs='+', choices=sorted(WRITERS), default=sorted(WRITERS))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='input rows (10k up to 100M)')
+    parser.add_argument('--skip', nargs='*', default=[], metavar='STAGE', help='stages to leave out, e.g. charts')
+    parser.add_argument('--stream', action='store_true', help='run the biodiversity sheep stage with --stream')
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc, so timings have no tracing overhead')
+    parser.add_argument('--data-dir', help='keep the generated CSVs here (default: a temporary directory that is removed afterwards)')
+    parser.add_argument('--output', default='bench_results', help='directory for pipelines.json and the curve charts (default: bench_results)')
+    parser.add_argument('--no-charts', action='store_true', help="don't draw the throughput and memory curves")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='pipeline_bench_')
+    argv_by_pipeline = {'biodiversity': ['--stream'] if args.stream else []}
+    try:
+        records = benchmark(args.pipelines, sorted(args.sizes), data_dir, argv_by_pipeline, args.skip, not args.no_memory, args.seed)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    print_table(records)
+    os.makedirs(args.output, exist_ok=True)
+    report_path = os.path.join(args.output, 'pipelines.json')
+    with open(report_path, 'w') as report_file:
+        json.dump(records, report_file, indent=2)
+    print('\nResults written to ' + report_path)
+    if not args.no_charts:
+        print('Curves saved to ' + ', '.join(curve_charts(records, args.output)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+#----------------------------
+#----------------------------
+
+### SYNTHETIC DATASETS FOR THE THREE PIPELINES ###
+
+#Each writer fills a directory with CSVs that have exactly the columns (and date formats) the work scripts read, at any size, so every stage can be
+#run and timed offline. Rows are generated and appended 'chunk_rows' at a time, so even 100 million rows never have to sit in memory at once.
+#Every generator takes a 'seed', so the same size always produces the same files
+
+DEFAULT_CHUNK_ROWS = 1000000
+
+PARKS = ['Bryce National Park', 'Great Smoky Mountains National Park', 'Yellowstone National Park', 'Yosemite National Park']
+
+CATEGORIES = ['Amphibian', 'Bird', 'Fish', 'Mammal', 'Nonvascular Plant', 'Reptile', 'Vascular Plant']
+
+#A few real common names, including the sheep the biodiversity script looks for (and a plant that also has "Sheep" in its name)
+COMMON_NAMES = ['Bighorn Sheep, Bighorn Sheep', 'Sheep Sorrel', 'Domestic Sheep, Mouflon, Red Sheep, Sheep (Feral)', 'Gray Wolf',
+                'Common Vole, Meadow Mouse', 'American Bison, Bison', 'Red-Tailed Hawk', 'Brook Trout', 'Eastern Box Turtle', 'Moss']
+
+STATUSES = ['Species of Concern', 'Endangered', 'Threatened', 'In Recovery']
+
+
+#Appends the frames from 'chunks' to one CSV, writing the header only once
+def write_csv_chunks(path, chunks):
+    rows = 0
+    for number, chunk in enumerate(chunks):
+        chunk.to_csv(path, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+        rows += len(chunk)
+    return rows
+
+
+def _chunk_bounds(rows, chunk_rows):
+    for start in range(0, rows, chunk_rows):
+        yield start, min(start + chunk_rows, rows)
+
+
+#----------------------------
+#----------------------------
+
+### BIODIVERSITY: species_info.csv AND observations.csv ###
+
+#About 3% of species have a conservation status and the rest are left blank ('No Intervention'), like the course data
+def make_species(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    statuses = np.array(STATUSES + [None], dtype=object)[rng.choice(len(STATUSES) + 1, rows, p=[0.015, 0.005, 0.005, 0.005, 0.97])]
+    return pd.DataFrame({
+        'category': np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), rows)],
+        'scientific_name': ['Genus{0} species{0}'.format(i) for i in range(rows)],
+        'common_names': np.array(COMMON_NAMES, dtype=object)[rng.integers(0, len(COMMON_NAMES), rows)],
+        'conservation_status': statuses,
+    })
+
+
+def observation_chunks(rows, species_rows, seed=0, chunk_rows=DEFAULT_CHUNK_ROWS):
+    rng = np.random.default_rng(seed + 1)
+    for start, stop in _chunk_bounds(rows, chunk_rows):
+        size = stop - start
+        yield pd.DataFrame({
+            'scientific_name': pd.Series(rng.integers(0, species_rows, size)).map('Genus{0} species{0}'.format),
+            'park_name': np.array(PARKS, dtype=object)[rng.integers(0, len(PARKS), size)],
+            'observations': rng.integers(9, 322, size),
+        })
+
+
+#'rows' is the number of observations. There's one species for every 4 observations (about the ratio in the course data)
+def write_biodiversity(directory, rows, seed=0, chunk_rows=DEFAULT_CHUNK_ROWS):
+    os.makedirs(directory, exist_ok=True)
+    species_rows = max(rows // 4, len(COMMON_NAMES))
+    make_species(species_rows, seed).to_csv(os.path.join(directory, 'species_info.csv'), index=False)
+    write_csv_chunks(os.path.join(directory, 'observations.csv'), observation_chunks(rows, species_rows, seed, chunk_rows))
+    return {'species_info.csv': species_rows, 'observations.csv': rows}
+
+
+#----------------------------
+#----------------------------
+
+### MUSCLEHUB: visits, fitness_tests, applications AND purchases ###
+
+#Dates in the same 'month-day-2 digit year' format as the course CSVs, e.g. '7-1-17'
+def _course_dates(days):
+    dates = pd.Timestamp('2017-06-20') + pd.to_timedelta(days, unit='D')
+    return pd.Series(dates.month.astype(str) + '-' + dates.day.astype(str) + '-' + (dates.year % 100).astype(str))
+
+
+#One chunk of visitors plus the fitness test / application / purchase rows for the ones who got that far. About half of visitors take a
+#fitness test, about 11% pick up an application and about 8% go on to purchase, like the real funnel
+def musclehub_chunk(start, stop, rng):
+    size = stop - start
+    ids = pd.Series(np.arange(start, stop)).astype(str)
+    people = pd.DataFrame({'first_name': 'f' + ids, 'last_name': 'l' + ids, 'email': 'e' + ids + '@example.com'})
+    visit_days = rng.integers(0, 100, size)
+
+    visits = people.assign(gender=np.where(rng.random(size) < 0.5, 'female', 'male'), visit_date=_course_dates(visit_days))
+    fitness = rng.random(size) < 0.5
+    applied = rng.random(size) < 0.11
+    purchased = applied & (rng.random(size) < 0.73)
+
+    def follow_up(mask, column):
+        days = visit_days[mask] + rng.integers(0, 7, int(mask.sum()))
+        return people[mask].assign(**{column: _course_dates(days).to_numpy()})
+
+    return {
+        'visits': visits,
+        'fitness_tests': follow_up(fitness, 'fitness_test_date'),
+        'applications': follow_up(applied, 'application_date'),
+        'purchases': follow_up(purchased, 'purchase_date'),
+    }
+
+
+#'rows' is the number of visits
+def write_musclehub(directory, rows, seed=0, chunk_rows=DEFAULT_CHUNK_ROWS):
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    counts = {}
+    for number, (start, stop) in enumerate(_chunk_bounds(rows, chunk_rows)):
+        for name, frame in musclehub_chunk(start, stop, rng).items():
+            frame.to_csv(os.path.join(directory, name + '.csv'), mode='w' if number == 0 else 'a', header=number == 0, index=False)
+            counts[name + '.csv'] = counts.get(name + '.csv', 0) + len(frame)
+    return counts
+
+
+#----------------------------
+#----------------------------
+
+### NETFLIX: NFLX.csv, NFLX_daily_by_quarter.csv AND DJI.csv ###
+
+#Business days run out (pandas stops at the year 2262) long before 100 million rows, so big series are spaced by the minute instead
+def price_frequency(rows):
+    return 'B' if rows <= 50000 else 'min'
+
+
+#A geometric random walk with the same columns as the Yahoo Finance CSVs. The walk carries on from one chunk to the next
+def price_chunks(rows, start_price, seed=0, freq='B', start='2017-01-03', volatility=0.015, chunk_rows=DEFAULT_CHUNK_ROWS):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=rows, freq=freq) if freq != 'min' else None
+    price = start_price
+    for chunk_start, chunk_stop in _chunk_bounds(rows, chunk_rows):
+        size = chunk_stop - chunk_start
+        if dates is not None:
+            chunk_dates = dates[chunk_start:chunk_stop]
+        else:
+            chunk_dates = pd.Timestamp(start) + pd.to_timedelta(np.arange(chunk_start, chunk_stop), unit='min')
+        close = price * np.exp(np.cumsum(rng.normal(0, volatility, size)))
+        price = close[-1]
+        opening = close * (1 + rng.normal(0, volatility / 4, size))
+        spread = np.abs(rng.normal(0, volatility, size)) * close
+        yield pd.DataFrame({
+            'Date': chunk_dates.strftime('%Y-%m-%d %H:%M' if freq == 'min' else '%Y-%m-%d'),
+            'Open': opening,
+            'High': np.maximum(opening, close) + spread,
+            'Low': np.minimum(opening, close) - spread,
+            'Close': close,
+            'Adj Close': close,
+            'Volume': rng.integers(1000000, 10000000, size),
+            'Quarter': 'Q' + chunk_dates.quarter.astype(str),
+        })
+
+
+#'rows' is the number of daily (or per-minute) prices. NFLX.csv is the monthly series, so it gets one row per 21 trading days
+def write_netflix(directory, rows, seed=0, chunk_rows=DEFAULT_CHUNK_ROWS):
+    os.makedirs(directory, exist_ok=True)
+    freq = price_frequency(rows)
+    monthly_rows = max(rows // 21, 12)
+
+    def without_quarter(chunks):
+        for chunk in chunks:
+            yield chunk.drop(columns='Quarter')
+
+    write_csv_chunks(os.path.join(directory, 'NFLX.csv'),
+                     without_quarter(price_chunks(monthly_rows, 140.0, seed, 'MS' if monthly_rows <= 2400 else freq, chunk_rows=chunk_rows)))
+    write_csv_chunks(os.path.join(directory, 'NFLX_daily_by_quarter.csv'), price_chunks(rows, 140.0, seed + 1, freq, chunk_rows=chunk_rows))
+    write_csv_chunks(os.path.join(directory, 'DJI.csv'), without_quarter(price_chunks(rows, 20000.0, seed + 2, freq, chunk_rows=chunk_rows)))
+    return {'NFLX.csv': monthly_rows, 'NFLX_daily_by_quarter.csv': rows, 'DJI.csv': rows}
+
+
+#Pipeline name (as used by analysis.py) -> writer
+WRITERS = {
+    'biodiversity': write_biodiversity,
+    'musclehub': write_musclehub,
+    'netflix': write_netflix,
+}
@@ -0,0 +1,231 @@
+import json
+import os
+
+import pandas as pd
+
+from stage_cache import file_hash
+from stage_profile import profiled
+
+
+#----------------------------
+#----------------------------
+
+### TYPED COLUMNAR CACHE FOR THE BIODIVERSITY CSVs ###
+
+#Parsing 'species_info.csv' and 'observations.csv' from text (and letting pandas guess every dtype) is most of the script's start-up time.
+#The first time a CSV is loaded, we parse it with an explicit schema and save the typed frame in a columnar file under '.cache/'. Every later run
+#loads that file instead, until the source CSV changes.
+#
+#The cache is Parquet when pyarrow is installed, otherwise a pandas pickle (which still keeps the categoricals and skips all text parsing)
+
+CACHE_DIR = '.cache'
+
+#Column -> dtype for each file. Columns with lots of repeated strings are categoricals
+SPECIES_SCHEMA = {
+    'category': 'category',
+    'scientific_name': 'str',
+    'common_names': 'str',
+    'conservation_status': 'category',
+}
+
+OBSERVATIONS_SCHEMA = {
+    'scientific_name': 'str',
+    'park_name': 'category',
+    'observations': 'int64',
+}
+
+try:
+    import pyarrow  # noqa: F401
+    CACHE_FORMAT = 'parquet'
+except ImportError:
+    CACHE_FORMAT = 'pickle'
+
+
+#----------------------------
+#----------------------------
+
+### CACHE INVALIDATION ###
+
+def _cache_paths(path, cache_dir):
+    directory = os.path.join(os.path.dirname(os.path.abspath(path)), cache_dir)
+    name = os.path.splitext(os.path.basename(path))[0]
+    return directory, os.path.join(directory, name + '.' + CACHE_FORMAT), os.path.join(directory, name + '.json')
+
+
+#Checks whether the cached copy still matches the source CSV. If the size and modification time are unchanged we trust the cache right away;
+#if only the modification time moved (e.g. the file was copied or touched) we fall back to comparing content hashes before rebuilding.
+#Returns the (possibly refreshed) metadata when the cache is valid, or None when it has to be rebuilt
+def _valid_metadata(path, cache_path, meta_path, schema):
+    if not (os.path.exists(cache_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path) as meta_file:
+        meta = json.load(meta_file)
+    stat = os.stat(path)
+    if meta.get('schema') != schema or meta.get('format') != CACHE_FORMAT or meta.get('size') != stat.st_size:
+        return None
+    if meta.get('mtime_ns') == stat.st_mtime_ns:
+        return meta
+    if meta.get('sha256') != file_hash(path):
+        return None
+    meta['mtime_ns'] = stat.st_mtime_ns
+    with open(meta_path, 'w') as meta_file:
+        json.dump(meta, meta_file)
+    return meta
+
+
+#----------------------------
+#----------------------------
+
+### LOADING ###
+
+#Reads a CSV with an explicit schema (no dtype inference). Columns that aren't in the schema are left to pandas
+def read_typed_csv(path, schema, **kwargs):
+    return pd.read_csv(path, dtype=schema, **kwargs)
+
+
+#Loads a CSV through the columnar cache, (re)building the cache whenever the source has changed
+@profiled('load')
+def load_cached_csv(path, schema, cache_dir=CACHE_DIR):
+    directory, cache_path, meta_path = _cache_paths(path, cache_dir)
+    if _valid_metadata(path, cache_path, meta_path, schema) is not None:
+        if CACHE_FORMAT == 'parquet':
+            return pd.read_parquet(cache_path)
+        return pd.read_pickle(cache_path)
+
+    frame = read_typed_csv(path, schema)
+    os.makedirs(directory, exist_ok=True)
+    if CACHE_FORMAT == 'parquet':
+        frame.to_parquet(cache_path, index=False)
+    else:
+        frame.to_pickle(cache_path)
+    stat = os.stat(path)
+    with open(meta_path, 'w') as meta_file:
+        json.dump({'schema': schema, 'format': CACHE_FORMAT, 'size': stat.st_size,
+                   'mtime_ns': stat.st_mtime_ns, 'sha256': file_hash(path)}, meta_file)
+    return frame
+
+
+def load_species(path='species_info.csv', cache_dir=CACHE_DIR):
+    return load_cached_csv(path, SPECIES_SCHEMA, cache_dir)
+
+
+def load_observations(path='observations.csv', cache_dir=CACHE_DIR):
+    return load_cached_csv(path, OBSERVATIONS_SCHEMA, cache_dir)
+
+
+#----------------------------
+#----------------------------
+
+### STREAMING AGGREGATION OF OBSERVATIONS ###
+
+#For observation feeds too big to load at once. The CSV is read 'chunksize' rows at a time, each chunk is semi-joined against a hash set of the
+#scientific names we care about (so the other species are dropped straight away), and the per-park/per-species sums are added onto a running total.
+#Memory only depends on the chunk size and the number of (park, species) pairs - not on how long the file is
+@profiled('load (streamed)')
+def stream_observation_totals(path, scientific_names, chunksize=1000000):
+    targets = pd.Index(pd.unique(pd.Series(list(scientific_names), dtype='str')))
+    totals = None
+    for chunk in pd.read_csv(path, dtype=OBSERVATIONS_SCHEMA, chunksize=chunksize):
+        chunk = chunk[chunk['scientific_name'].isin(targets)]
+        if chunk.empty:
+            continue
+        partial = chunk.groupby(['park_name', 'scientific_name'], observed=True)['observations'].sum()
+        totals = partial if totals is None else totals.add(partial, fill_value=0)
+    return observation_totals_frame(totals)
+
+
+#The running (park_name, scientific_name) -> observations sums as a sorted frame, or an empty frame with the same columns when nothing matched
+def observation_totals_frame(totals):
+    if totals is None or totals.empty:
+        return pd.DataFrame({'park_name': pd.Series(dtype='str'), 'scientific_name': pd.Series(dtype='str'),
+                             'observations': pd.Series(dtype='int64')})
+    totals = totals.astype('int64').rename('observations').reset_index()
+    totals['park_name'] = totals['park_name'].astype('str')
+    return totals.sort_values(['park_name', 'scientific_name'], ignore_index=True)
+
+
+#----------------------------
+#----------------------------
+
+### MEMORY-COMPACT DTYPES ###
+
+#Which columns to shrink and how: 'category' turns repeated strings into small integer codes, 'integer' downcasts counts to the smallest integer
+#type that holds every value
+COMPACT_SPECIES_SCHEMA = {
+    'category': 'category',
+    'conservation_status': 'category',
+    'scientific_name': 'category',
+}
+
+COMPACT_OBSERVATIONS_SCHEMA = {
+    'park_name': 'category',
+    'scientific_name': 'category',
+    'observations': 'integer',
+}
+
+
+#Applies a compact schema to a frame (without touching the original) and returns the smaller copy
+@profiled('compact')
+def compact_frame(frame, schema):
+    frame = frame.copy()
+    for column, kind in schema.items():
+        if column not in frame.columns:
+            continue
+        if kind == 'category':
+            if not isinstance(frame[column].dtype, pd.CategoricalDtype):
+                frame[column] = frame[column].astype('category')
+        elif kind == 'integer':
+            downcast = 'unsigned' if len(frame) and frame[column].min() >= 0 else 'integer'
+            frame[column] = pd.to_numeric(frame[column], downcast=downcast)
+        else:
+            raise ValueError('Unknown compact dtype {!r} for column {!r}'.format(kind, column))
+    return frame
+
+
+#Gives two frames the same categories for 'column', so merging on it keeps the categorical codes instead of falling back to strings
+def share_categories(left, right, column):
+    categories = left[column].cat.categories.union(right[column].cat.categories)
+    left[column] = left[column].cat.set_categories(categories)
+    right[column] = right[column].cat.set_categories(categories)
+    return left, right
+
+
+#Deep memory usage (in bytes) per column of each frame before and after compaction, plus a 'TOTAL' row
+def memory_report(before, after):
+    report = pd.DataFrame({'before': before.memory_usage(deep=True, index=False),
+                           'after': after.memory_usage(deep=True, index=False)})
+    report.loc['TOTAL'] = report.sum()
+    report['saved'] = 1 - report['after'] / report['before']
+    return report
+
+
+
+#----------------------------
+#----------------------------
+
+### CONSERVATION STATUS ENCODING ###
+
+#Missing statuses mean the species has no intervention. Instead of filling NaN across the whole "species" frame and comparing strings, the status
+#is an ordered categorical with 'No Intervention' as its first level (code 0), ordered roughly by level of concern. 'is_protected' is then just
+#"code > 0" and grouping on it works on integer codes
+CONSERVATION_STATUSES = ['No Intervention', 'In Recovery', 'Species of Concern', 'Threatened', 'Endangered']
+
+CONSERVATION_STATUS_DTYPE = pd.CategoricalDtype(CONSERVATION_STATUSES, ordered=True)
+
+
+#Encodes a 'conservation_status' column as CONSERVATION_STATUS_DTYPE, with missing values as 'No Intervention'. Only that column is touched
+def encode_conservation_status(statuses):
+    encoded = statuses.astype(CONSERVATION_STATUS_DTYPE)
+    unknown = encoded.isna() & statuses.notna()
+    if unknown.any():
+        raise ValueError('Unknown conservation status(es): {}'.format(sorted(statuses[unknown].astype(str).unique())))
+    codes = encoded.cat.codes.to_numpy(copy=True)
+    codes[codes < 0] = 0
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=CONSERVATION_STATUS_DTYPE), index=statuses.index, name=statuses.name)
+
+
+#True for every species with any status other than 'No Intervention' - a comparison on the integer codes, no strings involved
+def protected_mask(statuses):
+    if statuses.dtype != CONSERVATION_STATUS_DTYPE:
+        statuses = encode_conservation_status(statuses)
+    return statuses.cat.codes.to_numpy() > 0
@@ -0,0 +1,150 @@
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+from matplotlib.figure import Figure
+
+from downsampling import downsample_indices
+from stage_profile import profiled
+
+
+#----------------------------
+#----------------------------
+
+### HEADLESS BATCH CHART RENDERING ###
+
+#The scripts used to draw every chart through the interactive pyplot state machine and 'plt.show()', which blocks until the window is closed (and
+#MuscleHub called 'savefig()' AFTER 'show()', so the saved files came out empty). Here each chart is described by a plain ChartSpec, drawn on its own
+#matplotlib Figure with the Agg canvas (no GUI, no pyplot global state) and written straight to disk. A list of specs is rendered in parallel
+#across a process pool
+
+#One set of points on a panel: bars, a line or scatter points depending on the panel's 'kind'. A line or scatter series with 'max_points' is
+#downsampled to at most that many of its own points before drawing ('downsample' is 'lttb' or 'minmax', see downsampling.py), so a price history of
+#millions of ticks draws as fast as one of a thousand
+Series = namedtuple('Series', ['x', 'y', 'label', 'color', 'alpha', 'marker', 'width', 'max_points', 'downsample'])
+Series.__new__.__defaults__ = (None, None, 1.0, None, 0.8, None, 'lttb')
+
+#One violin on a 'violin' panel, drawn from a density that was already computed (see price_distributions.py): the outline is 'density' over
+#'grid' (scaled to 'width' at its widest), and 'summary' is (min, 25%, median, 75%, max) for the box and whiskers inside it
+Violin = namedtuple('Violin', ['position', 'grid', 'density', 'summary', 'label', 'color', 'alpha', 'width'])
+Violin.__new__.__defaults__ = (None, None, None, 0.7, 0.8)
+
+#One set of axes. 'kind' is 'bar', 'line', 'scatter' or 'violin' (whose series are Violins). 'yticklabels' can be 'percent' to label the y ticks as percentages
+Panel = namedtuple('Panel', ['kind', 'series', 'title', 'xlabel', 'ylabel', 'xticks', 'xticklabels', 'yticks', 'yticklabels', 'legend',
+                             'xtick_rotation'])
+Panel.__new__.__defaults__ = ('', '', '', None, None, None, None, False, 0)
+
+#One output file. 'panels' are laid out left to right on a single row, like 'plt.subplot(1, n, i)'
+ChartSpec = namedtuple('ChartSpec', ['filename', 'panels', 'figsize', 'dpi', 'wspace'])
+ChartSpec.__new__.__defaults__ = ((8, 4.5), 100, 0.3)
+
+
+#Shortcut for the most common chart in these scripts: one bar per label
+def bar_chart(filename, labels, values, title='', xlabel='', ylabel='', yticks=None, yticklabels=None, figsize=(8, 4.5), color=None):
+    positions = list(range(len(labels)))
+    panel = Panel('bar', [Series(positions, list(values), color=color)], title, xlabel, ylabel,
+                  xticks=positions, xticklabels=[str(label) for label in labels], yticks=yticks, yticklabels=yticklabels)
+    return ChartSpec(filename, [panel], figsize)
+
+
+#The x and y values to draw for a series, downsampled if it asks for it
+def _points(series, kind):
+    x, y = np.asarray(series.x), np.asarray(series.y)
+    if series.max_points is None or kind not in ('line', 'scatter'):
+        return x, y
+    keep = downsample_indices(x, y, series.max_points, series.downsample)
+    return x[keep], y[keep]
+
+
+def _draw_violin(ax, violin):
+    half = violin.width / 2 * np.asarray(violin.density) / np.max(violin.density)
+    ax.fill_betweenx(violin.grid, violin.position - half, violin.position + half, label=violin.label, color=violin.color, alpha=violin.alpha)
+    if violin.summary is not None:
+        low, lower_quartile, median, upper_quartile, high = violin.summary
+        ax.vlines(violin.position, low, high, color='black', linewidth=1)
+        ax.vlines(violin.position, lower_quartile, upper_quartile, color='black', linewidth=5)
+        ax.scatter([violin.position], [median], color='white', s=12, zorder=3)
+
+
+def _draw_panel(ax, panel):
+    dates = False
+    for series in panel.series:
+        if panel.kind == 'violin':
+            _draw_violin(ax, series)
+            continue
+        x, y = _points(series, panel.kind)
+        dates = dates or np.issubdtype(x.dtype, np.datetime64)
+        if panel.kind == 'bar':
+            ax.bar(x, y, width=series.width, label=series.label, color=series.color, alpha=series.alpha)
+        elif panel.kind == 'line':
+            ax.plot(x, y, label=series.label, color=series.color, alpha=series.alpha, marker=series.marker)
+        elif panel.kind == 'scatter':
+            ax.scatter(x, y, label=series.label, color=series.color, alpha=series.alpha, marker=series.marker)
+        else:
+            raise ValueError('Unknown chart kind: {!r}'.format(panel.kind))
+
+    #Real dates (datetime64 x values) get a proper date axis: a handful of ticks at sensible dates with short labels, instead of one text label per point
+    if dates and panel.xticks is None:
+        locator = AutoDateLocator()
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+
+    if panel.xticks is not None:
+        ax.set_xticks(panel.xticks)
+    if panel.xticklabels is not None:
+        ax.set_xticklabels(panel.xticklabels)
+    if panel.yticks is not None:
+        ax.set_yticks(panel.yticks)
+        if panel.yticklabels == 'percent':
+            ax.set_yticklabels(['{:.0%}'.format(tick) for tick in panel.yticks])
+        elif panel.yticklabels is not None:
+            ax.set_yticklabels(panel.yticklabels)
+    if panel.xtick_rotation:
+        ax.tick_params(axis='x', labelrotation=panel.xtick_rotation)
+    ax.set_title(panel.title)
+    ax.set_xlabel(panel.xlabel)
+    ax.set_ylabel(panel.ylabel)
+    if panel.legend:
+        ax.legend()
+
+
+#Draws one spec and saves it. Returns the path that was written
+def render_chart(spec):
+    figure = Figure(figsize=spec.figsize, dpi=spec.dpi)
+    FigureCanvasAgg(figure)
+    axes = figure.subplots(1, len(spec.panels), squeeze=False)[0]
+    for ax, panel in zip(axes, spec.panels):
+        _draw_panel(ax, panel)
+    figure.tight_layout()
+    if len(spec.panels) > 1:
+        figure.subplots_adjust(wspace=spec.wspace)
+
+    directory = os.path.dirname(spec.filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    figure.savefig(spec.filename)
+    return spec.filename
+
+
+#Worker processes are forked so they inherit matplotlib already loaded instead of importing it again in every worker. Where fork isn't available
+#we simply render in this process
+def _pool_context():
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+#Renders every spec and returns the written paths in the same order. With more than one spec (and processes != 1) the charts are drawn in parallel
+@profiled('plotting')
+def render_charts(specs, processes=None):
+    specs = list(specs)
+    context = _pool_context()
+    if len(specs) < 2 or processes == 1 or context is None:
+        return [render_chart(spec) for spec in specs]
+    workers = min(len(specs), processes or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        return list(pool.map(render_chart, specs))
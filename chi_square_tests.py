@@ -0,0 +1,179 @@
+from collections import namedtuple
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from stage_profile import profiled
+
+
+#----------------------------
+#----------------------------
+
+### BATCHED CHI-SQUARED TESTS FOR 2 x 2 CONTINGENCY TABLES ###
+
+#Both MuscleHub_Work_Script.py and Biodiversity_Work_Script.py used to type the counts from their pivots into contingency lists by hand and then
+#call 'chi2_contingency()' twice per table (once thrown away, once printed). This module builds the contingency arrays straight from the pivot frames
+#and tests any number of 2 x 2 tables in one NumPy computation. It gives the same statistic and p-value as scipy's 'chi2_contingency()' (including
+#Yates' continuity correction, which scipy applies by default to 2 x 2 tables)
+
+#Same fields (and order) as the tuple 'chi2_contingency()' returns, except every field is an array with one entry per table
+ChiSquareResult = namedtuple('ChiSquareResult', ['chi2', 'pvalue', 'dof', 'expected'])
+
+
+#Runs the chi-squared test on every 2 x 2 table in 'tables' (shape (..., 2, 2)) at once
+def chi2_2x2(tables, correction=True):
+    #Imported here rather than at the top, so loading cached ChiSquareResults (see stage_cache.py) doesn't pay for importing scipy
+    from scipy.stats import chi2 as chi2_distribution
+
+    observed = np.asarray(tables, dtype=float)
+    row_totals = observed.sum(axis=-1, keepdims=True)
+    column_totals = observed.sum(axis=-2, keepdims=True)
+    totals = observed.sum(axis=(-2, -1), keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = row_totals * column_totals / totals
+
+        #Yates' correction: move every observed count up to 0.5 closer to its expected count
+        if correction:
+            difference = expected - observed
+            observed = observed + np.sign(difference) * np.minimum(0.5, np.abs(difference))
+
+        chi2 = ((observed - expected) ** 2 / expected).sum(axis=(-2, -1))
+    pvalue = chi2_distribution.sf(chi2, 1)
+    return ChiSquareResult(chi2, pvalue, np.ones_like(chi2, dtype=int), expected)
+
+
+#----------------------------
+#----------------------------
+
+### BUILDING CONTINGENCY ARRAYS FROM PIVOTS ###
+
+#Pulls the count columns out of a pivot as an (n_groups, n_outcomes) array, with the group labels in the same order
+#e.g. contingency_from_pivot(app_pivot, 'ab_test_group', ['Application', 'No Application'])
+def contingency_from_pivot(pivot, label_column, count_columns):
+    labels = pivot[label_column].astype(str).to_numpy()
+    counts = pivot[list(count_columns)].fillna(0).to_numpy(dtype=np.int64)
+    return labels, counts
+
+
+#The actual (cached) work - the arguments are tuples so identical pivots are only ever tested once per run
+@lru_cache(maxsize=128)
+def _pairwise_tests(labels, counts, correction):
+    counts = np.array(counts, dtype=np.int64)
+    first, second = (np.array(side, dtype=np.intp) for side in zip(*combinations(range(len(labels)), 2)))
+    tables = np.stack([counts[first], counts[second]], axis=1)
+    result = chi2_2x2(tables, correction)
+
+    labels = np.array(labels, dtype=object)
+    frame = pd.DataFrame({'group_1': labels[first], 'group_2': labels[second],
+                          'chi2': result.chi2, 'pvalue': result.pvalue, 'dof': result.dof})
+    return frame, result.expected
+
+
+#Tests every pair of rows (groups) in a pivot against each other in one vectorized computation and returns one row per pair.
+#The pair's 2 x 2 table is [[group_1 counts], [group_2 counts]], with the columns in 'count_columns' order
+@profiled('chi-square')
+def pairwise_chi2(pivot, label_column, count_columns, correction=True):
+    labels, counts = contingency_from_pivot(pivot, label_column, count_columns)
+    if len(labels) < 2:
+        return pd.DataFrame(columns=['group_1', 'group_2', 'chi2', 'pvalue', 'dof'])
+    frame, _ = _pairwise_tests(tuple(labels), tuple(map(tuple, counts.tolist())), correction)
+    return frame.copy()
+
+
+#Cache lookup shared by 'pair_result()' - returns the batch for this pivot without copying it
+def _cached_batch(pivot, label_column, count_columns, correction):
+    labels, counts = contingency_from_pivot(pivot, label_column, count_columns)
+    return _pairwise_tests(tuple(labels), tuple(map(tuple, counts.tolist())), correction)
+
+
+#Looks up the test for one pair of groups, in either order, as a 'ChiSquareResult' of plain numbers (just like the tuple 'chi2_contingency()' prints).
+#Because of the cache above, asking about several pairs from the same pivot still only runs the batch once
+@profiled('chi-square')
+def pair_result(pivot, label_column, count_columns, group_1, group_2, correction=True):
+    results, expected = _cached_batch(pivot, label_column, count_columns, correction)
+    forward = np.flatnonzero((results.group_1 == group_1).to_numpy() & (results.group_2 == group_2).to_numpy())
+    backward = np.flatnonzero((results.group_1 == group_2).to_numpy() & (results.group_2 == group_1).to_numpy())
+    if len(forward):
+        row = forward[0]
+        table = expected[row]
+    elif len(backward):
+        row = backward[0]
+        table = expected[row][::-1]
+    else:
+        raise KeyError('No test for {!r} vs {!r} in this pivot'.format(group_1, group_2))
+    return ChiSquareResult(float(results.chi2.iat[row]), float(results.pvalue.iat[row]), int(results.dof.iat[row]), table.copy())
+
+
+#The sentence the work scripts print above a test result, worded from the p-value itself rather than typed in ahead of time
+def significance_sentence(result, group_1, group_2, alpha=0.05):
+    found = 'DID' if result.pvalue < alpha else 'DID NOT'
+    return ('The results of our chi-squared test {} reveal a statistically significant difference between {} and {} (p = {:.4f}, alpha = {}), '
+            'as shown below:'.format(found, group_1, group_2, result.pvalue, alpha))
+
+
+#----------------------------
+#----------------------------
+
+### MULTIPLE-COMPARISON CORRECTION ###
+
+#The more pairs we test, the more likely one of them looks "significant" by pure chance, so the p-values have to be adjusted for the number of tests.
+#Supported methods: 'bonferroni', 'holm' (step-down Bonferroni, never less powerful than plain Bonferroni) and 'fdr_bh' (Benjamini-Hochberg false discovery rate).
+#A NaN p-value (e.g. from a table with an empty row or column) isn't a test that was run: it stays NaN and isn't counted in the number of tests
+def adjust_pvalues(pvalues, method='holm'):
+    pvalues = np.asarray(pvalues, dtype=float)
+    if method not in ('bonferroni', 'holm', 'fdr_bh'):
+        raise ValueError('Unknown p-value correction method: {!r}'.format(method))
+    result = np.full(pvalues.shape, np.nan)
+    finite = np.isfinite(pvalues)
+    m = int(finite.sum())
+    if m == 0:
+        return result
+    tested = pvalues[finite]
+    if method == 'bonferroni':
+        result[finite] = np.minimum(tested * m, 1.0)
+        return result
+
+    order = np.argsort(tested, kind='stable')
+    ranked = tested[order]
+    if method == 'holm':
+        adjusted = np.maximum.accumulate(ranked * (m - np.arange(m)))
+    else:
+        adjusted = np.minimum.accumulate((ranked * m / np.arange(1, m + 1))[::-1])[::-1]
+
+    unranked = np.empty_like(adjusted)
+    unranked[order] = np.minimum(adjusted, 1.0)
+    result[finite] = unranked
+    return result
+
+
+#----------------------------
+#----------------------------
+
+### ALL-PAIRS SIGNIFICANCE MATRIX ###
+
+#Every field except 'labels' is an (n_groups x n_groups) dataframe indexed by group label on both axes. The diagonal (a group against itself) is empty
+ChiSquareMatrix = namedtuple('ChiSquareMatrix', ['labels', 'chi2', 'pvalue', 'adjusted_pvalue', 'significant'])
+
+
+#Tests every pair of groups in a pivot at once. The distinct pairs are the same cached batch 'pairwise_chi2()' and 'pair_result()' use (so a
+#pivot that was already tested isn't tested again), and each pair's numbers are mirrored across the diagonal. The p-values of the
+#n * (n - 1) / 2 pairs are corrected together with 'adjust_pvalues()', and 'significant' is the adjusted p-value compared against 'alpha'
+@profiled('chi-square matrix')
+def pairwise_chi2_matrix(pivot, label_column, count_columns, method='holm', alpha=0.05, correction=True):
+    labels, counts = contingency_from_pivot(pivot, label_column, count_columns)
+    n = len(labels)
+    chi2, pvalue, adjusted = np.full((n, n), np.nan), np.full((n, n), np.nan), np.full((n, n), np.nan)
+    if n >= 2:
+        results, _ = _pairwise_tests(tuple(labels), tuple(map(tuple, counts.tolist())), correction)
+        #'_pairwise_tests()' lists the pairs (i, j), i < j, in the same row-major order as the upper triangle
+        upper = np.triu_indices(n, k=1)
+        for values, tested in [(chi2, results.chi2.to_numpy()), (pvalue, results.pvalue.to_numpy()), (adjusted, adjust_pvalues(results.pvalue, method))]:
+            values[upper] = tested
+            values.T[upper] = tested
+
+    def frame(values):
+        return pd.DataFrame(values, index=pd.Index(labels, name=label_column), columns=pd.Index(labels, name=label_column))
+
+    return ChiSquareMatrix(list(labels), frame(chi2), frame(pvalue), frame(adjusted), frame(adjusted < alpha))
@@ -0,0 +1,84 @@
+import numpy as np
+
+
+#----------------------------
+#----------------------------
+
+### DOWNSAMPLING LONG SERIES BEFORE PLOTTING ###
+
+#A chart is only ~1000 pixels wide, so drawing millions of price ticks just makes matplotlib slow without showing anything more. Both methods here
+#pick a subset of the ORIGINAL points (nothing is averaged away), so the peaks and troughs of the series survive:
+#   - 'lttb' (Largest-Triangle-Three-Buckets): splits the series into buckets and keeps, from each, the point that makes the biggest triangle with
+#     the point kept before it and the average of the next bucket. Best for how a line "looks"
+#   - 'minmax': keeps the lowest and the highest point of every bucket (per pixel column). Guarantees every extreme is drawn
+#Both return the positions of the points to keep, so they can be used on any number of columns that share an x-axis.
+#NaN points are never kept
+
+DEFAULT_MAX_POINTS = 1000
+
+
+#Dates are downsampled on their integer nanoseconds
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = values.astype('datetime64[ns]').astype(np.int64)
+    return values.astype(float)
+
+
+def lttb_indices(x, y, max_points=DEFAULT_MAX_POINTS):
+    y = _as_float(y)
+    keep = np.flatnonzero(~np.isnan(y))
+    n = len(keep)
+    if max_points >= n or max_points < 3:
+        return keep
+    x = _as_float(x)[keep]
+    y = y[keep]
+
+    #'max_points - 2' buckets between the first and the last point, which are always kept. The last "bucket" [n - 1, n) is just the last point,
+    #so every bucket's next bucket has an average
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    counts = np.diff(np.append(edges, n))
+    average_x = np.add.reduceat(x, edges) / counts
+    average_y = np.add.reduceat(y, edges) / counts
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        #Twice the area of the triangle (previous point, candidate, average of the next bucket) for every candidate in the bucket at once
+        target_x, target_y = average_x[bucket + 1], average_y[bucket + 1]
+        areas = np.abs((x[previous] - target_x) * (y[start:stop] - y[previous]) - (x[previous] - x[start:stop]) * (target_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return keep[selected]
+
+
+#The lowest and highest point of each of 'max_points // 2' equal buckets (plus the first and last point), in order
+def minmax_indices(y, max_points=DEFAULT_MAX_POINTS):
+    y = _as_float(y)
+    n = len(y)
+    buckets = max(max_points // 2, 1)
+    if 2 * buckets >= n:
+        return np.flatnonzero(~np.isnan(y))
+
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    rows = padded.reshape(buckets, size)
+    lowest = np.argmin(np.where(np.isnan(rows), np.inf, rows), axis=1)
+    highest = np.argmax(np.where(np.isnan(rows), -np.inf, rows), axis=1)
+    offsets = np.arange(buckets) * size
+    indices = np.unique(np.concatenate([[0, n - 1], offsets + lowest, offsets + highest]))
+    indices = indices[indices < n]
+    return indices[~np.isnan(y[indices])]
+
+
+#Positions of the points to draw for one series, with either method
+def downsample_indices(x, y, max_points=DEFAULT_MAX_POINTS, method='lttb'):
+    if method == 'lttb':
+        return lttb_indices(x, y, max_points)
+    if method == 'minmax':
+        return minmax_indices(y, max_points)
+    raise ValueError('Unknown downsampling method: {!r}'.format(method))
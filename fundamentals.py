@@ -0,0 +1,110 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from stage_profile import profiled
+
+
+#----------------------------
+#----------------------------
+
+### QUARTERLY FUNDAMENTALS TABLE ###
+
+#Revenue, earnings and earnings per share (actual and estimate) in one long table with a row per ticker and quarter, instead of four hand-typed
+#lists per chart. Any ticker or quarter can be missing a value (NaN). The table can come from a CSV with these columns:
+#
+#   ticker,quarter,revenue,earnings,eps_actual,eps_estimate
+#   NFLX,2017Q1,,,0.40,0.37
+#
+#Quarters can be written '2017Q1' or '1Q2017' (how the Netflix charts label them). Revenue and earnings are in $ billions, EPS in $ per share
+
+FUNDAMENTAL_COLUMNS = ['revenue', 'earnings', 'eps_actual', 'eps_estimate']
+
+#The 2017 Netflix numbers from the Codecademy project, which the Netflix script used to have typed out as lists
+COURSE_FUNDAMENTALS = {
+    'ticker': ['NFLX'] * 5,
+    'quarter': ['2017Q1', '2017Q2', '2017Q3', '2017Q4', '2018Q1'],
+    'revenue': [np.nan, 2.79, 2.98, 3.29, 3.7],
+    'earnings': [np.nan, .0656, .12959, .18552, .29012],
+    'eps_actual': [.4, .15, .29, .41, np.nan],
+    'eps_estimate': [.37, .15, .32, .41, np.nan],
+}
+
+
+#'1Q2017' -> '2017Q1'. Anything else is left for pandas to parse
+def _quarter_string(text):
+    match = re.fullmatch(r'\s*([1-4])Q(\d{4})\s*', str(text))
+    return '{}Q{}'.format(match.group(2), match.group(1)) if match else str(text).strip()
+
+
+#The table sorted by ticker and quarter, with 'quarter' as a quarterly pandas Period
+def fundamentals_table(frame):
+    frame = pd.DataFrame(frame).copy()
+    frame['quarter'] = pd.PeriodIndex([_quarter_string(quarter) for quarter in frame['quarter']], freq='Q')
+    for column in FUNDAMENTAL_COLUMNS:
+        frame[column] = pd.to_numeric(frame[column], errors='coerce') if column in frame.columns else np.nan
+    frame = frame[['ticker', 'quarter'] + FUNDAMENTAL_COLUMNS]
+    return frame.sort_values(['ticker', 'quarter'], kind='stable').reset_index(drop=True)
+
+
+def read_fundamentals(path=None):
+    return fundamentals_table(pd.read_csv(path) if path else COURSE_FUNDAMENTALS)
+
+
+#'2017Q1' -> '1Q2017', the chart label style
+def quarter_labels(quarters):
+    return ['{}Q{}'.format(quarter.quarter, quarter.year) for quarter in quarters]
+
+
+#----------------------------
+#----------------------------
+
+### SURPRISE, MARGINS AND GROWTH ###
+
+#The table plus, for every row at once:
+#   eps_surprise_pct: how far actual EPS beat (+) or missed (-) the estimate, as a % of the estimate
+#   net_margin:       earnings / revenue
+#   revenue_qoq, earnings_qoq: growth over the same ticker's PREVIOUS quarter (NaN when that quarter isn't in the table)
+@profiled('fundamentals')
+def fundamental_metrics(table):
+    tickers = table['ticker'].to_numpy()
+    quarters = table['quarter'].array.asi8
+    #A row follows on from the one before it when it's the same ticker and exactly one quarter later (the table is sorted by ticker and quarter)
+    follows = np.zeros(len(table), dtype=bool)
+    follows[1:] = (tickers[1:] == tickers[:-1]) & (quarters[1:] - quarters[:-1] == 1)
+
+    def growth(column):
+        values = table[column].to_numpy(dtype=float)
+        previous = np.full(len(values), np.nan)
+        previous[1:] = values[:-1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(follows, values / previous - 1, np.nan)
+
+    actual, estimate = table['eps_actual'].to_numpy(dtype=float), table['eps_estimate'].to_numpy(dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return table.assign(eps_surprise_pct=(actual - estimate) / np.abs(estimate) * 100,
+                            net_margin=table['earnings'].to_numpy(dtype=float) / table['revenue'].to_numpy(dtype=float),
+                            revenue_qoq=growth('revenue'), earnings_qoq=growth('earnings'))
+
+
+#----------------------------
+#----------------------------
+
+### GROUPED (SIDE-BY-SIDE) BARS ###
+
+#x positions for 'series' bars side by side in each of 'groups' groups: the course formula 't*element + w*n' (t = number of series, w = bar width,
+#n = 1...t) for every series and group in one array. Returns (positions as a (series x groups) array, the middle of each group for its tick)
+def grouped_bar_layout(series, groups, width=0.8):
+    positions = series * np.arange(groups)[None, :] + width * np.arange(1, series + 1)[:, None]
+    return positions, positions.mean(axis=0)
+
+
+#A chart panel of side-by-side bars: 'values' is (series x groups), e.g. [revenue, earnings] x quarters. Works for any number of either
+def grouped_bar_panel(values, series_labels, group_labels, title='', xlabel='', ylabel='', width=0.8):
+    from chart_rendering import Panel, Series
+
+    values = np.asarray(values, dtype=float)
+    positions, middles = grouped_bar_layout(values.shape[0], values.shape[1], width)
+    bars = [Series(list(x), list(y), label=label, width=width) for x, y, label in zip(positions, values, series_labels)]
+    return Panel('bar', bars, title, xlabel, ylabel, xticks=list(middles), xticklabels=list(group_labels), legend=True)
@@ -0,0 +1,316 @@
+import hashlib
+import io
+import os
+import pickle
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from stage_profile import profiled
+
+
+#----------------------------
+#----------------------------
+
+### INCREMENTAL INGEST OF APPEND-ONLY CSV FEEDS ###
+
+#The observation, price and MuscleHub feeds only ever grow at the end, yet every run used to read them from the top and rebuild every total. Here
+#each source remembers how far it has been read (a byte offset, plus the last timestamp for price files), and the next run:
+#   - seeks straight to that offset and parses ONLY the rows appended since, with the header saved from the first read
+#   - folds those rows into the saved aggregate (sheep totals, rolling NFLX vs. DJI statistics, funnel counts) instead of recomputing it
+#A file that was rewritten rather than appended to is read again from the top, and its aggregate rebuilt. We can tell because it got shorter, its
+#first or last 64 KB before the saved offset changed, or its last line had no newline and what came next doesn't start with one (the line was
+#still being written). A source's offset and the aggregate built from it are saved together in one pickle in '.cache/incremental/', so they can
+#never get out of step, and the pickle is only replaced once the new rows have been used
+
+INCREMENTAL_DIR = os.path.join('.cache', 'incremental')
+FINGERPRINT_BYTES = 1 << 16
+DEFAULT_CHUNK_ROWS = 1000000
+
+#How far one source has been read: 'offset' is the byte position after the last row used, 'fingerprint' a hash of the bytes just before it,
+#'header' the raw header line, 'partial' whether the file ended without a newline, 'rows' how many rows have been used in total and
+#'last_timestamp' the latest timestamp seen (None when the source isn't tracked by time)
+SourceState = namedtuple('SourceState', ['offset', 'fingerprint', 'header', 'partial', 'rows', 'last_timestamp'])
+SourceState.__new__.__defaults__ = (None,)
+
+#What one update read from one source: the new rows it used, and whether it had to start again from the top
+IngestReport = namedtuple('IngestReport', ['source', 'rows', 'reset'])
+
+
+#A hash of the first and last FINGERPRINT_BYTES before 'offset': cheap, and catches a file that was replaced rather than appended to
+def _fingerprint(path, offset):
+    with open(path, 'rb') as source:
+        head = source.read(min(offset, FINGERPRINT_BYTES))
+        source.seek(max(offset - FINGERPRINT_BYTES, 0))
+        tail = source.read(min(offset, FINGERPRINT_BYTES))
+    return hashlib.sha256(head + b'\0' + tail).hexdigest()
+
+
+#A file-like view of 'header' followed by bytes [start, stop) of 'path', so pandas can parse the appended rows as a CSV of their own without
+#the file being read into memory first
+class _AppendedBytes(io.RawIOBase):
+
+    def __init__(self, path, header, start, stop):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._prefix = header
+        self._remaining = stop - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._prefix:
+            size = min(len(buffer), len(self._prefix))
+            buffer[:size] = self._prefix[:size]
+            self._prefix = self._prefix[size:]
+            return size
+        if self._remaining <= 0:
+            return 0
+        size = self._file.readinto(memoryview(buffer)[:min(len(buffer), self._remaining)])
+        self._remaining -= size
+        return size
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+#The rows appended to 'path' since 'state' (a SourceState from an earlier run, or None for the first). 'reset' says whether the whole file has
+#to be read again. Read the rows with 'read()', use them, and only then save 'state()' for next time
+class AppendedRows:
+
+    def __init__(self, path, state=None):
+        self.path = path
+        self.stop = os.path.getsize(path)
+        self.reset = not self._continues(state)
+        if self.reset:
+            with open(path, 'rb') as source:
+                self.header = source.readline()
+            self.start, self.rows, self.last_timestamp = len(self.header), 0, None
+        else:
+            self.header, self.start, self.rows, self.last_timestamp = state.header, state.offset, state.rows, state.last_timestamp
+        self.new_rows = 0
+
+    def _continues(self, state):
+        if state is None or self.stop < state.offset or _fingerprint(self.path, state.offset) != state.fingerprint:
+            return False
+        if state.partial and self.stop > state.offset:
+            with open(self.path, 'rb') as source:
+                source.seek(state.offset)
+                return source.read(1) in (b'\n', b'\r')
+        return True
+
+    #The appended rows as one frame, or (with 'chunksize') an iterator of frames. With 'timestamp_column', rows at or before the last timestamp
+    #already used are dropped, so a feed that re-sends its last few rows doesn't count them twice. Other arguments go to 'pd.read_csv()'
+    def read(self, chunksize=None, timestamp_column=None, **read_csv_kwargs):
+        if self.stop <= self.start:
+            empty = pd.read_csv(io.BytesIO(self.header), **read_csv_kwargs)
+            return iter(()) if chunksize else empty
+        reader = pd.read_csv(io.BufferedReader(_AppendedBytes(self.path, self.header, self.start, self.stop)), chunksize=chunksize, **read_csv_kwargs)
+        if chunksize is None:
+            return self._track(reader, timestamp_column)
+        return (self._track(chunk, timestamp_column) for chunk in reader)
+
+    def _track(self, frame, timestamp_column):
+        if timestamp_column is not None:
+            stamps = pd.to_datetime(frame[timestamp_column])
+            if self.last_timestamp is not None:
+                keep = (stamps > self.last_timestamp).to_numpy()
+                frame, stamps = frame[keep], stamps[keep]
+            if len(stamps):
+                self.last_timestamp = stamps.max() if self.last_timestamp is None else max(self.last_timestamp, stamps.max())
+        self.new_rows += len(frame)
+        return frame
+
+    def state(self):
+        with open(self.path, 'rb') as source:
+            source.seek(max(self.stop - 1, 0))
+            partial = self.stop > 0 and source.read(1) != b'\n'
+        return SourceState(self.stop, _fingerprint(self.path, self.stop), self.header, partial, self.rows + self.new_rows, self.last_timestamp)
+
+    def report(self):
+        return IngestReport(self.path, self.new_rows, self.reset)
+
+
+#----------------------------
+
+### SAVED STATE ###
+
+#Each aggregate is saved under its own name along with a 'key' describing how it was built (source paths, target species, windows...). State
+#saved under a different key is ignored, so changing an option rebuilds the aggregate from scratch instead of mixing two definitions
+def _state_path(name, directory):
+    return os.path.join(directory, name + '.pkl')
+
+
+def load_state(name, key, directory=INCREMENTAL_DIR):
+    try:
+        with open(_state_path(name, directory), 'rb') as state_file:
+            saved = pickle.load(state_file)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    return saved['state'] if isinstance(saved, dict) and saved.get('key') == key else None
+
+
+def save_state(name, key, state, directory=INCREMENTAL_DIR):
+    os.makedirs(directory, exist_ok=True)
+    temp_path = _state_path(name, directory) + '.tmp'
+    with open(temp_path, 'wb') as state_file:
+        pickle.dump({'key': key, 'state': state}, state_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, _state_path(name, directory))
+
+
+#{name: path} -> {name: AppendedRows}. If ANY of the sources has to start again, they all do, since the aggregate mixes all of them
+def open_sources(paths, states):
+    states = states or {}
+    sources = {name: AppendedRows(path, states.get(name)) for name, path in paths.items()}
+    if any(source.reset for source in sources.values()) and not all(source.reset for source in sources.values()):
+        sources = {name: AppendedRows(path) for name, path in paths.items()}
+    return sources
+
+
+#----------------------------
+#----------------------------
+
+### SHEEP (OR ANY SPECIES) OBSERVATIONS BY PARK ###
+
+#The running (park_name, scientific_name) -> observations sums of the target species, like 'biodiversity_data.stream_observation_totals()'
+#but only the rows appended since the last run are read, in chunks, and added onto the saved sums. Returns (totals frame, [IngestReport])
+@profiled('load (incremental)')
+def update_observation_totals(path, scientific_names, chunksize=DEFAULT_CHUNK_ROWS, directory=INCREMENTAL_DIR):
+    from biodiversity_data import OBSERVATIONS_SCHEMA, observation_totals_frame
+
+    targets = pd.Index(sorted(pd.unique(pd.Series(list(scientific_names), dtype='str'))))
+    key = {'source': os.path.abspath(path), 'targets': list(targets)}
+    name = 'observation_totals'
+    saved = load_state(name, key, directory)
+    sources = open_sources({'observations': path}, saved and saved['sources'])
+    totals = None if sources['observations'].reset else saved['totals']
+
+    for chunk in sources['observations'].read(chunksize, dtype=OBSERVATIONS_SCHEMA):
+        chunk = chunk[chunk['scientific_name'].isin(targets)]
+        if chunk.empty:
+            continue
+        partial = chunk.groupby(['park_name', 'scientific_name'], observed=True)['observations'].sum()
+        totals = partial if totals is None else totals.add(partial, fill_value=0)
+
+    save_state(name, key, {'sources': {source_name: source.state() for source_name, source in sources.items()}, 'totals': totals}, directory)
+    return observation_totals_frame(totals), [source.report() for source in sources.values()]
+
+
+#----------------------------
+#----------------------------
+
+### ROLLING STATISTICS OF ONE TICKER AGAINST A BENCHMARK ###
+
+#The Netflix 'analytics' stage's rolling table (correlation, beta, volatility, drawdown of 'ticker' against 'benchmark') kept up to date as
+#rows are appended to either price CSV. Only the appended rows are read, and the statistics are only worked out for the new dates, from:
+#   - the last max(window) rows already used, which is all any rolling window of a new date can reach back to
+#   - the running peak price, for the drawdowns
+#A date is only finished once BOTH sources have reached it (the earlier of their last timestamps). Later rows wait in the buffer, since the
+#other ticker's row for that date may still be on its way and would change the returns. Returns (table, [IngestReport])
+@profiled('analytics (incremental)')
+def update_rolling_comparison(paths, ticker, benchmark, volatility_window=21, beta_window=63, directory=INCREMENTAL_DIR):
+    from price_analytics import TRADING_DAYS_PER_YEAR, log_returns, price_panel, rolling_beta, rolling_correlation, rolling_volatility
+
+    key = {'sources': {source_name: os.path.abspath(path) for source_name, path in paths.items()}, 'ticker': ticker, 'benchmark': benchmark,
+           'windows': (volatility_window, beta_window)}
+    name = 'rolling_{}_vs_{}'.format(ticker, benchmark)
+    saved = load_state(name, key, directory)
+    sources = open_sources(paths, saved and saved['sources'])
+    if saved is None or any(source.reset for source in sources.values()):
+        saved = {'buffer': None, 'table': None, 'peak': np.nan, 'finished': None}
+
+    frames = {source_name: source.read(timestamp_column='Date', usecols=['Date', 'Adj Close']).rename(columns={'Adj Close': 'Price'})
+              for source_name, source in sources.items()}
+    new_prices = price_panel(frames)[[ticker, benchmark]].astype(float)
+    buffer = new_prices if saved['buffer'] is None else saved['buffer'].combine_first(new_prices)[[ticker, benchmark]]
+
+    stamps = [source.last_timestamp for source in sources.values()]
+    watermark = None if any(stamp is None for stamp in stamps) else min(stamps)
+    table, peak, finished = saved['table'], saved['peak'], saved['finished']
+    if watermark is not None:
+        upto = buffer[buffer.index <= watermark]
+        new_dates = upto.index > finished if finished is not None else np.ones(len(upto), dtype=bool)
+        if new_dates.any():
+            returns = log_returns(upto)
+            prices = upto[ticker].to_numpy()[new_dates]
+            #The running peak carries on from the saved one, so the drawdowns match a run over the whole history
+            running_peak = np.fmax.accumulate(np.concatenate([[peak], prices]))[1:]
+            rows = pd.DataFrame({'correlation': rolling_correlation(returns[[ticker]], returns[benchmark], beta_window)[ticker].to_numpy()[new_dates],
+                                 'beta': rolling_beta(returns[[ticker]], returns[benchmark], beta_window)[ticker].to_numpy()[new_dates],
+                                 'volatility': rolling_volatility(returns[[ticker]], volatility_window, TRADING_DAYS_PER_YEAR)[ticker].to_numpy()[new_dates],
+                                 'drawdown': prices / running_peak - 1},
+                                index=upto.index[new_dates])
+            table = rows if table is None else pd.concat([table, rows])
+            peak, finished = running_peak[-1], upto.index[-1]
+        #Keep just enough finished rows for the next run's windows, plus every row that isn't finished yet
+        buffer = pd.concat([upto.iloc[-max(volatility_window, beta_window):], buffer[buffer.index > watermark]])
+
+    if table is None:
+        table = pd.DataFrame({column: pd.Series(dtype=float) for column in ['correlation', 'beta', 'volatility', 'drawdown']},
+                             index=pd.DatetimeIndex([], name='Date'))
+    save_state(name, key, {'sources': {source_name: source.state() for source_name, source in sources.items()}, 'buffer': buffer,
+                           'table': table, 'peak': peak, 'finished': finished}, directory)
+    return table, [source.report() for source in sources.values()]
+
+
+#----------------------------
+#----------------------------
+
+### MUSCLEHUB FUNNEL COUNTS ###
+
+#The 2 x 2 x 2 funnel counts (see 'musclehub_funnel.funnel_contingency()') kept up to date as rows are appended to the four MuscleHub CSVs.
+#Instead of joining the tables again, every visitor (first_name, last_name, email) keeps four flags: visited on or after 'start_date', took a
+#fitness test, applied, purchased. The rows appended to ANY table only flip the flags of the visitors they mention, so the counts are updated by
+#taking those visitors out of their old cell and putting them into their new one - e.g. a purchase that arrives a week after the visit moves its
+#visitor from 'Not Member' to 'Member'. Like the old '.first_name.count()', visitors with no first_name aren't counted. ***NOTE: this counts
+#each visitor once, which matches the SQL join as long as every table has one row per visitor (true of the course data). Returns
+#(FunnelTables, [IngestReport])
+FUNNEL_FLAGS = {'visits': 'visit_date', 'fitness_tests': 'fitness_test_date', 'applications': 'application_date', 'purchases': 'purchase_date'}
+
+
+#Funnel cell code of each visitor, like 'funnel_contingency()': group * 4 + application * 2 + member, with 0 = 'A'/'Application'/'Member'
+def _funnel_cells(flags):
+    return ((~flags['fitness_tests'].to_numpy()).astype(np.intp) * 4 + (~flags['applications'].to_numpy()).astype(np.intp) * 2
+            + (~flags['purchases'].to_numpy()).astype(np.intp))
+
+
+@profiled('groupby + pivot (incremental)')
+def update_funnel_counts(csv_dir='.', start_date='2017-07-01', directory=INCREMENTAL_DIR):
+    from musclehub_db import JOIN_KEY
+    from musclehub_funnel import funnel_tables
+
+    start_date = pd.Timestamp(start_date).normalize()
+    paths = {table: os.path.join(csv_dir, table + '.csv') for table in FUNNEL_FLAGS}
+    key = {'sources': {table: os.path.abspath(path) for table, path in paths.items()}, 'start_date': str(start_date.date())}
+    name = 'funnel_counts'
+    saved = load_state(name, key, directory)
+    sources = open_sources(paths, saved and saved['sources'])
+    if saved is None or any(source.reset for source in sources.values()):
+        saved = {'visitors': pd.DataFrame({flag: pd.Series(dtype=bool) for flag in FUNNEL_FLAGS}, index=pd.Index([], dtype=object)),
+                 'counts': np.zeros((2, 2, 2), dtype=np.int64)}
+
+    #One row per (visitor, flag raised by this row), from every table's new rows
+    updates = []
+    for table, source in sources.items():
+        rows = source.read(usecols=JOIN_KEY + [FUNNEL_FLAGS[table]], dtype={column: 'str' for column in JOIN_KEY})
+        rows = rows[rows['first_name'].notna()]
+        dates = pd.to_datetime(rows[FUNNEL_FLAGS[table]], errors='coerce', format='mixed')
+        raised = (dates >= start_date) if table == 'visits' else dates.notna()
+        visitor = rows['first_name'] + '\x1f' + rows['last_name'].fillna('') + '\x1f' + rows['email'].fillna('')
+        updates.append(pd.DataFrame({table: raised.to_numpy()}, index=visitor.to_numpy()))
+
+    visitors, counts = saved['visitors'], saved['counts'].copy()
+    if updates:
+        changed = pd.concat(updates).reindex(columns=list(FUNNEL_FLAGS)).fillna(False).astype(bool).groupby(level=0).any()
+        before = visitors.reindex(changed.index, fill_value=False).astype(bool)
+        after = before | changed
+        counts -= np.bincount(_funnel_cells(before[before['visits']]), minlength=8).reshape(2, 2, 2)
+        counts += np.bincount(_funnel_cells(after[after['visits']]), minlength=8).reshape(2, 2, 2)
+        visitors = pd.concat([visitors[~visitors.index.isin(changed.index)], after])
+
+    save_state(name, key, {'sources': {table: source.state() for table, source in sources.items()}, 'visitors': visitors, 'counts': counts},
+               directory)
+    return funnel_tables(counts), [source.report() for source in sources.values()]
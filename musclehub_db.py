@@ -0,0 +1,174 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+from stage_cache import file_hash
+from stage_profile import profiled
+
+
+#----------------------------
+#----------------------------
+
+### LOCAL SQLITE ENGINE FOR THE MUSCLEHUB TABLES ###
+
+#This module replaces the 'codecademySQL' helper. The four MuscleHub tables live in a local SQLite file, the dates are stored as ISO-8601
+#'YYYY-MM-DD' values in DATE columns (so comparing them IS comparing dates, unlike the old '7-1-17' strings), and the join key
+#(first_name, last_name, email) is indexed on every table that gets joined onto "visits"
+
+DEFAULT_DB_PATH = 'musclehub.db'
+
+#Table name -> the date column(s) in that table
+MUSCLEHUB_TABLES = {
+    'visits': ['visit_date'],
+    'fitness_tests': ['fitness_test_date'],
+    'applications': ['application_date'],
+    'purchases': ['purchase_date'],
+}
+
+JOIN_KEY = ['first_name', 'last_name', 'email']
+
+#Which CSV each table was built from (path, size, modification time and sha256), so 'connect()' can tell when the database is out of date
+SOURCES_TABLE = 'table_sources'
+
+FUNNEL_QUERY = '''
+SELECT visits.first_name,
+       visits.last_name,
+       visits.email,
+       visits.gender,
+       visits.visit_date,
+       fitness_tests.fitness_test_date,
+       applications.application_date,
+       purchases.purchase_date
+FROM visits
+LEFT JOIN fitness_tests
+    ON fitness_tests.first_name = visits.first_name
+    AND fitness_tests.last_name = visits.last_name
+    AND fitness_tests.email = visits.email
+LEFT JOIN applications
+    ON applications.first_name = visits.first_name
+    AND applications.last_name = visits.last_name
+    AND applications.email = visits.email
+LEFT JOIN purchases
+    ON purchases.first_name = visits.first_name
+    AND purchases.last_name = visits.last_name
+    AND purchases.email = visits.email
+WHERE visits.visit_date >= ?
+'''
+
+
+#----------------------------
+#----------------------------
+
+### BUILDING THE DATABASE ###
+
+#Turning whatever date format the source uses ('7-1-17', '2017-07-01', ...) into ISO strings. Missing dates stay missing (NULL in SQLite)
+def _to_iso_dates(values):
+    dates = pd.to_datetime(values, errors='coerce', format='mixed')
+    return dates.dt.strftime('%Y-%m-%d').where(dates.notna(), None)
+
+
+#Writes one table, declaring its date columns as DATE, then indexes it. "visits" gets an index on visit_date so the
+#'visit_date >= ?' filter is a range scan, and the three lookup tables get a composite index on the join key
+def write_table(conn, name, frame):
+    frame = frame.copy()
+    date_columns = [column for column in MUSCLEHUB_TABLES.get(name, []) if column in frame.columns]
+    for column in date_columns:
+        frame[column] = _to_iso_dates(frame[column])
+
+    conn.execute('DROP TABLE IF EXISTS {}'.format(name))
+    frame.to_sql(name, conn, index=False, dtype={column: 'DATE' for column in date_columns})
+
+    key = [column for column in JOIN_KEY if column in frame.columns]
+    if key:
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_{0}_person ON {0} ({1})'.format(name, ', '.join(key)))
+    if name == 'visits' and 'visit_date' in frame.columns:
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_visits_visit_date ON visits (visit_date)')
+    conn.commit()
+
+
+#(path, size, mtime_ns) of a table's CSV, or None when there isn't one
+def _csv_stat(csv_dir, name):
+    path = os.path.join(csv_dir, name + '.csv')
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+#Builds the database from the '<table>.csv' files in 'csv_dir'. Each CSV's size, modification time and sha256 are recorded in SOURCES_TABLE
+@profiled('build database')
+def build_database(db_path=DEFAULT_DB_PATH, csv_dir='.'):
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute('DROP TABLE IF EXISTS {}'.format(SOURCES_TABLE))
+        conn.execute('CREATE TABLE {} (name TEXT PRIMARY KEY, path TEXT, size INTEGER, mtime_ns INTEGER, sha256 TEXT)'.format(SOURCES_TABLE))
+        for name in MUSCLEHUB_TABLES:
+            path, size, mtime_ns = _csv_stat(csv_dir, name) or (os.path.join(csv_dir, name + '.csv'), None, None)
+            write_table(conn, name, pd.read_csv(path))
+            conn.execute('INSERT INTO {} VALUES (?, ?, ?, ?, ?)'.format(SOURCES_TABLE), (name, os.path.abspath(path), size, mtime_ns, file_hash(path)))
+        conn.execute('ANALYZE')
+        conn.commit()
+    finally:
+        conn.close()
+    return db_path
+
+
+#Whether any table's CSV in 'csv_dir' differs from the one the database was built from. A CSV whose size and modification time still match is
+#taken as unchanged, otherwise its sha256 decides (so just touching a file doesn't rebuild anything, and its new size and modification time are
+#recorded so it isn't hashed again next run). Tables with no CSV are left alone, and a database from before SOURCES_TABLE existed is always out
+#of date
+def is_stale(db_path=DEFAULT_DB_PATH, csv_dir='.'):
+    conn = sqlite3.connect(db_path)
+    try:
+        try:
+            recorded = {row[0]: row[1:] for row in conn.execute('SELECT name, path, size, mtime_ns, sha256 FROM {}'.format(SOURCES_TABLE))}
+        except sqlite3.DatabaseError:
+            return True
+        for name in MUSCLEHUB_TABLES:
+            current = _csv_stat(csv_dir, name)
+            if current is None:
+                continue
+            path, size, mtime_ns, sha256 = recorded.get(name, (None, None, None, None))
+            if path != current[0]:
+                return True
+            if (size, mtime_ns) != current[1:]:
+                if sha256 != file_hash(current[0]):
+                    return True
+                conn.execute('UPDATE {} SET size = ?, mtime_ns = ? WHERE name = ?'.format(SOURCES_TABLE), current[1:] + (name,))
+                conn.commit()
+        return False
+    finally:
+        conn.close()
+
+
+#Opens the database, building it from the CSVs in 'csv_dir' the first time round and again whenever one of them has changed
+def connect(db_path=DEFAULT_DB_PATH, csv_dir='.'):
+    if not os.path.exists(db_path) or is_stale(db_path, csv_dir):
+        build_database(db_path, csv_dir)
+    return sqlite3.connect(db_path)
+
+
+#----------------------------
+#----------------------------
+
+### QUERYING ###
+
+#Drop-in replacement for 'codecademySQL.sql_query' - any column ending in '_date' comes back as a real datetime column
+def sql_query(query, params=None, db_path=DEFAULT_DB_PATH):
+    conn = connect(db_path)
+    try:
+        result = pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+    for column in result.columns:
+        if column.endswith('_date'):
+            result[column] = pd.to_datetime(result[column], format='%Y-%m-%d')
+    return result
+
+
+#The big four-way LEFT JOIN from MuscleHub_Work_Script.py. Only visits on or after 'start_date' are kept
+@profiled('merge')
+def load_funnel(start_date='2017-07-01', db_path=DEFAULT_DB_PATH):
+    start_date = pd.Timestamp(start_date).strftime('%Y-%m-%d')
+    return sql_query(FUNNEL_QUERY, params=(start_date,), db_path=db_path)
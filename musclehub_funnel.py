@@ -0,0 +1,109 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from stage_profile import profiled
+
+
+#----------------------------
+#----------------------------
+
+### FUNNEL STAGE DEFINITIONS ###
+
+#Each funnel stage is derived from whether a date column is filled in. The tuple holds:
+# (new column name, date column it is derived from, label when the date is present, label when the date is missing)
+#The labels are the same ones MuscleHub_Work_Script.py has always used, so the groupby/pivot code downstream doesn't change
+FUNNEL_STAGES = [
+    ('ab_test_group', 'fitness_test_date', 'A', 'B'),
+    ('is_application', 'application_date', 'Application', 'No Application'),
+    ('is_member', 'purchase_date', 'Member', 'Not Member'),
+]
+
+
+#----------------------------
+#----------------------------
+
+### VECTORIZED FLAG BUILDER ###
+
+#Builds a categorical column straight from a null mask - ***NOTE: code 0 is the "present" label and code 1 is the "missing" label, so the
+#boolean mask itself IS the category code and no Python-level function is ever called per row
+def flag_from_dates(dates, present_label, missing_label):
+    codes = pd.isnull(dates).astype(np.int8)
+    if isinstance(dates, pd.Series):
+        codes = codes.to_numpy()
+    return pd.Categorical.from_codes(codes, categories=[present_label, missing_label])
+
+
+#Adds every funnel stage flag to the dataframe in one pass over the date columns. Stages whose date column isn't in the frame are skipped,
+#which lets the same function run on the partial tables as well as the fully joined "df"
+@profiled('flags')
+def add_funnel_flags(df, stages=FUNNEL_STAGES, inplace=True):
+    if not inplace:
+        df = df.copy()
+    for column, date_column, present_label, missing_label in stages:
+        if date_column not in df.columns:
+            continue
+        df[column] = pd.Series(flag_from_dates(df[date_column].to_numpy(), present_label, missing_label),
+                               index=df.index)
+    return df
+
+
+#----------------------------
+#----------------------------
+
+### ORIGINAL PER-ROW PATH ###
+
+#This is the exact '.apply(lambda x: ...)' logic the script used before. We keep it around so the benchmark has something to compare against
+def add_funnel_flags_apply(df, stages=FUNNEL_STAGES):
+    for column, date_column, present_label, missing_label in stages:
+        if date_column not in df.columns:
+            continue
+        df[column] = df[date_column].apply(lambda x: present_label if pd.notnull(x) else missing_label)
+    return df
+
+
+#----------------------------
+#----------------------------
+
+### SINGLE-PASS CONTINGENCY TABLES ###
+
+#Everything the script used to get from three separate groupby -> count -> pivot -> Total -> Percent pipelines:
+# counts             - 2 x 2 x 2 array of visitor counts indexed by [ab_test_group, is_application, is_member], code 0 = 'A'/'Application'/'Member'
+# ab_counts          - visitors per A/B group (same as the old "ab_counts" frame)
+# app_pivot          - visitors who did/didn't apply, per group
+# member_pivot       - applicants who did/didn't purchase, per group (the old "just_apps" table)
+# final_member_pivot - visitors who did/didn't purchase, per group
+FunnelTables = namedtuple('FunnelTables', ['counts', 'ab_counts', 'app_pivot', 'member_pivot', 'final_member_pivot'])
+
+
+#Builds one pivot frame in the same layout the script always printed: group column, the two outcome columns, 'Total' and the percent column
+def _pivot_frame(table, outcome_column, labels, percent_column):
+    pivot = pd.DataFrame({'ab_test_group': ['A', 'B'], labels[0]: table[:, 0], labels[1]: table[:, 1]})
+    pivot['Total'] = table.sum(axis=1)
+    pivot[percent_column] = pivot[labels[0]] / pivot['Total']
+    pivot.columns.name = outcome_column
+    return pivot
+
+
+#Computes every stage-to-stage table in a single scan. Each visitor gets an integer cell code (group * 4 + application * 2 + member) from the
+#three date null masks, and one 'np.bincount()' counts all 8 cells at once. Every pivot is then just a sum or a slice of that 2 x 2 x 2 array.
+#Like the old '.first_name.count()', rows with a missing first_name aren't counted
+@profiled('groupby + pivot')
+def funnel_contingency(df, stages=FUNNEL_STAGES, count_column='first_name'):
+    (_, group_dates, _, _), (_, app_dates, _, _), (_, member_dates, _, _) = stages
+    cells = (pd.isnull(df[group_dates].to_numpy()).astype(np.intp) * 4
+             + pd.isnull(df[app_dates].to_numpy()).astype(np.intp) * 2
+             + pd.isnull(df[member_dates].to_numpy()).astype(np.intp))
+    if count_column is not None:
+        cells = cells[pd.notnull(df[count_column].to_numpy())]
+    return funnel_tables(np.bincount(cells, minlength=8).reshape(2, 2, 2), count_column)
+
+
+#Every table from the 2 x 2 x 2 counts alone, however they were counted (see also incremental.py, which keeps the counts up to date as rows arrive)
+def funnel_tables(counts, count_column='first_name'):
+    ab_counts = pd.DataFrame({'ab_test_group': ['A', 'B'], count_column or 'count': counts.sum(axis=(1, 2))})
+    app_pivot = _pivot_frame(counts.sum(axis=2), 'is_application', ['Application', 'No Application'], 'Percent with Application')
+    member_pivot = _pivot_frame(counts[:, 0, :], 'is_member', ['Member', 'Not Member'], 'Percent Purchase')
+    final_member_pivot = _pivot_frame(counts.sum(axis=1), 'is_member', ['Member', 'Not Member'], 'Percent Purchase')
+    return FunnelTables(counts, ab_counts, app_pivot, member_pivot, final_member_pivot)
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+from stage_profile import profiled
+
+
+#----------------------------
+#----------------------------
+
+### LINING UP PRICE SERIES OF DIFFERENT FREQUENCIES ###
+
+#"NFLX.csv" is monthly and "DJI.csv" is daily, so their rows don't line up on dates. Here dates are parsed once, each series is put on one common
+#calendar, and the result is ONE wide frame (a row per date, a column per field and ticker) that every comparison can use in a single pass:
+#   - a finer series (daily DJI on a monthly calendar) is resampled into OHLC bars: first Open, highest High, lowest Low, last Close, summed Volume
+#   - a coarser series (monthly NFLX on a daily calendar) is joined "as of" each date: the latest price known on or before that date
+#The as-of join is one 'np.searchsorted()' per ticker, no matter how many dates there are
+
+#How each column is combined when several rows fall in the same bar
+OHLC_AGGREGATIONS = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Adj Close': 'last',
+    'Price': 'last',
+    'Volume': 'sum',
+}
+
+
+#Returns the frame indexed by its parsed, sorted dates (a 'Date' column is turned into the index; a DatetimeIndex is left as it is)
+def parse_dates(frame, column='Date'):
+    if not isinstance(frame.index, pd.DatetimeIndex):
+        frame = frame.set_index(pd.DatetimeIndex(pd.to_datetime(frame[column]), name=column)).drop(columns=column)
+    if not frame.index.is_monotonic_increasing:
+        frame = frame.sort_index()
+    return frame
+
+
+#OHLC bars at 'freq' (a pandas frequency like 'MS' for month starts, 'W' or 'B'). Columns that aren't prices or volume are dropped, and bars
+#with no rows at all are left out
+def resample_ohlc(frame, freq):
+    frame = parse_dates(frame)
+    aggregations = {column: how for column, how in OHLC_AGGREGATIONS.items() if column in frame.columns}
+    bars = frame[list(aggregations)].resample(freq).agg(aggregations)
+    counts = frame.iloc[:, 0].resample(freq).count()
+    return bars[counts.to_numpy() > 0]
+
+
+#For every calendar date, the position of the last row dated on or before it, and whether there is one (within 'tolerance', if given)
+def asof_positions(dates, calendar, tolerance=None):
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    calendar = np.asarray(calendar, dtype='datetime64[ns]')
+    positions = np.searchsorted(dates, calendar, side='right') - 1
+    found = positions >= 0
+    if tolerance is not None:
+        found &= (calendar - dates[np.clip(positions, 0, None)]) <= np.timedelta64(pd.Timedelta(tolerance))
+    return np.clip(positions, 0, None), found
+
+
+#The union of every frame's dates, or a regular calendar at 'freq' covering all of them
+def common_calendar(frames, freq=None):
+    indexes = [parse_dates(frame).index for frame in frames.values()]
+    if freq is not None:
+        return pd.date_range(min(index[0] for index in indexes).normalize(), max(index[-1] for index in indexes), freq=freq, name='Date')
+    calendar = indexes[0]
+    for index in indexes[1:]:
+        calendar = calendar.union(index)
+    return calendar.rename('Date')
+
+
+#Lines up {ticker: frame} on one calendar and returns a wide frame whose columns are (field, ticker), so 'wide["Price"]' is a price panel
+#(see price_analytics.py). With a single field the columns are just the tickers.
+#   freq:      put everything on a regular calendar, resampling each series to OHLC bars at that frequency first
+#   calendar:  a ticker name (use that ticker's own dates) or a DatetimeIndex. Default: the union of all dates (or the 'freq' calendar)
+#   tolerance: how stale an as-of price may be, e.g. '31D'. Older prices become NaN
+@profiled('align')
+def align_prices(frames, freq=None, calendar=None, fields=('Price',), tolerance=None):
+    frames = {ticker: parse_dates(frame) for ticker, frame in frames.items()}
+    if freq is not None:
+        frames = {ticker: resample_ohlc(frame, freq) for ticker, frame in frames.items()}
+    if isinstance(calendar, str):
+        calendar = frames[calendar].index.rename('Date')
+    elif calendar is None:
+        calendar = common_calendar(frames, freq)
+
+    columns = {}
+    for ticker, frame in frames.items():
+        positions, found = asof_positions(frame.index, calendar, tolerance)
+        for field in fields:
+            if field in frame.columns:
+                values = frame[field].to_numpy(dtype=float)[positions]
+                columns[(field, ticker)] = np.where(found, values, np.nan)
+            else:
+                columns[(field, ticker)] = np.full(len(calendar), np.nan)
+
+    wide = pd.DataFrame(columns, index=calendar)
+    wide.columns = pd.MultiIndex.from_tuples(wide.columns, names=['Field', 'Ticker'])
+    if len(fields) == 1:
+        wide = wide[fields[0]]
+    return wide
@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+
+from stage_profile import profiled
+
+
+#----------------------------
+#----------------------------
+
+### PRICE PANELS ###
+
+#Every function below works on a "price panel": one row per timestamp (a sorted DatetimeIndex) and one column per ticker. All the maths is done on
+#the panel's 2-D NumPy array at once (time down axis 0, tickers across axis 1), so a thousand tickers cost one array operation, not a thousand loops.
+#Missing prices are NaN and are skipped rather than treated as zero
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+#Reads a Yahoo Finance style CSV with its 'Date' column parsed as the index, and 'Adj Close' renamed to 'Price' like the Netflix script does
+def read_prices(path):
+    frame = pd.read_csv(path, parse_dates=['Date'], index_col='Date')
+    return frame.rename(columns={'Adj Close': 'Price'}).sort_index()
+
+
+#Builds a price panel from {ticker: frame}. Each frame needs a 'Price' column and either a DatetimeIndex or a 'Date' column
+def price_panel(frames, column='Price'):
+    series = {}
+    for ticker, frame in frames.items():
+        if not isinstance(frame.index, pd.DatetimeIndex):
+            frame = frame.set_index(pd.to_datetime(frame['Date']))
+        series[ticker] = frame[column]
+    panel = pd.DataFrame(series).sort_index()
+    panel.index.name = 'Date'
+    panel.columns.name = 'Ticker'
+    return panel
+
+
+def _values(frame):
+    return np.asarray(frame, dtype=float)
+
+
+def _like(frame, values):
+    if isinstance(frame, pd.DataFrame):
+        return pd.DataFrame(values, index=frame.index, columns=frame.columns)
+    if isinstance(frame, pd.Series):
+        return pd.Series(values, index=frame.index, name=frame.name)
+    return values
+
+
+#----------------------------
+#----------------------------
+
+### RETURNS AND DRAWDOWNS ###
+
+#Log returns (log(price_t) - log(price_t-1)). Unlike simple returns these add up over time. The first row is NaN
+def log_returns(prices):
+    values = np.log(_values(prices))
+    returns = np.full(values.shape, np.nan)
+    returns[1:] = np.diff(values, axis=0)
+    return _like(prices, returns)
+
+
+#How far each price is below the highest price seen so far, e.g. -0.25 = 25% below the running peak. 'np.fmax' skips NaNs in the running peak
+def drawdowns(prices):
+    values = _values(prices)
+    return _like(prices, values / np.fmax.accumulate(values, axis=0) - 1)
+
+
+#The worst drawdown of each ticker
+def max_drawdown(prices):
+    worst = np.nanmin(_values(drawdowns(prices)), axis=0)
+    if isinstance(prices, pd.DataFrame):
+        return pd.Series(worst, index=prices.columns, name='max_drawdown')
+    return worst
+
+
+#----------------------------
+#----------------------------
+
+### ROLLING WINDOWS ###
+
+#Sums over every trailing 'window' rows for all columns at once, from one cumulative sum (O(rows) no matter how long the window is).
+#NaNs count as missing: the result is NaN wherever fewer than 'min_periods' of the window's values are present
+def _rolling_sum(values, window, min_periods):
+    present = ~np.isnan(values)
+    cumulative = np.cumsum(np.where(present, values, 0.0), axis=0)
+    counts = np.cumsum(present, axis=0)
+    sums = cumulative.copy()
+    sums[window:] -= cumulative[:-window]
+    totals = counts.copy()
+    totals[window:] -= counts[:-window]
+    with np.errstate(invalid='ignore'):
+        return np.where(totals >= min_periods, sums, np.nan), totals
+
+
+#Rolling (sample) standard deviation of returns, annualized with 'periods_per_year' (252 for daily data, 12 for monthly, None to skip)
+def rolling_volatility(returns, window=21, periods_per_year=TRADING_DAYS_PER_YEAR, min_periods=None):
+    values = _values(returns)
+    min_periods = window if min_periods is None else min_periods
+    #Centering on the column means first keeps the sum-of-squares formula from losing precision
+    values = values - np.nanmean(values, axis=0)
+    sums, counts = _rolling_sum(values, window, min_periods)
+    squares, _ = _rolling_sum(values ** 2, window, min_periods)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (squares - sums ** 2 / counts) / (counts - 1)
+    volatility = np.sqrt(np.clip(variance, 0, None))
+    if periods_per_year:
+        volatility = volatility * np.sqrt(periods_per_year)
+    return _like(returns, volatility)
+
+
+#Rolling covariance/correlation/beta of every column of 'returns' against one benchmark return series. Rows where either side is missing are
+#left out of that column's window
+def _rolling_moments(returns, benchmark, window, min_periods):
+    x = _values(returns)
+    y = _values(benchmark).reshape(len(x), 1) + np.zeros_like(x)
+    both = ~(np.isnan(x) | np.isnan(y))
+    x = np.where(both, x - np.nanmean(x, axis=0), np.nan)
+    y = np.where(both, y - np.nanmean(y, axis=0), np.nan)
+    sum_x, counts = _rolling_sum(x, window, min_periods)
+    sum_y, _ = _rolling_sum(y, window, min_periods)
+    sum_xy, _ = _rolling_sum(x * y, window, min_periods)
+    sum_xx, _ = _rolling_sum(x * x, window, min_periods)
+    sum_yy, _ = _rolling_sum(y * y, window, min_periods)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = sum_xy - sum_x * sum_y / counts
+        variance_x = sum_xx - sum_x ** 2 / counts
+        variance_y = sum_yy - sum_y ** 2 / counts
+    return covariance, variance_x, variance_y
+
+
+def rolling_correlation(returns, benchmark, window=63, min_periods=None):
+    covariance, variance_x, variance_y = _rolling_moments(returns, benchmark, window, window if min_periods is None else min_periods)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return _like(returns, covariance / np.sqrt(variance_x * variance_y))
+
+
+def rolling_beta(returns, benchmark, window=63, min_periods=None):
+    covariance, _, variance_y = _rolling_moments(returns, benchmark, window, window if min_periods is None else min_periods)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return _like(returns, covariance / variance_y)
+
+
+#----------------------------
+#----------------------------
+
+### WHOLE-PERIOD STATISTICS ###
+
+#Beta and correlation of every column against the benchmark over the whole sample, using only the rows where both have a return
+def beta_and_correlation(returns, benchmark):
+    x = _values(returns)
+    y = _values(benchmark).reshape(len(x), 1) + np.zeros_like(x)
+    both = ~(np.isnan(x) | np.isnan(y))
+    x = np.where(both, x, np.nan)
+    y = np.where(both, y, np.nan)
+    x = x - np.nanmean(x, axis=0)
+    y = y - np.nanmean(y, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = np.nansum(x * y, axis=0)
+        beta = covariance / np.nansum(y * y, axis=0)
+        correlation = covariance / np.sqrt(np.nansum(x * x, axis=0) * np.nansum(y * y, axis=0))
+    return beta, correlation
+
+
+#One row per ticker: total return, annualized return and volatility, max drawdown, and beta/correlation against 'benchmark' (a column of the panel)
+@profiled('price statistics')
+def price_statistics(prices, benchmark, periods_per_year=TRADING_DAYS_PER_YEAR):
+    values = _values(prices)
+    returns = log_returns(prices)
+    periods = np.sum(~np.isnan(_values(returns)), axis=0)
+
+    #First and last available price of each column, wherever its history starts and ends
+    present = ~np.isnan(values)
+    first = values[present.argmax(axis=0), np.arange(values.shape[1])]
+    last = values[len(values) - 1 - present[::-1].argmax(axis=0), np.arange(values.shape[1])]
+
+    beta, correlation = beta_and_correlation(returns, returns[benchmark])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        statistics = pd.DataFrame({
+            'first_date': [prices.index[index] for index in present.argmax(axis=0)],
+            'last_date': [prices.index[len(values) - 1 - index] for index in present[::-1].argmax(axis=0)],
+            'total_return': last / first - 1,
+            'annual_return': np.exp(np.nansum(_values(returns), axis=0) * periods_per_year / periods) - 1,
+            'annual_volatility': np.nanstd(_values(returns), axis=0, ddof=1) * np.sqrt(periods_per_year),
+            'max_drawdown': np.nanmin(_values(drawdowns(prices)), axis=0),
+            'beta': beta,
+            'correlation': correlation,
+        }, index=prices.columns)
+    statistics.index.name = 'Ticker'
+    return statistics
@@ -0,0 +1,194 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from stage_profile import profiled
+
+
+#----------------------------
+#----------------------------
+
+### PRICE DISTRIBUTIONS FOR MANY GROUPS AT ONCE ###
+
+#A violin plot needs two things per group (e.g. per ticker and quarter): a five-number summary for the box in the middle and a kernel density
+#estimate (KDE) for its outline. Computing a Gaussian KDE directly costs (points x grid) per group, and seaborn does it again on every draw.
+#Here both are computed for EVERY group in one pass, and the results are small arrays that can be cached and drawn any number of times:
+#   - summaries: the values are sorted once by (group, value), so every quantile of every group is just an index into one array
+#   - KDEs: each group's values are "linearly binned" onto its own grid of 'grid_points' (every value split between its two nearest grid points),
+#     then all the grids are convolved with their Gaussian kernels in one batched FFT. The cost is (values + groups x grid log grid), no matter
+#     how many values each group has
+#The bandwidth is Scott's rule, like 'scipy.stats.gaussian_kde' (which seaborn uses), and the grid reaches 'cut' bandwidths past the lowest and
+#highest value, like seaborn's violins
+
+DEFAULT_GRID_POINTS = 256
+DEFAULT_CUT = 2
+
+#The KDE of every group: 'grid' and 'density' are (groups x grid_points) arrays, one row per group in the order of 'groups'
+Densities = namedtuple('Densities', ['groups', 'grid', 'density', 'bandwidth'])
+
+
+#pandas hashes Python strings much faster than NumPy's fixed-width ones
+def _hashable(labels):
+    labels = np.asarray(labels)
+    return labels.astype(object) if labels.dtype.kind in 'US' else labels
+
+
+#Integer codes for the groups, plus the unique groups in sorted order. 'groups' is one label per value, or a list of such arrays for groups made of
+#several keys (e.g. [tickers, quarters]), whose unique groups are then a MultiIndex
+def _group_codes(groups):
+    if not (isinstance(groups, (list, tuple)) and groups and all(np.ndim(key) == 1 for key in groups)):
+        codes, uniques = pd.factorize(_hashable(groups), sort=True)
+        return codes, pd.Index(uniques)
+    factorized = [pd.factorize(_hashable(key), sort=True) for key in groups]
+    combined = np.zeros(len(factorized[0][0]), dtype=np.int64)
+    for codes, uniques in factorized:
+        combined = combined * len(uniques) + codes
+    codes, present = pd.factorize(combined, sort=True)
+    arrays = []
+    for _, uniques in reversed(factorized):
+        arrays.append(np.asarray(uniques)[present % len(uniques)])
+        present = present // len(uniques)
+    return codes, pd.MultiIndex.from_arrays(arrays[::-1])
+
+
+def _clean(values, groups):
+    values = np.asarray(values, dtype=float)
+    codes, uniques = _group_codes(groups)
+    present = ~np.isnan(values)
+    return values[present], codes[present], uniques
+
+
+#Count, mean, standard deviation, min, quartiles and max of every group: the same columns as 'groupby(...).describe()'
+@profiled('five-number summary')
+def distribution_summary(values, groups):
+    values, codes, uniques = _clean(values, groups)
+    #Sorting by value, then (stably) by group, leaves every group's values in one sorted run
+    order = np.argsort(values)
+    order = order[np.argsort(codes[order], kind='stable')]
+    values, codes = values[order], codes[order]
+    counts = np.bincount(codes, minlength=len(uniques))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    #Quantiles with linear interpolation between the two nearest ranks (numpy's and pandas' default)
+    def quantile(q):
+        position = q * (counts - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, counts - 1)
+        return values[starts + lower] + (position - lower) * (values[starts + upper] - values[starts + lower])
+
+    sums = np.bincount(codes, weights=values, minlength=len(uniques))
+    means = sums / counts
+    squares = np.bincount(codes, weights=(values - means[codes]) ** 2, minlength=len(uniques))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.sqrt(squares / (counts - 1))
+    return pd.DataFrame({
+        'count': counts.astype(float),
+        'mean': means,
+        'std': np.where(counts > 1, std, np.nan),
+        'min': values[starts],
+        '25%': quantile(0.25),
+        '50%': quantile(0.5),
+        '75%': quantile(0.75),
+        'max': values[starts + counts - 1],
+    }, index=uniques)
+
+
+#Scott's rule: the sample standard deviation times n^(-1/5). A group whose values are all the same gets a small bandwidth instead of zero
+def scott_bandwidth(std, counts):
+    with np.errstate(invalid='ignore'):
+        bandwidth = np.nan_to_num(std) * np.power(counts, -0.2)
+    return np.where(bandwidth > 0, bandwidth, 1e-3)
+
+
+#Gaussian KDEs of every group at once (see the top of this file). 'bandwidth' is an array with one bandwidth per group, or None for Scott's rule
+@profiled('kde')
+def binned_kde(values, groups, grid_points=DEFAULT_GRID_POINTS, cut=DEFAULT_CUT, bandwidth=None):
+    values, codes, uniques = _clean(values, groups)
+    count = len(uniques)
+    counts = np.bincount(codes, minlength=count)
+    if bandwidth is None:
+        means = np.bincount(codes, weights=values, minlength=count) / counts
+        squares = np.bincount(codes, weights=(values - means[codes]) ** 2, minlength=count)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            bandwidth = scott_bandwidth(np.sqrt(squares / (counts - 1)), counts)
+    bandwidth = np.broadcast_to(np.asarray(bandwidth, dtype=float), (count,))
+
+    #Each group's own grid, from 'cut' bandwidths below its lowest value to 'cut' bandwidths above its highest
+    lowest = np.full(count, np.inf)
+    highest = np.full(count, -np.inf)
+    np.minimum.at(lowest, codes, values)
+    np.maximum.at(highest, codes, values)
+    lowest, highest = lowest - cut * bandwidth, highest + cut * bandwidth
+    step = (highest - lowest) / (grid_points - 1)
+    grid = lowest[:, None] + step[:, None] * np.arange(grid_points)
+
+    #Linear binning: a value 30% of the way from grid point i to i + 1 adds 0.7 to i and 0.3 to i + 1
+    position = (values - lowest[codes]) / step[codes]
+    left = np.clip(np.floor(position).astype(np.int64), 0, grid_points - 2)
+    weight = position - left
+    cells = codes * grid_points + left
+    binned = (np.bincount(cells, weights=1 - weight, minlength=count * grid_points)
+              + np.bincount(cells + 1, weights=weight, minlength=count * grid_points)).reshape(count, grid_points)
+
+    #The kernel of each group on its own grid spacing, at offsets -(grid_points - 1)...(grid_points - 1), which covers the whole grid. The
+    #full linear convolution is done with zero-padded FFTs and the middle 'grid_points' of it are the densities at the grid points
+    offsets = np.arange(-(grid_points - 1), grid_points)
+    scaled = offsets[None, :] * (step / bandwidth)[:, None]
+    kernels = np.exp(-0.5 * scaled ** 2) / (np.sqrt(2 * np.pi) * bandwidth[:, None])
+    size = 1 << int(np.ceil(np.log2(3 * grid_points - 2)))
+    convolved = np.fft.irfft(np.fft.rfft(binned, size, axis=1) * np.fft.rfft(kernels, size, axis=1), size, axis=1)
+    density = np.clip(convolved[:, grid_points - 1:2 * grid_points - 1], 0, None) / counts[:, None]
+    return Densities(uniques, grid, density, bandwidth)
+
+
+#----------------------------
+#----------------------------
+
+### PER TICKER AND QUARTER ###
+
+#The groups the Netflix script looks at: one per ticker and quarter of a year (a quarterly pandas Period such as 2017Q1, so Q1 2017 and Q1 2018
+#are separate groups). 'frames' is {ticker: frame}, each with a 'Date' column or a DatetimeIndex. Returns (summary table indexed by
+#(Ticker, Quarter), Densities with the same groups in the same order)
+def ticker_quarter_distributions(frames, column='Price', grid_points=DEFAULT_GRID_POINTS, cut=DEFAULT_CUT):
+    values, tickers, quarters = [], [], []
+    for ticker, frame in frames.items():
+        dates = frame.index if isinstance(frame.index, pd.DatetimeIndex) else pd.DatetimeIndex(pd.to_datetime(frame['Date']))
+        values.append(frame[column].to_numpy(dtype=float))
+        tickers.append(np.full(len(frame), ticker, dtype=object))
+        quarters.append(np.asarray(dates.to_period('Q'), dtype=object))
+    values = np.concatenate(values)
+    groups = [np.concatenate(tickers), np.concatenate(quarters)]
+
+    summary = distribution_summary(values, groups)
+    summary.index.names = ['Ticker', 'Quarter']
+    return summary, binned_kde(values, groups, grid_points, cut)
+
+
+#The last 'count' groups whose first key is 'key' (e.g. a ticker's latest quarters), in order. A long history has far too many quarters to draw a
+#readable violin for each, so charts only show the most recent ones. 'count' of None or 0 keeps them all
+def latest_groups(groups, key, count=None):
+    groups = [group for group in groups if group[0] == key]
+    return groups[-count:] if count else groups
+
+
+#The x label of each group: its last key, e.g. the quarter of a (ticker, quarter) group. Quarters are shortened to 'Q1'...'Q4' when they all fall
+#in the same year, and keep their year ('2017Q1') when they don't, so two Q1s are never drawn under the same label
+def _group_labels(groups):
+    keys = [group[-1] if isinstance(group, tuple) else group for group in groups]
+    if keys and all(isinstance(key, pd.Period) for key in keys) and len({key.year for key in keys}) == 1:
+        return ['Q{}'.format(key.quarter) if key.freqstr.startswith('Q') else str(key) for key in keys]
+    return [str(key) for key in keys]
+
+
+#A 'violin' chart panel (see chart_rendering.py) with one violin per group, in the order of 'groups' (default: every group), labelled by
+#'_group_labels()'
+def violin_panel(densities, summary, groups=None, title='', xlabel='', ylabel='', color=None):
+    from chart_rendering import Panel, Violin
+
+    groups = list(densities.groups) if groups is None else list(groups)
+    rows = densities.groups.get_indexer(groups)
+    quantiles = summary.loc[groups, ['min', '25%', '50%', '75%', 'max']].to_numpy()
+    violins = [Violin(position, densities.grid[row], densities.density[row], tuple(quantiles[position]), color=color)
+               for position, row in enumerate(rows)]
+    return Panel('violin', violins, title, xlabel, ylabel, xticks=list(range(len(groups))), xticklabels=_group_labels(groups))
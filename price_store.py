@@ -0,0 +1,244 @@
+import argparse
+import json
+import os
+import shutil
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from stage_profile import profiled
+
+
+#----------------------------
+#----------------------------
+
+### LOCAL MEMORY-MAPPED PRICE STORE ###
+
+#Parsing a price CSV with 'pd.read_csv()' every time we want to look at a ticker doesn't scale to thousands of tickers. Here each CSV is converted
+#ONCE into one '.npy' file per column (the dates as datetime64, and Open/High/Low/Close/Price/Volume as float64) in its own folder:
+#
+#   <store>/symbols.json        the symbol index: rows, date range, columns and source file of every ticker
+#   <store>/NFLX/Date.npy
+#   <store>/NFLX/Price.npy ...
+#
+#Opening a ticker memory-maps those files, so nothing is read until it's used, and 'load()' returns slices of the maps for a date range (found
+#with a binary search on the sorted dates): zero-copy views, no matter how long the history is. 'Adj Close' is stored as 'Price', like the
+#work scripts rename it. A ticker is only converted again when its source file's size or modification time changes
+#
+#Convert a folder of CSVs from the command line with:  python price_store.py --store prices/ data/*.csv
+
+PRICE_STORE_DIR = 'price_store'
+SYMBOLS_INDEX = 'symbols.json'
+DEFAULT_CHUNK_ROWS = 1000000
+
+#The numeric columns we keep, in this order, and the source columns they can come from
+PRICE_FIELDS = ('Open', 'High', 'Low', 'Close', 'Price', 'Volume')
+SOURCE_COLUMNS = {'Adj Close': 'Price'}
+
+#What the symbol index knows about one ticker
+SymbolInfo = namedtuple('SymbolInfo', ['symbol', 'rows', 'first', 'last', 'fields', 'source', 'size', 'mtime_ns'])
+
+
+#The number of data rows in a CSV (lines after the header), counted in 1 MB blocks without parsing anything
+def _count_rows(path, block_size=1 << 20):
+    lines, last = 0, b'\n'
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(block_size), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def _check_symbol(symbol):
+    if not symbol or symbol in ('.', '..') or any(separator in symbol for separator in ('/', '\\', os.sep)):
+        raise ValueError('Invalid symbol: {!r}'.format(symbol))
+    return symbol
+
+
+class PriceStore:
+
+    def __init__(self, directory=PRICE_STORE_DIR):
+        self.directory = directory
+        self._index = None
+        self._maps = {}
+
+    def _index_path(self):
+        return os.path.join(self.directory, SYMBOLS_INDEX)
+
+    def _symbol_dir(self, symbol):
+        return os.path.join(self.directory, _check_symbol(symbol))
+
+    @property
+    def index(self):
+        if self._index is None:
+            try:
+                with open(self._index_path()) as index_file:
+                    self._index = json.load(index_file)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self._index_path() + '.tmp'
+        with open(temp_path, 'w') as index_file:
+            json.dump(self.index, index_file, indent=1, sort_keys=True)
+        os.replace(temp_path, self._index_path())
+
+    def symbols(self):
+        return sorted(self.index)
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+    def info(self, symbol):
+        if symbol not in self.index:
+            raise KeyError('{!r} is not in the price store at {!r}'.format(symbol, self.directory))
+        entry = self.index[symbol]
+        return SymbolInfo(symbol, entry['rows'], entry['first'], entry['last'], tuple(entry['fields']), entry['source'], entry['size'],
+                          entry['mtime_ns'])
+
+    #Whether 'path' has changed since 'symbol' was converted from it (or was never converted at all)
+    def is_stale(self, symbol, path):
+        if symbol not in self.index:
+            return True
+        stat = os.stat(path)
+        entry = self.index[symbol]
+        return entry['source'] != os.path.abspath(path) or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns
+
+    #----------------------------
+
+    ### CONVERTING CSVs ###
+
+    #Converts one CSV (a 'Date' column plus any of the price columns) into the store under 'symbol' (default: the file name without '.csv').
+    #The file is read 'chunk_rows' at a time straight into the '.npy' files, so it never has to fit in memory. Returns False when the
+    #stored copy is already up to date
+    @profiled('ingest')
+    def ingest_csv(self, path, symbol=None, chunk_rows=DEFAULT_CHUNK_ROWS, force=False):
+        symbol = _check_symbol(symbol or os.path.splitext(os.path.basename(path))[0])
+        if not force and not self.is_stale(symbol, path):
+            return False
+
+        stat = os.stat(path)
+        header = pd.read_csv(path, nrows=0).columns
+        fields = [field for field in PRICE_FIELDS if field in header or field in [SOURCE_COLUMNS.get(column) for column in header]]
+        if 'Date' not in header or not fields:
+            raise ValueError("{} needs a 'Date' column and at least one of {}".format(path, ', '.join(PRICE_FIELDS)))
+        wanted = ['Date'] + [column for column in header if column in fields or SOURCE_COLUMNS.get(column) in fields]
+
+        #Everything is written to a temporary folder first and swapped in at the end, so a failed conversion never leaves half a ticker behind
+        rows = _count_rows(path)
+        temp_dir = self._symbol_dir(symbol) + '.tmp'
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(temp_dir)
+        columns = {'Date': np.lib.format.open_memmap(os.path.join(temp_dir, 'Date.npy'), 'w+', 'datetime64[ns]', (rows,))}
+        for field in fields:
+            columns[field] = np.lib.format.open_memmap(os.path.join(temp_dir, field + '.npy'), 'w+', np.float64, (rows,))
+
+        filled = 0
+        for chunk in pd.read_csv(path, usecols=wanted, chunksize=chunk_rows):
+            chunk = chunk.rename(columns=SOURCE_COLUMNS)
+            stop = filled + len(chunk)
+            columns['Date'][filled:stop] = pd.to_datetime(chunk['Date']).to_numpy(dtype='datetime64[ns]')
+            for field in fields:
+                columns[field][filled:stop] = chunk[field].to_numpy(dtype=np.float64)
+            filled = stop
+
+        #Blank lines are counted but not read, and rows that aren't in date order get sorted: both (rare) cases rewrite the columns in memory
+        dates = columns['Date'][:filled]
+        order = None if np.all(dates[1:] >= dates[:-1]) else np.argsort(dates, kind='stable')
+        first, last = (str(pd.Timestamp(np.min(dates))), str(pd.Timestamp(np.max(dates)))) if filled else (None, None)
+        del dates
+        for name in list(columns):
+            values = columns.pop(name)
+            if filled != rows or order is not None:
+                values = np.array(values[:filled])
+                np.save(os.path.join(temp_dir, name + '.npy'), values if order is None else values[order])
+            else:
+                values.flush()
+        del values
+
+        self._maps.pop(symbol, None)
+        shutil.rmtree(self._symbol_dir(symbol), ignore_errors=True)
+        os.replace(temp_dir, self._symbol_dir(symbol))
+        self.index[symbol] = {'rows': filled, 'first': first, 'last': last, 'fields': fields, 'source': os.path.abspath(path),
+                              'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        self._save_index()
+        return True
+
+    #Converts many CSVs, each under its file name. Returns the symbols that were (re)converted
+    def ingest_many(self, paths, chunk_rows=DEFAULT_CHUNK_ROWS, force=False):
+        return [os.path.splitext(os.path.basename(path))[0] for path in paths if self.ingest_csv(path, chunk_rows=chunk_rows, force=force)]
+
+    def remove(self, symbol):
+        self._maps.pop(symbol, None)
+        shutil.rmtree(self._symbol_dir(symbol), ignore_errors=True)
+        if self.index.pop(symbol, None) is not None:
+            self._save_index()
+
+    #----------------------------
+
+    ### OPENING TICKERS ###
+
+    #Every column of a ticker, memory-mapped read-only. The maps are opened once per symbol and kept
+    def open(self, symbol):
+        if symbol not in self._maps:
+            info = self.info(symbol)
+            self._maps[symbol] = {name: np.load(os.path.join(self._symbol_dir(symbol), name + '.npy'), mmap_mode='r')
+                                  for name in ('Date',) + info.fields}
+        return self._maps[symbol]
+
+    #Row positions [start, stop) of the dates between 'start' and 'end' (both included, either can be left out)
+    def date_range(self, symbol, start=None, end=None):
+        dates = self.open(symbol)['Date']
+        first = 0 if start is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start), 'ns'), side='left'))
+        stop = len(dates) if end is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(end), 'ns'), side='right'))
+        return first, max(first, stop)
+
+    #{'Date': dates, field: values} for the date range, as read-only views into the memory maps (nothing is copied or read from disk until used)
+    def load(self, symbol, start=None, end=None, fields=None):
+        columns = self.open(symbol)
+        first, stop = self.date_range(symbol, start, end)
+        names = ('Date',) + tuple(field for field in (fields or PRICE_FIELDS) if field in columns)
+        return {name: columns[name][first:stop] for name in names}
+
+    #The same date range as a DataFrame with a 'Date' column, like the frames 'pd.read_csv()' gave the work scripts. ***NOTE: pandas copies the
+    #views into its own block, so use 'load()' when the arrays alone will do
+    def frame(self, symbol, start=None, end=None, fields=None):
+        return pd.DataFrame(self.load(symbol, start, end, fields))
+
+    #One column of many tickers as a price panel (one column per ticker, on the union of their dates), like 'price_analytics.price_panel()'
+    def panel(self, symbols, start=None, end=None, field='Price'):
+        series = {}
+        for symbol in symbols:
+            columns = self.load(symbol, start, end, (field,))
+            series[symbol] = pd.Series(columns[field], index=pd.DatetimeIndex(columns['Date']), copy=False)
+        panel = pd.DataFrame(series).sort_index()
+        panel.index.name = 'Date'
+        panel.columns.name = 'Ticker'
+        return panel
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert price CSVs into the memory-mapped price store.')
+    parser.add_argument('csvs', nargs='*', metavar='CSV', help='price CSVs to add; each is stored under its file name without .csv')
+    parser.add_argument('--store', default=PRICE_STORE_DIR, help='store directory (default: {})'.format(PRICE_STORE_DIR))
+    parser.add_argument('--force', action='store_true', help='convert the files even if they have not changed')
+    parser.add_argument('--list', action='store_true', help='list the symbols in the store')
+    args = parser.parse_args(argv)
+
+    store = PriceStore(args.store)
+    if args.csvs:
+        converted = store.ingest_many(args.csvs, force=args.force)
+        print('Converted {} of {} files into {}'.format(len(converted), len(args.csvs), args.store))
+    if args.list or not args.csvs:
+        for symbol in store.symbols():
+            info = store.info(symbol)
+            print('{:<24} {:>12,} rows  {} to {}  {}'.format(symbol, info.rows, info.first, info.last, ', '.join(info.fields)))
+
+
+if __name__ == '__main__':
+    main()
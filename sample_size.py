@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from stage_profile import profiled
+
+
+#----------------------------
+#----------------------------
+
+### SAMPLE SIZE AND OBSERVATION TIME FOR COMPARING TWO PROPORTIONS ###
+
+#Biodiversity_Work_Script.py used to type in sample sizes from an external web calculator (870 for Bryce and 610 for Yellowstone). This module computes
+#them with the standard normal-approximation formula for a two-proportion test:
+#
+#   n = (z_alpha * sqrt(2 * p_bar * (1 - p_bar)) + z_power * sqrt(p1 * (1 - p1) + p2 * (1 - p2)))^2 / (p1 - p2)^2
+#
+#where p1 is the baseline rate, p2 is the rate after the minimum detectable effect and p_bar is their average. ***NOTE: The web calculator doesn't
+#publish its formula and its numbers don't come out of this one for any usual alpha/power, so don't expect 870 and 610 exactly!
+#
+#Every argument can be a scalar or a NumPy array. They are broadcast against each other, so sweeping thousands of scenarios is a single call
+
+
+#The rate we're trying to detect. 'minimum_detectable_effect' is a fraction of the baseline when relative=True (e.g. 1/3 of 15% = 5 points), otherwise
+#it's in absolute rate units. With decrease=True we're detecting a drop in the rate (like a lower disease rate), otherwise an increase
+def target_rate(baseline, minimum_detectable_effect, relative=True, decrease=True):
+    baseline = np.asarray(baseline, dtype=float)
+    effect = np.asarray(minimum_detectable_effect, dtype=float)
+    if relative:
+        effect = baseline * effect
+    return baseline - effect if decrease else baseline + effect
+
+
+#Number of observations needed in EACH group (rounded up)
+def sample_size_per_variant(baseline, minimum_detectable_effect, alpha=0.10, power=0.80, relative=True, decrease=True, two_sided=True):
+    p1 = np.asarray(baseline, dtype=float)
+    p2 = target_rate(p1, minimum_detectable_effect, relative, decrease)
+    if np.any((p2 <= 0) | (p2 >= 1)):
+        raise ValueError('The minimum detectable effect moves the rate outside (0, 1)')
+
+    alpha = np.asarray(alpha, dtype=float)
+    z_alpha = norm.ppf(1 - alpha / 2) if two_sided else norm.ppf(1 - alpha)
+    z_power = norm.ppf(np.asarray(power, dtype=float))
+    p_bar = (p1 + p2) / 2
+    n = (z_alpha * np.sqrt(2 * p_bar * (1 - p_bar)) + z_power * np.sqrt(p1 * (1 - p1) + p2 * (1 - p2))) ** 2 / (p1 - p2) ** 2
+    return np.ceil(n).astype(np.int64)
+
+
+#How many weeks of observing it takes to collect 'sample_size' observations at 'weekly_rate' observations per week
+def weeks_to_collect(sample_size, weekly_rate):
+    return np.asarray(sample_size, dtype=float) / np.asarray(weekly_rate, dtype=float)
+
+
+#Weekly observation rate per park from a frame like "obs_by_park" (one row per park, weekly totals in 'observations')
+def weekly_rates(obs_by_park, park_column='park_name', count_column='observations'):
+    return obs_by_park.set_index(park_column)[count_column].astype(float)
+
+
+#----------------------------
+#----------------------------
+
+### SCENARIO SWEEPS ###
+
+#Every combination of the given baselines, effects, significance levels, powers and parks in one broadcast computation. Each input gets its own
+#axis of the result grid, so no loops are needed no matter how many scenarios there are. 'rates' is a Series of weekly rates indexed by park (see
+#'weekly_rates()'). Returns one row per scenario
+@profiled('sample size sweep')
+def sample_size_sweep(baselines, minimum_detectable_effects, rates, alphas=(0.10,), powers=(0.80,), relative=True, decrease=True,
+                      two_sided=True):
+    baselines = np.asarray(baselines, dtype=float).reshape(-1, 1, 1, 1, 1)
+    effects = np.asarray(minimum_detectable_effects, dtype=float).reshape(1, -1, 1, 1, 1)
+    alphas = np.asarray(alphas, dtype=float).reshape(1, 1, -1, 1, 1)
+    powers = np.asarray(powers, dtype=float).reshape(1, 1, 1, -1, 1)
+    park_rates = rates.to_numpy(dtype=float).reshape(1, 1, 1, 1, -1)
+
+    sizes = sample_size_per_variant(baselines, effects, alphas, powers, relative, decrease, two_sided)
+    sizes, weeks = np.broadcast_arrays(sizes, weeks_to_collect(sizes, park_rates))
+
+    index = pd.MultiIndex.from_product([baselines.ravel(), effects.ravel(), alphas.ravel(), powers.ravel(), rates.index],
+                                       names=['baseline', 'minimum_detectable_effect', 'alpha', 'power', rates.index.name or 'park_name'])
+    return pd.DataFrame({'sample_size_per_variant': sizes.ravel(), 'weeks': weeks.ravel()}, index=index).reset_index()
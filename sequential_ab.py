@@ -0,0 +1,207 @@
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from stage_profile import profiled
+
+
+#----------------------------
+#----------------------------
+
+### SEQUENTIAL (ALWAYS-VALID) A/B MONITORING OF THE MUSCLEHUB FUNNEL ###
+
+#MuscleHub_Work_Script.py runs a chi-squared test once, on a snapshot. The experiment keeps running though, and re-running that test every day and
+#stopping the first time p < 0.05 finds a "significant" difference far more often than 5% of the time when there is none. Here the funnel is
+#watched as a stream of events instead:
+#   - every event (visit, fitness test, application, purchase) sets one flag on its visitor, kept in a dict, and moves that visitor to its new cell
+#     of the 2 x 2 x 2 funnel counts (see 'musclehub_funnel.funnel_contingency()'): O(1) per event, and history is never scanned again
+#   - after every batch, each funnel step is tested with a mixture sequential probability ratio test (mSPRT). Its p-values stay valid however
+#     often we look, so the experiment can be stopped the first time one drops below 'alpha'
+#
+#For a difference of two rates d = rate_B - rate_A with estimated variance V = p_A(1 - p_A)/n_A + p_B(1 - p_B)/n_B, and a normal mixture of
+#width 'tau' over the true difference, the likelihood ratio against "no difference" is
+#
+#   L = sqrt(V / (V + tau^2)) * exp(tau^2 * d^2 / (2 * V * (V + tau^2)))
+#
+#and the always-valid p-value is the smallest 1 / L seen so far. 'tau' is roughly the size of difference we care about (default: 5 points).
+#A step is only tested once both groups have 'min_trials' visitors (or applicants) in it, since V is a normal approximation
+
+#Which flag each event sets on its visitor. A visitor counts once they have a visit on or after the start date
+EVENT_FLAGS = {'visit': 1, 'fitness_test': 2, 'application': 4, 'purchase': 8}
+
+#The table and date column each kind of event comes from
+EVENT_TABLES = {'visits': ('visit', 'visit_date'), 'fitness_tests': ('fitness_test', 'fitness_test_date'),
+                'applications': ('application', 'application_date'), 'purchases': ('purchase', 'purchase_date')}
+
+#The funnel steps we test: successes and trials of each group are sums of the [group, application, member] counts (0 = yes), like the pivots
+SEQUENTIAL_STEPS = ['application', 'purchase_given_application', 'purchase']
+
+DEFAULT_ALPHA = 0.05
+DEFAULT_TAU = 0.05
+DEFAULT_MIN_TRIALS = 30
+
+#Bumped whenever the saved monitor changes shape, so monitors saved by an older version are rebuilt instead of loaded
+MONITOR_FORMAT = 2
+
+#Where a monitor stands after a batch: 'status' has one row per step
+MonitorUpdate = namedtuple('MonitorUpdate', ['events', 'counts', 'status'])
+
+
+#(successes, trials) of each step and group, as two (steps x 2) arrays, from the 2 x 2 x 2 funnel counts
+def step_counts(counts):
+    counts = np.asarray(counts, dtype=np.int64)
+    successes = np.stack([counts[:, 0, :].sum(axis=1), counts[:, 0, 0], counts[:, :, 0].sum(axis=1)])
+    trials = np.stack([counts.sum(axis=(1, 2)), counts[:, 0, :].sum(axis=1), counts.sum(axis=(1, 2))])
+    return successes, trials
+
+
+#The mSPRT likelihood ratio of every row of (successes, trials) at once, as its log. Rows where either group has no trials, or where V is 0,
+#carry no evidence (log ratio 0)
+def msprt_log_ratio(successes, trials, tau=DEFAULT_TAU):
+    successes, trials = np.asarray(successes, dtype=float), np.asarray(trials, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rates = successes / trials
+        variance = (rates * (1 - rates) / trials).sum(axis=-1)
+        difference = rates[..., 1] - rates[..., 0]
+        log_ratio = 0.5 * np.log(variance / (variance + tau ** 2)) + tau ** 2 * difference ** 2 / (2 * variance * (variance + tau ** 2))
+    return np.where(np.isfinite(log_ratio) & (variance > 0), log_ratio, 0.0)
+
+
+#----------------------------
+#----------------------------
+
+### THE MONITOR ###
+
+#Events come in batches as a frame with the join key (first_name, last_name, email), an 'event' column (a key of EVENT_FLAGS) and a 'date' column.
+#Use 'events_from_tables()' to turn rows of the four MuscleHub tables into events. The whole monitor pickles, so it can be saved between runs
+class SequentialMonitor:
+
+    def __init__(self, start_date='2017-07-01', alpha=DEFAULT_ALPHA, tau=DEFAULT_TAU, min_trials=DEFAULT_MIN_TRIALS):
+        self.start_date = pd.Timestamp(start_date).normalize()
+        self.alpha, self.tau, self.min_trials = alpha, tau, min_trials
+        self.visitors = {}
+        self.counts = np.zeros((2, 2, 2), dtype=np.int64)
+        self.pvalues = np.ones(len(SEQUENTIAL_STEPS))
+        self.stopped_on = [None] * len(SEQUENTIAL_STEPS)
+        #The group that was ahead when each step stopped ('A' or 'B'). It's kept as it was then, even if later data narrows or flips the gap
+        self.winners = [None] * len(SEQUENTIAL_STEPS)
+        self.events = 0
+        self.batches = 0
+
+    #Funnel cell of each set of flags (group * 4 + application * 2 + member, 0 = 'A'/'Application'/'Member'), or -1 when not a counted visitor
+    @staticmethod
+    def _cells(flags):
+        flags = np.asarray(flags, dtype=np.int64)
+        cells = ((flags & 2) == 0) * 4 + ((flags & 4) == 0) * 2 + ((flags & 8) == 0)
+        return np.where(flags & 1, cells, -1)
+
+    def _move(self, cells, sign):
+        cells = cells[cells >= 0]
+        self.counts += sign * np.bincount(cells, minlength=8).reshape(2, 2, 2)
+
+    #Adds one batch of events and re-tests every step. 'label' is recorded against any step that stops in this batch (default: the batch's
+    #latest date)
+    def consume(self, events, label=None):
+        events = events[events['first_name'].notna() & events['date'].notna()]
+        dates = pd.to_datetime(events['date'], errors='coerce', format='mixed')
+        flags = events['event'].map(EVENT_FLAGS).fillna(0).astype(np.int64).to_numpy()
+        #Visits before the start of the experiment don't make anyone a visitor
+        flags = np.where((flags == EVENT_FLAGS['visit']) & (dates < self.start_date).to_numpy(), 0, flags)
+        visitor = (events['first_name'].astype(str) + '\x1f' + events['last_name'].fillna('').astype(str) + '\x1f'
+                   + events['email'].fillna('').astype(str))
+
+        #One OR of the flags per visitor in the batch, then one dict lookup each
+        raised = pd.DataFrame({bit: (flags & bit) > 0 for bit in EVENT_FLAGS.values()}, index=visitor.to_numpy()).groupby(level=0).any()
+        new_flags = sum(raised[bit].to_numpy(dtype=np.int64) * bit for bit in EVENT_FLAGS.values())
+        before = np.fromiter((self.visitors.get(name, 0) for name in raised.index), dtype=np.int64, count=len(raised))
+        after = before | new_flags
+        for name, old, new in zip(raised.index, before, after):
+            if new != old:
+                self.visitors[name] = int(new)
+        self._move(self._cells(before), -1)
+        self._move(self._cells(after), 1)
+
+        self.events += len(events)
+        self.batches += 1
+        successes, trials = step_counts(self.counts)
+        testable = (trials >= self.min_trials).all(axis=1)
+        log_ratio = np.where(testable, msprt_log_ratio(successes, trials, self.tau), 0.0)
+        self.pvalues = np.minimum(self.pvalues, np.exp(-log_ratio))
+        if label is None and len(dates) and dates.notna().any():
+            label = dates.max()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rates = successes / trials
+        for step, pvalue in enumerate(self.pvalues):
+            if self.stopped_on[step] is None and pvalue <= self.alpha:
+                self.stopped_on[step] = label if label is not None else 'batch {}'.format(self.batches)
+                self.winners[step] = 'B' if rates[step, 1] > rates[step, 0] else 'A'
+        return MonitorUpdate(self.events, self.counts.copy(), self.status())
+
+    #One row per funnel step: each group's rate and trials, the always-valid p-value so far, and whether (and when) it crossed 'alpha', with the
+    #group that was ahead at that moment
+    def status(self):
+        successes, trials = step_counts(self.counts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rates = successes / trials
+        decisions = ['keep running' if winner is None else 'stop: {} higher'.format(winner) for winner in self.winners]
+        return pd.DataFrame({'trials_A': trials[:, 0], 'trials_B': trials[:, 1], 'rate_A': rates[:, 0], 'rate_B': rates[:, 1],
+                             'difference': rates[:, 1] - rates[:, 0], 'pvalue': self.pvalues, 'decision': decisions,
+                             'stopped_on': self.stopped_on}, index=pd.Index(SEQUENTIAL_STEPS, name='step'))
+
+
+#----------------------------
+#----------------------------
+
+### EVENTS FROM THE MUSCLEHUB TABLES ###
+
+#{table name: rows of that table} -> one frame of events (join key, 'event', 'date') in date order, ready for 'SequentialMonitor.consume()'
+def events_from_tables(frames):
+    events = []
+    for table, rows in frames.items():
+        event, date_column = EVENT_TABLES[table]
+        events.append(pd.DataFrame({'first_name': rows['first_name'], 'last_name': rows['last_name'], 'email': rows['email'], 'event': event,
+                                    'date': pd.to_datetime(rows[date_column], errors='coerce', format='mixed')}))
+    if not events:
+        return pd.DataFrame(columns=['first_name', 'last_name', 'email', 'event', 'date'])
+    return pd.concat(events, ignore_index=True).sort_values('date', kind='stable', ignore_index=True)
+
+
+#Feeds events to the monitor one 'freq' period (default: a day) at a time, in date order, so a replay of history stops on the same day a live
+#monitor would have. Returns the last MonitorUpdate (None when there were no events)
+@profiled('sequential test')
+def consume_by_period(monitor, events, freq='D'):
+    update = None
+    events = events[events['date'].notna()]
+    for period, batch in events.groupby(events['date'].dt.to_period(freq), sort=True):
+        update = monitor.consume(batch, label=str(period))
+    return update
+
+
+#----------------------------
+#----------------------------
+
+### MONITORING THE TABLE CSVs AS THEY GROW ###
+
+#Reads only the rows appended to the four MuscleHub CSVs since the last run (see incremental.py), feeds them to the saved monitor a day at a time
+#and saves it again. The first run replays the whole history. Returns (monitor, [IngestReport])
+def monitor_funnel_csvs(csv_dir='.', start_date='2017-07-01', alpha=DEFAULT_ALPHA, tau=DEFAULT_TAU, min_trials=DEFAULT_MIN_TRIALS, freq='D'):
+    from incremental import INCREMENTAL_DIR, load_state, open_sources, save_state
+    from musclehub_db import JOIN_KEY
+
+    paths = {table: os.path.join(csv_dir, table + '.csv') for table in EVENT_TABLES}
+    key = {'format': MONITOR_FORMAT, 'sources': {table: os.path.abspath(path) for table, path in paths.items()},
+           'start_date': str(pd.Timestamp(start_date).date()), 'alpha': alpha, 'tau': tau, 'min_trials': min_trials, 'freq': freq}
+    name = 'sequential_ab'
+    saved = load_state(name, key, INCREMENTAL_DIR)
+    sources = open_sources(paths, saved and saved['sources'])
+    if saved is None or any(source.reset for source in sources.values()):
+        saved = {'monitor': SequentialMonitor(start_date, alpha, tau, min_trials)}
+
+    monitor = saved['monitor']
+    frames = {table: source.read(usecols=JOIN_KEY + [EVENT_TABLES[table][1]], dtype={column: 'str' for column in JOIN_KEY})
+              for table, source in sources.items()}
+    consume_by_period(monitor, events_from_tables(frames), freq)
+    save_state(name, key, {'sources': {table: source.state() for table, source in sources.items()}, 'monitor': monitor}, INCREMENTAL_DIR)
+    return monitor, [source.report() for source in sources.values()]
@@ -0,0 +1,73 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+#----------------------------
+#----------------------------
+
+### INVERTED INDEX ON SPECIES COMMON NAMES ###
+
+#Checking "'Sheep' in x" for every row scans every common_names string for every animal we look up. Instead, we split each row's common names into
+#lowercase word tokens ONCE and map each token to the rows it appears in. Looking up a word is then a dictionary lookup that only touches the
+#matching rows, no matter how many species are in the frame
+
+TOKEN_PATTERN = r"[a-z0-9']+"
+
+
+def tokenize(text):
+    return re.findall(TOKEN_PATTERN, str(text).lower())
+
+
+class SpeciesNameIndex:
+
+    #Builds the token -> row positions mapping with vectorized string methods (no per-row Python function)
+    def __init__(self, species, column='common_names'):
+        self.species = species
+        self.column = column
+        names = species[column].astype(str).str.lower().str.findall(TOKEN_PATTERN)
+        names.index = np.arange(len(species))
+        tokens = names.explode().dropna()
+        positions = pd.Series(tokens.index.to_numpy(dtype=np.intp))
+        self.postings = {token: np.asarray(rows, dtype=np.intp)
+                         for token, rows in positions.groupby(tokens.to_numpy()).unique().items()}
+
+    #Row positions whose common names contain every word of 'name' (case-insensitive). Multi-word names like 'Bighorn Sheep' are
+    #checked as a phrase (within one comma-separated common name) on just the candidate rows
+    def positions(self, name):
+        words = tokenize(name)
+        if not words:
+            return np.array([], dtype=np.intp)
+        rows = self.postings.get(words[0], np.array([], dtype=np.intp))
+        for word in words[1:]:
+            rows = np.intersect1d(rows, self.postings.get(word, np.array([], dtype=np.intp)), assume_unique=True)
+        if len(words) > 1 and len(rows):
+            phrase = ' '.join(words)
+            candidates = self.species[self.column].iloc[rows].astype(str)\
+                .map(lambda x: any(phrase in ' '.join(tokenize(part)) for part in x.split(',')))
+            rows = rows[candidates.to_numpy(dtype=bool)]
+        return rows
+
+    #Boolean mask over the whole frame, e.g. for an 'is_sheep' column
+    def mask(self, name, substring=False):
+        if substring:
+            return self._contains(name).to_numpy(dtype=bool)
+        mask = np.zeros(len(self.species), dtype=bool)
+        mask[self.positions(name)] = True
+        return mask
+
+    #Vectorized fallback for queries that aren't whole words (e.g. 'Sheep' inside 'Sheepshead')
+    def _contains(self, name):
+        return self.species[self.column].astype(str).str.contains(name, case=False, regex=False)
+
+    #Rows of the species frame whose common names contain 'name', optionally only within one 'category' (e.g. 'Mammal').
+    #With substring=True, 'name' is matched anywhere in the text with 'str.contains' instead of through the index
+    def find_species(self, name, category=None, substring=False):
+        if substring:
+            matches = self.species[self._contains(name).to_numpy(dtype=bool)]
+        else:
+            matches = self.species.iloc[np.sort(self.positions(name))]
+        if category is not None:
+            matches = matches[(matches['category'] == category).to_numpy(dtype=bool)]
+        return matches
@@ -0,0 +1,255 @@
+import ast
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import string
+
+
+#----------------------------
+#----------------------------
+
+### ON-DISK CACHE OF STAGE RESULTS ###
+
+#Every stage's result (the dict it returns, plus everything it printed) is pickled under '.cache/stages/', named by a content hash of everything
+#the result depends on:
+#   - the stage's name and source code
+#   - what the stage's code looks up in its work script: the source of the helper functions it calls (and of the ones they call), and the
+#     values of the constants it reads (e.g. 'STORE_SYMBOLS')
+#   - the source of every module in the repo the stage imports (stages import their helpers, e.g. 'chi_square_tests.py', inside the function
+#     body), and of every repo module those import in turn
+#   - the content of the input files it reads ('files', which may name options like '{fundamentals}')
+#   - the values of the command-line options it uses ('params')
+#   - the keys of the stages it requires, so a change anywhere upstream changes every key downstream of it
+#Re-running after editing only the charts stage therefore only re-runs the charts stage, and editing a helper module only re-runs the stages that
+#import it. The cache is bounded in bytes: when it grows past 'max_bytes', the least recently used entries are deleted first
+
+STAGE_CACHE_DIR = os.path.join('.cache', 'stages')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+#Remembered file hashes, so a big CSV is only re-hashed when its size or modification time changes
+FILE_HASHES = 'file_hashes.json'
+
+
+#Hashing the whole file in 1 MB blocks so hundreds of MB never have to sit in memory at once
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_hash(function):
+    try:
+        source = inspect.getsource(function)
+    except (OSError, TypeError):
+        source = function.__module__ + '.' + function.__qualname__
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+#Worked out once per run for each module file: the repo modules it imports, and its content hash
+_MODULE_IMPORTS = {}
+_MODULE_HASHES = {}
+
+#Constants are hashed by value. Anything else (a pandas frame, a compiled regex...) only by its type, since its repr may hold a memory address
+_PLAIN_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+def _value_repr(value):
+    if isinstance(value, _PLAIN_TYPES):
+        return repr(value)
+    if isinstance(value, dict):
+        return '{' + ', '.join(_value_repr(key) + ': ' + _value_repr(item) for key, item in value.items()) + '}'
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_value_repr(item) for item in value]
+        return type(value).__name__ + '(' + ', '.join(sorted(items) if isinstance(value, (set, frozenset)) else items) + ')'
+    return '<' + type(value).__module__ + '.' + type(value).__qualname__ + '>'
+
+
+#Every name a function's code looks up, including in the comprehensions, lambdas and inner functions it contains. Attribute names are in there
+#too, which at worst adds a global that happens to share a name
+def _code_names(code):
+    names = set(code.co_names)
+    for constant in code.co_consts:
+        if inspect.iscode(constant):
+            names |= _code_names(constant)
+    return names
+
+
+def _local_module(name, directory):
+    path = os.path.join(directory, name + '.py')
+    return path if os.path.isfile(path) else None
+
+
+#The repo modules (files in 'directory') that a module imports anywhere in its source, top level or inside a function
+def _module_imports(path, directory):
+    if path not in _MODULE_IMPORTS:
+        with open(path, 'rb') as source:
+            tree = ast.parse(source.read(), path)
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(alias.name.split('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names.add(node.module.split('.')[0])
+        _MODULE_IMPORTS[path] = sorted(name for name in names if _local_module(name, directory))
+    return _MODULE_IMPORTS[path]
+
+
+#One hash over what a stage function depends on outside its own source: the work-script functions and constants it reaches, and the repo modules
+#it imports (directly, through those functions, or through other modules)
+def _dependencies_hash(function):
+    try:
+        own_path = os.path.abspath(inspect.getsourcefile(function))
+    except (OSError, TypeError):
+        return None
+    directory = os.path.dirname(own_path)
+    own_globals = function.__globals__
+    digest = hashlib.sha256()
+    modules = set()
+    seen = {function.__name__}
+    pending = [function]
+    while pending:
+        current = pending.pop()
+        for name in sorted(_code_names(current.__code__)):
+            if _local_module(name, directory):
+                modules.add(name)
+            if name in seen or name not in own_globals:
+                continue
+            seen.add(name)
+            value = own_globals[name]
+            module = getattr(value, '__module__', None) if inspect.isfunction(value) or inspect.isclass(value) else None
+            if inspect.ismodule(value):
+                if _local_module(value.__name__.split('.')[0], directory):
+                    modules.add(value.__name__.split('.')[0])
+            elif module == function.__module__:
+                #A helper (or class) defined in the work script itself: its source, and for a function whatever it looks up in turn
+                digest.update(name.encode('utf-8') + b'\0' + _source_hash(value).encode('ascii'))
+                if inspect.isfunction(value):
+                    pending.append(value)
+            elif module is not None:
+                if _local_module(module.split('.')[0], directory):
+                    modules.add(module.split('.')[0])
+            else:
+                digest.update(name.encode('utf-8') + b'\0' + _value_repr(value).encode('utf-8'))
+
+    #The modules imported by those modules, and so on
+    pending = sorted(modules)
+    while pending:
+        path = _local_module(pending.pop(), directory)
+        for name in _module_imports(path, directory):
+            if name not in modules:
+                modules.add(name)
+                pending.append(name)
+    for name in sorted(modules):
+        path = _local_module(name, directory)
+        if os.path.abspath(path) == own_path:
+            continue
+        if path not in _MODULE_HASHES:
+            _MODULE_HASHES[path] = file_hash(path)
+        digest.update(b'module ' + name.encode('utf-8') + b'\0' + _MODULE_HASHES[path].encode('ascii'))
+    return digest.hexdigest()
+
+
+class StageCache:
+
+    def __init__(self, directory=STAGE_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._file_hashes = None
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    #Content hash of one input file, or None if it doesn't exist (yet)
+    def file_digest(self, path):
+        if not os.path.exists(path):
+            return None
+        index_path = os.path.join(self.directory, FILE_HASHES)
+        if self._file_hashes is None:
+            try:
+                with open(index_path) as index_file:
+                    self._file_hashes = json.load(index_file)
+            except (OSError, ValueError):
+                self._file_hashes = {}
+
+        stat = os.stat(path)
+        full_path = os.path.abspath(path)
+        known = self._file_hashes.get(full_path)
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known['sha256']
+
+        digest = file_hash(path)
+        self._file_hashes[full_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+        os.makedirs(self.directory, exist_ok=True)
+        with open(index_path, 'w') as index_file:
+            json.dump(self._file_hashes, index_file)
+        return digest
+
+    #The cache key of a stage, given the keys already worked out for the stages it requires
+    def stage_key(self, stage, options, requirement_keys):
+        settings = vars(options) if options is not None else {}
+        #A file named after an option that wasn't given (e.g. '{store}/symbols.json' without '--store') isn't read, so it isn't part of the key
+        files = [path.format(**settings) for path in stage.files
+                 if all(settings.get(field) is not None for _, field, _, _ in string.Formatter().parse(path) if field)]
+        description = {
+            'stage': stage.name,
+            'source': _source_hash(stage.function),
+            'dependencies': _dependencies_hash(stage.function),
+            'files': [[path, self.file_digest(path)] for path in files],
+            'params': [[name, settings.get(name)] for name in stage.params],
+            'requires': [requirement_keys[name] for name in stage.requires],
+        }
+        encoded = json.dumps(description, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def __contains__(self, key):
+        return os.path.exists(self._entry_path(key))
+
+    #Returns (result, printed output) for a key, or None on a miss. A hit counts as a use for the LRU eviction
+    def get(self, key):
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as entry:
+                result, output = pickle.load(entry)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        os.utime(path)
+        return result, output
+
+    #Saves a stage's result, then evicts old entries if the cache is over its size limit. Results that can't be pickled are just not cached
+    def put(self, key, result, output):
+        try:
+            payload = pickle.dumps((result, output), protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._entry_path(key)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as entry:
+            entry.write(payload)
+        os.replace(temp_path, path)
+        self.evict()
+        return True
+
+    #Deletes the least recently used entries until the cache fits in 'max_bytes'
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+        return total
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,187 @@
+import contextlib
+import functools
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+
+#----------------------------
+#----------------------------
+
+### OPT-IN TIMING AND MEMORY PROFILING ###
+
+#Records wall time, CPU time, peak memory and row counts for each named section of an analysis run. Nothing is measured unless a Profiler is
+#active, so the decorated helpers cost one global lookup per call the rest of the time:
+#
+#   with Profiler() as profiler:
+#       with profiler.section('merge') as section:
+#           df = load_funnel()
+#           section.rows = len(df)
+#   profiler.write_json('stage_profile.json')
+#   print(profiler.summary_table())
+#
+#The work scripts turn it on with '--profile': every stage is a section, and the helpers that do the heavy lifting (loading, merge, groupby/pivot,
+#chi-square, plotting) are decorated with '@profiled' so they show up as sections nested inside their stage.
+#
+#***NOTE: Peak memory comes from 'tracemalloc', i.e. memory allocated through Python (numpy and pandas included) above what was already allocated
+#when the section started. Tracing every allocation slows pandas-heavy code down noticeably, which is why all of this is opt-in.
+#CPU time is this process only, so charts drawn in worker processes show up as wall time but not CPU time
+
+#One finished section. 'name' is the path of nested sections, e.g. 'funnel/load_funnel'. 'rows' is a row count, a dict of row counts per returned
+#frame, or None
+SectionTiming = namedtuple('SectionTiming', ['name', 'depth', 'wall_seconds', 'cpu_seconds', 'peak_memory_bytes', 'rows', 'cached'])
+
+_ACTIVE = None
+
+
+#Rows in a frame/array, or per frame for a dict of results (like the dict a stage returns)
+def count_rows(value):
+    if isinstance(value, dict):
+        counts = {key: count_rows(item) for key, item in value.items()}
+        return {key: count for key, count in counts.items() if isinstance(count, int)} or None
+    shape = getattr(value, 'shape', None)
+    if shape:
+        return int(shape[0])
+    return None
+
+
+class _OpenSection:
+
+    def __init__(self, name, depth, memory_start):
+        self.name = name
+        self.depth = depth
+        self.rows = None
+        self.cached = False
+        self.memory_start = memory_start
+        self.peak = memory_start
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+
+
+class Profiler:
+
+    #trace_memory=False skips tracemalloc (peak memory is then reported as 0), for timings without the tracing overhead
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.sections = []
+        self._stack = []
+        self._started_tracing = False
+        self._previous = None
+
+    def __enter__(self):
+        global _ACTIVE
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._previous = _ACTIVE
+        _ACTIVE = self
+        return self
+
+    def __exit__(self, *exc_info):
+        global _ACTIVE
+        _ACTIVE = self._previous
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return False
+
+    #Folds the peak since the last reset into every open section, so resetting for a nested section doesn't lose the outer sections' peaks
+    def _collect_peak(self):
+        peak = tracemalloc.get_traced_memory()[1]
+        for open_section in self._stack:
+            open_section.peak = max(open_section.peak, peak)
+        tracemalloc.reset_peak()
+
+    #Context manager timing one section. Set '.rows' (and '.cached') on the object it yields to record them
+    @contextlib.contextmanager
+    def section(self, name):
+        open_section = self._start(name)
+        try:
+            yield open_section
+        finally:
+            self._finish(open_section)
+
+    def _start(self, name):
+        self._collect_peak()
+        path = '/'.join([open_section.name for open_section in self._stack[-1:]] + [name])
+        open_section = _OpenSection(path, len(self._stack), tracemalloc.get_traced_memory()[0])
+        #Keeping a slot in start order, since nested sections finish before the section around them
+        open_section.index = len(self.sections)
+        self.sections.append(None)
+        self._stack.append(open_section)
+        return open_section
+
+    def _finish(self, open_section):
+        wall = time.perf_counter() - open_section.wall_start
+        cpu = time.process_time() - open_section.cpu_start
+        self._collect_peak()
+        self._stack.remove(open_section)
+        self.sections[open_section.index] = SectionTiming(open_section.name, open_section.depth, wall, cpu,
+                                                          max(open_section.peak - open_section.memory_start, 0), open_section.rows,
+                                                          open_section.cached)
+
+    #Finished sections in the order they started
+    def finished_sections(self):
+        return [timing for timing in self.sections if timing is not None]
+
+    def report(self):
+        return {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'argv': sys.argv,
+            'sections': [timing._asdict() for timing in self.finished_sections()],
+        }
+
+    def write_json(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as report_file:
+            json.dump(self.report(), report_file, indent=2)
+        return path
+
+    #Plain-text table of every section, one row each, nested sections indented under their stage
+    def summary_table(self):
+        header = ['section', 'wall s', 'cpu s', 'peak MB', 'rows', 'cached']
+        rows = []
+        for timing in self.finished_sections():
+            rows_text = timing.rows if not isinstance(timing.rows, dict) else sum(timing.rows.values())
+            rows.append(['  ' * timing.depth + timing.name.split('/')[-1], '{:.3f}'.format(timing.wall_seconds), '{:.3f}'.format(timing.cpu_seconds),
+                         '{:.1f}'.format(timing.peak_memory_bytes / 2 ** 20), '' if rows_text is None else str(rows_text),
+                         'yes' if timing.cached else ''])
+        widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+        lines = ['  '.join(str(cell).ljust(width) if i == 0 else str(cell).rjust(width) for i, (cell, width) in enumerate(zip(row, widths)))
+                 for row in [header] + rows]
+        lines.insert(1, '  '.join('-' * width for width in widths))
+        return '\n'.join(lines)
+
+
+#Module-level shortcut for timing a block inside a stage: records a section if a Profiler is active, otherwise does nothing
+def section(name):
+    if _ACTIVE is None:
+        return contextlib.nullcontext(_OpenSection(name, 0, 0))
+    return _ACTIVE.section(name)
+
+
+#Decorator: times every call of the function as a section (named after the function unless 'name' is given) while a Profiler is active,
+#counting the rows of whatever it returns
+def profiled(name=None):
+    def decorator(function):
+        section_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            profiler = _ACTIVE
+            if profiler is None:
+                return function(*args, **kwargs)
+            with profiler.section(section_name) as section:
+                result = function(*args, **kwargs)
+                section.rows = count_rows(result)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from chi_square_tests import adjust_pvalues, pairwise_chi2, pairwise_chi2_matrix
+
+
+#A NaN p-value (a test that couldn't be run) must stay NaN in its own place, and the other p-values must be adjusted as if it wasn't there
+@pytest.mark.parametrize('method', ['bonferroni', 'holm', 'fdr_bh'])
+def test_adjust_pvalues_skips_nan(method):
+    with_nan = adjust_pvalues([0.01, np.nan, 0.02], method)
+    without_nan = adjust_pvalues([0.01, 0.02], method)
+    assert np.isnan(with_nan[1])
+    np.testing.assert_allclose(with_nan[[0, 2]], without_nan)
+
+
+def test_adjust_pvalues_nan_values():
+    np.testing.assert_allclose(adjust_pvalues([0.01, np.nan, 0.02], 'holm'), [0.02, np.nan, 0.02])
+    np.testing.assert_allclose(adjust_pvalues([0.01, np.nan, 0.02], 'fdr_bh'), [0.02, np.nan, 0.02])
+    assert np.isnan(adjust_pvalues([np.nan, np.nan], 'holm')).all()
+
+
+#The matrix holds the same tests as 'pairwise_chi2()', once per pair, mirrored across an empty diagonal
+def test_pairwise_chi2_matrix_mirrors_the_pairwise_tests():
+    pivot = pd.DataFrame({'category': ['Amphibian', 'Bird', 'Fish', 'Mammal'], 'protected': [7, 75, 11, 30], 'not_protected': [72, 413, 115, 146]})
+    matrix = pairwise_chi2_matrix(pivot, 'category', ['protected', 'not_protected'])
+    pairs = pairwise_chi2(pivot, 'category', ['protected', 'not_protected'])
+    for row in pairs.itertuples():
+        assert matrix.chi2.loc[row.group_1, row.group_2] == matrix.chi2.loc[row.group_2, row.group_1] == row.chi2
+        assert matrix.pvalue.loc[row.group_1, row.group_2] == matrix.pvalue.loc[row.group_2, row.group_1] == row.pvalue
+    np.testing.assert_allclose(np.sort(matrix.adjusted_pvalue.to_numpy()[np.triu_indices(4, k=1)]), np.sort(adjust_pvalues(pairs.pvalue, 'holm')))
+    assert np.isnan(np.diag(matrix.pvalue.to_numpy())).all() and not np.diag(matrix.significant.to_numpy()).any()
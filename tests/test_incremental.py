@@ -0,0 +1,162 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from incremental import update_funnel_counts, update_observation_totals, update_rolling_comparison
+
+
+#Every test runs the incremental update twice against one state folder (the run before the file grew, then the run after) and compares the second
+#result with a run from an empty state folder, which reads the whole file: the two must always agree
+
+SHEEP = ['Ovis aries', 'Ovis canadensis']
+
+
+def _write(path, text, mode='w'):
+    with open(path, mode, newline='') as target:
+        target.write(text)
+
+
+def _observation_lines(count, seed=0):
+    rng = np.random.default_rng(seed)
+    names = rng.choice(SHEEP + ['Canis lupus'], count)
+    parks = rng.choice(['Yellowstone National Park', 'Yosemite National Park', 'Bryce National Park'], count)
+    observations = rng.integers(10, 200, count)
+    return ['{},{},{}\n'.format(name, park, number) for name, park, number in zip(names, parks, observations)]
+
+
+OBSERVATIONS_HEADER = 'scientific_name,park_name,observations\n'
+
+
+def _full_observation_totals(path, tmp_path):
+    shutil.rmtree(tmp_path / 'full', ignore_errors=True)
+    totals, reports = update_observation_totals(path, SHEEP, directory=str(tmp_path / 'full'))
+    assert all(report.reset for report in reports)
+    return totals
+
+
+def test_observation_totals_append_matches_full(tmp_path):
+    path = str(tmp_path / 'observations.csv')
+    lines = _observation_lines(100)
+    _write(path, OBSERVATIONS_HEADER + ''.join(lines[:60]))
+    update_observation_totals(path, SHEEP, chunksize=7, directory=str(tmp_path / 'state'))
+
+    _write(path, ''.join(lines[60:]), 'a')
+    totals, reports = update_observation_totals(path, SHEEP, chunksize=7, directory=str(tmp_path / 'state'))
+    assert [(report.rows, report.reset) for report in reports] == [(40, False)]
+    pd.testing.assert_frame_equal(totals, _full_observation_totals(path, tmp_path))
+
+    #And the full run agrees with a plain groupby over the file
+    frame = pd.read_csv(path)
+    expected = frame[frame['scientific_name'].isin(SHEEP)].groupby(['park_name', 'scientific_name'])['observations'].sum()
+    assert totals.set_index(['park_name', 'scientific_name'])['observations'].to_dict() == expected.to_dict()
+
+
+#A file that got shorter, or was rewritten in place with the same size, is read again from the top instead of from the saved offset
+@pytest.mark.parametrize('rewrite', ['truncated', 'rewritten'])
+def test_observation_totals_reset_when_file_is_replaced(tmp_path, rewrite):
+    path = str(tmp_path / 'observations.csv')
+    lines = _observation_lines(100)
+    _write(path, OBSERVATIONS_HEADER + ''.join(lines))
+    update_observation_totals(path, SHEEP, directory=str(tmp_path / 'state'))
+
+    if rewrite == 'truncated':
+        lines = lines[:50]
+    else:
+        lines = [line.replace('Ovis aries', 'Canis lupu') if 'Ovis aries' in line else line for line in lines]
+    _write(path, OBSERVATIONS_HEADER + ''.join(lines))
+    totals, reports = update_observation_totals(path, SHEEP, directory=str(tmp_path / 'state'))
+    assert [report.reset for report in reports] == [True]
+    pd.testing.assert_frame_equal(totals, _full_observation_totals(path, tmp_path))
+
+
+#A last line still being written when a run reads it is counted as it was then. When the rest of it arrives, the file is read again from the top
+#instead of counting the line a second time; when only its newline was missing, the next run carries on from the offset
+def test_observation_totals_partial_last_line(tmp_path):
+    path = str(tmp_path / 'observations.csv')
+    lines = _observation_lines(100)
+    _write(path, OBSERVATIONS_HEADER + ''.join(lines[:30]) + lines[30][:-2])
+    update_observation_totals(path, SHEEP, directory=str(tmp_path / 'state'))
+
+    _write(path, OBSERVATIONS_HEADER + ''.join(lines[:80]).rstrip('\n'))
+    totals, reports = update_observation_totals(path, SHEEP, directory=str(tmp_path / 'state'))
+    assert [report.reset for report in reports] == [True]
+    pd.testing.assert_frame_equal(totals, _full_observation_totals(path, tmp_path))
+
+    _write(path, '\n' + ''.join(lines[80:]), 'a')
+    totals, reports = update_observation_totals(path, SHEEP, directory=str(tmp_path / 'state'))
+    assert [(report.rows, report.reset) for report in reports] == [(20, False)]
+    pd.testing.assert_frame_equal(totals, _full_observation_totals(path, tmp_path))
+
+
+#----------------------------
+
+def _price_csv(dates, prices):
+    return 'Date,Adj Close\n' + ''.join('{},{!r}\n'.format(date.date(), float(price)) for date, price in zip(dates, prices))
+
+
+#Both price CSVs grow, one ahead of the other, and the appended part re-sends the last few rows already used: those must not count twice
+def test_rolling_comparison_append_matches_full(tmp_path):
+    rng = np.random.default_rng(1)
+    dates = pd.bdate_range('2017-01-02', periods=160)
+    prices = {'NFLX': 140 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates)))),
+              'DJI': 20000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))}
+    paths = {ticker: str(tmp_path / (ticker + '.csv')) for ticker in prices}
+    first_rows = {'NFLX': 100, 'DJI': 90}
+    for ticker, rows in first_rows.items():
+        _write(paths[ticker], _price_csv(dates[:rows], prices[ticker][:rows]))
+    update_rolling_comparison(paths, 'NFLX', 'DJI', directory=str(tmp_path / 'state'))
+
+    for ticker, rows in first_rows.items():
+        _write(paths[ticker], _price_csv(dates[rows - 3:], prices[ticker][rows - 3:]).split('\n', 1)[1], 'a')
+    table, reports = update_rolling_comparison(paths, 'NFLX', 'DJI', directory=str(tmp_path / 'state'))
+    assert [report.reset for report in reports] == [False, False]
+    assert [report.rows for report in reports] == [len(dates) - rows for rows in first_rows.values()]
+
+    for ticker in prices:
+        _write(paths[ticker], _price_csv(dates, prices[ticker]))
+    full, _ = update_rolling_comparison(paths, 'NFLX', 'DJI', directory=str(tmp_path / 'full'))
+    assert len(table) == len(dates)
+    pd.testing.assert_frame_equal(table, full, check_freq=False)
+
+
+#----------------------------
+
+def _funnel_csvs(count, seed=2):
+    rng = np.random.default_rng(seed)
+    people = pd.DataFrame({'first_name': ['First{}'.format(number) for number in range(count)],
+                           'last_name': ['Last{}'.format(number) for number in range(count)],
+                           'email': ['person{}@example.com'.format(number) for number in range(count)]})
+    visit_dates = pd.Timestamp('2017-06-20') + pd.to_timedelta(rng.integers(0, 60, count), unit='D')
+    tested = rng.random(count) < 0.5
+    applied = rng.random(count) < 0.3
+    purchased = applied & (rng.random(count) < 0.7)
+    tables = {'visits': people.assign(visit_date=visit_dates.strftime('%m-%d-%y'))}
+    for table, column, mask in [('fitness_tests', 'fitness_test_date', tested), ('applications', 'application_date', applied),
+                                ('purchases', 'purchase_date', purchased)]:
+        later = visit_dates[mask] + pd.to_timedelta(rng.integers(0, 10, mask.sum()), unit='D')
+        tables[table] = people[mask].assign(**{column: later.strftime('%Y-%m-%d')}).reset_index(drop=True)
+    return tables
+
+
+#Rows appended to each table later on (e.g. a purchase a week after its visit) move their visitors to the right funnel cell
+def test_funnel_counts_append_matches_full(tmp_path):
+    tables = _funnel_csvs(300)
+    csv_dir = tmp_path / 'csv'
+    csv_dir.mkdir()
+    for table, frame in tables.items():
+        frame.iloc[:len(frame) * 2 // 3].to_csv(csv_dir / (table + '.csv'), index=False)
+    update_funnel_counts(str(csv_dir), directory=str(tmp_path / 'state'))
+
+    for table, frame in tables.items():
+        frame.iloc[len(frame) * 2 // 3:].to_csv(csv_dir / (table + '.csv'), index=False, header=False, mode='a')
+    counted, reports = update_funnel_counts(str(csv_dir), directory=str(tmp_path / 'state'))
+    assert not any(report.reset for report in reports)
+    full, _ = update_funnel_counts(str(csv_dir), directory=str(tmp_path / 'full'))
+    np.testing.assert_array_equal(counted.counts, full.counts)
+    for first, second in zip(counted[1:], full[1:]):
+        pd.testing.assert_frame_equal(first, second)
+
+    #The funnel counts every visitor who came on or after the start date once
+    assert counted.counts.sum() == (pd.to_datetime(tables['visits']['visit_date'], format='%m-%d-%y') >= '2017-07-01').sum()
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from sequential_ab import SequentialMonitor, consume_by_period, msprt_log_ratio
+
+
+#Events of 'visitors' made-up visitors, in order: a visit, then a fitness test for every other visitor (group A), then an application at the
+#rate of their group (application_rates = (A, B)), then a purchase for half the applicants. One event every 'spacing', from the start date
+def _events(visitors, application_rates, seed=0, spacing='1h'):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for number in range(visitors):
+        person = {'first_name': 'First{}'.format(number), 'last_name': 'Last{}'.format(number), 'email': 'person{}@example.com'.format(number)}
+        group_a = number % 2 == 0
+        applied = rng.random() < application_rates[0 if group_a else 1]
+        events = ['visit'] + ['fitness_test'] * group_a + ['application'] * applied + ['purchase'] * (applied and rng.random() < 0.5)
+        rows.extend(dict(person, event=event) for event in events)
+    events = pd.DataFrame(rows)
+    events['date'] = pd.Timestamp('2017-07-01') + pd.to_timedelta(np.arange(len(events)), unit='h') * (pd.Timedelta(spacing) / pd.Timedelta('1h'))
+    return events
+
+
+def test_msprt_log_ratio_carries_no_evidence_without_a_difference():
+    log_ratio = msprt_log_ratio([[50, 50], [0, 10], [10, 10]], [[100, 100], [0, 100], [100, 100]])
+    assert log_ratio[1] == 0
+    assert log_ratio[0] < 0 and log_ratio[2] < 0
+    assert msprt_log_ratio([[10, 40]], [[100, 100]])[0] > np.log(1 / 0.05)
+
+
+#An A/A test (both groups apply at the same rate), looked at every day, must never stop
+def test_aa_stream_does_not_stop():
+    for seed in range(5):
+        monitor = SequentialMonitor()
+        consume_by_period(monitor, _events(2000, (0.3, 0.3), seed, spacing='10min'))
+        status = monitor.status()
+        assert (status['decision'] == 'keep running').all(), status
+        assert status['stopped_on'].isna().all()
+        assert (status['pvalue'] > monitor.alpha).all()
+
+
+#A clear lift in B's applications stops the application step with B ahead, and it stays that way even after later data turns the gap around
+def test_clear_lift_stops_with_the_right_winner():
+    monitor = SequentialMonitor()
+    consume_by_period(monitor, _events(600, (0.1, 0.4)))
+    status = monitor.status()
+    assert status.loc['application', 'decision'] == 'stop: B higher'
+    assert status.loc['application', 'stopped_on'] is not None
+    assert status.loc['application', 'pvalue'] <= monitor.alpha
+
+    #Then a flood of A visitors who all apply: A ends up ahead, but the step stopped with B ahead
+    late = _events(1000, (1.0, 0.0), seed=1)
+    late = late[late['first_name'].str[5:].astype(int) % 2 == 0]
+    late = late.assign(first_name='Late' + late['first_name'], date=late['date'] + pd.Timedelta(days=365))
+    consume_by_period(monitor, late)
+    status = monitor.status()
+    assert status.loc['application', 'rate_A'] > status.loc['application', 'rate_B']
+    assert status.loc['application', 'decision'] == 'stop: B higher'
+
+
+#Feeding a period at a time gives the same monitor as feeding the same rows one at a time: with one event per period, every decision (and when
+#it was made) matches; with many events per period, the funnel counts do
+def test_consume_by_period_matches_one_row_at_a_time():
+    events = _events(200, (0.1, 0.5), seed=2)
+    by_period = SequentialMonitor()
+    consume_by_period(by_period, events, freq='h')
+    by_row = SequentialMonitor()
+    for row in range(len(events)):
+        by_row.consume(events.iloc[[row]], label=str(events['date'].iloc[row].to_period('h')))
+    pd.testing.assert_frame_equal(by_period.status(), by_row.status())
+    assert (by_period.status()['decision'] != 'keep running').any()
+
+    by_day = SequentialMonitor()
+    consume_by_period(by_day, events.sample(frac=1, random_state=0))
+    np.testing.assert_array_equal(by_day.counts, by_row.counts)
+    assert by_day.visitors == by_row.visitors
+    assert by_day.events == by_row.events
@@ -0,0 +1,181 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from price_alignment import asof_positions
+from price_analytics import TRADING_DAYS_PER_YEAR, price_statistics, read_prices
+from stage_profile import profiled
+
+
+#----------------------------
+#----------------------------
+
+### COMPARING A WHOLE UNIVERSE OF TICKERS AGAINST ONE BENCHMARK, IN PARALLEL ###
+
+#The Netflix script compares NFLX with the Dow Jones. Here the same statistics (see 'price_analytics.price_statistics()') are worked out for
+#any number of tickers against one benchmark:
+#   - the benchmark is read once and copied into a shared memory block, which every worker process maps instead of getting its own copy
+#   - the tickers are split into chunks and each worker reads and measures one chunk at a time, so reading the files is parallel too
+#   - each ticker is measured on its OWN dates, with the benchmark price as of each of them, so a monthly ticker gets monthly returns on both
+#     sides, and its returns are annualized by how far apart its dates are
+#   - the results come back as one table, one row per ticker, in the order the tickers were given
+#A ticker that can't be read gets a row with its 'error' instead of stopping the whole run
+#
+#From the command line:  python ticker_comparison.py --benchmark DJI.csv NFLX.csv AAPL.csv ... --output ticker_comparison.csv
+#or, with the memory-mapped price store (see price_store.py), every symbol in it:  python ticker_comparison.py --store prices --benchmark DJI
+
+#The name of the benchmark's column in each per-ticker panel, so a ticker can't clash with it
+BENCHMARK_COLUMN = '<benchmark>'
+
+#Chunks per worker: a few, so one slow chunk at the end doesn't leave the other workers idle
+CHUNKS_PER_WORKER = 4
+
+
+#252 trading days, 52 weeks, 12 months, 4 quarters or 1 year, from the typical gap between dates
+def periods_per_year(dates):
+    if len(dates) < 2:
+        return TRADING_DAYS_PER_YEAR
+    spacing = np.median(np.diff(np.asarray(dates, dtype='datetime64[ns]'))) / np.timedelta64(1, 'D')
+    for days, periods in [(300, 1), (80, 4), (25, 12), (5, 52)]:
+        if spacing >= days:
+            return periods
+    return TRADING_DAYS_PER_YEAR
+
+
+#(dates, prices) of one ticker: 'source' is a CSV path, or a symbol when 'store_dir' is a price store
+def read_ticker(source, store_dir=None):
+    if store_dir is not None:
+        from price_store import PriceStore
+
+        columns = PriceStore(store_dir).load(source, fields=('Price',))
+        return columns['Date'], columns['Price']
+    frame = read_prices(source)
+    return frame.index.to_numpy(dtype='datetime64[ns]'), frame['Price'].to_numpy(dtype=float)
+
+
+#One row of statistics for one ticker against the benchmark
+def ticker_statistics(ticker, dates, prices, benchmark_dates, benchmark_prices):
+    positions, found = asof_positions(benchmark_dates, dates)
+    panel = pd.DataFrame({ticker: np.asarray(prices, dtype=float), BENCHMARK_COLUMN: np.where(found, benchmark_prices[positions], np.nan)},
+                         index=pd.DatetimeIndex(dates, name='Date'))
+    periods = periods_per_year(dates)
+    statistics = price_statistics(panel, BENCHMARK_COLUMN, periods).loc[[ticker]]
+    statistics.insert(0, 'rows', len(dates))
+    statistics['periods_per_year'] = periods
+    return statistics
+
+
+#----------------------------
+#----------------------------
+
+### THE SHARED BENCHMARK ###
+
+#The benchmark's dates (as int64 nanoseconds) followed by its prices, in one shared memory block
+def share_benchmark(dates, prices):
+    rows = len(dates)
+    block = shared_memory.SharedMemory(create=True, size=max(16 * rows, 1))
+    np.ndarray((rows,), np.int64, block.buf)[:] = np.asarray(dates, dtype='datetime64[ns]').view(np.int64)
+    np.ndarray((rows,), np.float64, block.buf, offset=8 * rows)[:] = prices
+    return block
+
+
+#Each worker maps the block once and keeps it for every chunk it is given
+_ATTACHED = {}
+
+
+def attach_benchmark(name, rows):
+    if name not in _ATTACHED:
+        _ATTACHED[name] = shared_memory.SharedMemory(name=name)
+    buffer = _ATTACHED[name].buf
+    return np.ndarray((rows,), np.int64, buffer).view('datetime64[ns]'), np.ndarray((rows,), np.float64, buffer, offset=8 * rows)
+
+
+#----------------------------
+#----------------------------
+
+### RUNNING THE CHUNKS ###
+
+def _compare_chunk(sources, benchmark_dates, benchmark_prices, store_dir):
+    rows = []
+    for ticker, source in sources:
+        try:
+            dates, prices = read_ticker(source, store_dir)
+        except (OSError, KeyError, ValueError) as error:
+            rows.append(pd.DataFrame({'rows': [0], 'error': [str(error)]}, index=pd.Index([ticker], name='Ticker')))
+            continue
+        rows.append(ticker_statistics(ticker, dates, prices, benchmark_dates, benchmark_prices))
+    return pd.concat(rows)
+
+
+#What a worker runs: the benchmark comes from the shared block instead of being pickled with every chunk
+def _compare_shared_chunk(sources, block_name, benchmark_rows, store_dir):
+    benchmark_dates, benchmark_prices = attach_benchmark(block_name, benchmark_rows)
+    return _compare_chunk(sources, benchmark_dates, benchmark_prices, store_dir)
+
+
+#{ticker: source} -> one table with a row per ticker. 'benchmark' is a CSV path (or a store symbol with 'store_dir'). With processes=1, or a
+#single chunk, everything runs in this process
+@profiled('compare tickers')
+def compare_tickers(sources, benchmark, store_dir=None, processes=None, chunk_size=None):
+    sources = list(sources.items())
+    benchmark_dates, benchmark_prices = read_ticker(benchmark, store_dir)
+    workers = max(1, min(processes or os.cpu_count() or 1, len(sources)))
+    chunk_size = chunk_size or max(1, -(-len(sources) // (workers * CHUNKS_PER_WORKER)))
+    chunks = [sources[start:start + chunk_size] for start in range(0, len(sources), chunk_size)]
+
+    if workers == 1 or len(chunks) == 1:
+        results = [_compare_chunk(chunk, benchmark_dates, benchmark_prices, store_dir) for chunk in chunks]
+    else:
+        block = share_benchmark(benchmark_dates, benchmark_prices)
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_compare_shared_chunk, chunks, [block.name] * len(chunks), [len(benchmark_dates)] * len(chunks),
+                                        [store_dir] * len(chunks)))
+        finally:
+            block.close()
+            block.unlink()
+
+    table = pd.concat(results) if results else pd.DataFrame(index=pd.Index([], name='Ticker'))
+    if 'error' not in table.columns:
+        table['error'] = None
+    table.index.name = 'Ticker'
+    return table
+
+
+#Ticker name -> CSV path, named after the files ('NFLX.csv' -> 'NFLX')
+def csv_sources(paths):
+    return {os.path.splitext(os.path.basename(path))[0]: path for path in paths}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare many tickers against one benchmark, in parallel.')
+    parser.add_argument('tickers', nargs='*', metavar='TICKER', help='price CSVs, or symbols with --store (default: every symbol in the store)')
+    parser.add_argument('--benchmark', required=True, help='benchmark price CSV, or symbol with --store')
+    parser.add_argument('--store', help='read the tickers from this memory-mapped price store (see price_store.py)')
+    parser.add_argument('--processes', type=int, help='worker processes (default: one per core)')
+    parser.add_argument('--chunk-size', type=int, help='tickers per chunk (default: {} chunks per worker)'.format(CHUNKS_PER_WORKER))
+    parser.add_argument('--output', default='ticker_comparison.csv', help='where to write the table (default: ticker_comparison.csv)')
+    args = parser.parse_args(argv)
+
+    if args.store:
+        from price_store import PriceStore
+
+        symbols = args.tickers or [symbol for symbol in PriceStore(args.store).symbols() if symbol != args.benchmark]
+        sources = {symbol: symbol for symbol in symbols}
+    else:
+        sources = csv_sources(args.tickers)
+    if not sources:
+        parser.error('no tickers to compare')
+
+    table = compare_tickers(sources, args.benchmark, args.store, args.processes, args.chunk_size)
+    table.to_csv(args.output)
+    print(table)
+    print('\nTable of {} tickers written to {}'.format(len(table), args.output))
+
+
+if __name__ == '__main__':
+    main()